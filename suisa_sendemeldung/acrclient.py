@@ -2,14 +2,116 @@
 
 from __future__ import annotations
 
-from datetime import date, datetime, timedelta
-from typing import Any, Self
+import asyncio
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing
+from datetime import date, timedelta
+from functools import partial
+from typing import TYPE_CHECKING, Any, Self, TypeVar
 
-import pytz
 from acrclient import Client
 from acrclient.models import GetBmCsProjectsResultsParams
+from requests.adapters import HTTPAdapter, Retry
 from tqdm import tqdm
 
+from .decode import iter_items
+from .detection import Detection, ingest, interval_window, select_entry
+from .metrics import metrics
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Callable, Iterable, Iterator
+
+    from .cache import DayCache
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def _ordered_map(
+    func: Callable[[T], R], items: Iterable[T], max_workers: int
+) -> Iterator[R]:
+    """Map func over items in a thread pool, yielding results in order.
+
+    Unlike `Executor.map()`, items are only submitted once there is room, so
+    at most `max_workers` results are pending or buffered at any time. With a
+    single worker func runs on the calling thread.
+    """
+    if max_workers <= 1:
+        yield from map(func, items)
+        return
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending: deque[Future[R]] = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _in_window(data: list, window: tuple[str, str]) -> list:
+    """Keep the entries whose UTC timestamp lies in window.
+
+    `TS_FMT` timestamps sort like the times they encode, so they can be
+    compared to the window without parsing them.
+    """
+    first, last = window
+    return [
+        entry for entry in data if first <= entry["metadata"]["timestamp_utc"] < last
+    ]
+
+
+class Transport:
+    """HTTP transport configuration for `ACRClient`.
+
+    Requests are sent over a pool of keep-alive connections with compressed
+    transfer. Failed requests and responses with a transient status are retried
+    with a jittered exponential backoff that honours `Retry-After` headers.
+
+    Arguments:
+    ---------
+        retries: Total number of retries per request.
+        backoff_factor: Base of the exponential backoff in seconds.
+        backoff_jitter: Maximum random jitter added to each backoff in seconds.
+        timeout: Connect and read timeout per request in seconds.
+        pool_size: Number of connections kept open to the API.
+
+    """
+
+    # statuses that are worth retrying, Retry-After is honoured for 429 and 503
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(
+        self: Self,
+        *,
+        retries: int = 5,
+        backoff_factor: float = 0.5,
+        backoff_jitter: float = 0.5,
+        timeout: float = 60,
+        pool_size: int = 10,
+    ) -> None:
+        """Store the transport configuration."""
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_jitter = backoff_jitter
+        self.timeout = timeout
+        self.pool_size = pool_size
+
+    def adapter(self: Self) -> HTTPAdapter:
+        """Create a pooled and retrying adapter for a requests session."""
+        return HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            max_retries=Retry(
+                total=self.retries,
+                backoff_factor=self.backoff_factor,
+                backoff_jitter=self.backoff_jitter,
+                status_forcelist=self.RETRY_STATUSES,
+                respect_retry_after_header=True,
+            ),
+        )
+
 
 class ACRClient(Client):
     """ACRCloud client wrapper to fetch metadata.
@@ -17,6 +119,10 @@ class ACRClient(Client):
     Arguments:
     ---------
         bearer_token: The bearer token for ACRCloud.
+        base_url: The base URL of the ACRCloud API.
+        cache: Optional on-disk cache for day results.
+        refresh: Fetch results again even if they are cached.
+        transport: HTTP transport configuration.
 
     """
 
@@ -24,13 +130,74 @@ class ACRClient(Client):
     TS_FMT = "%Y-%m-%d %H:%M:%S"
     # timezone of ACRCloud
     ACR_TIMEZONE = "UTC"
+    # bytes of a response decoded at once
+    CHUNK_SIZE = 64 * 1024
 
     def __init__(
-        self: Self, bearer_token: str, base_url: str = "https://eu-api-v2.acrcloud.com"
+        self: Self,
+        bearer_token: str,
+        base_url: str = "https://eu-api-v2.acrcloud.com",
+        cache: DayCache | None = None,
+        *,
+        refresh: bool = False,
+        transport: Transport | None = None,
     ) -> None:
-        """Init subclass with default_date."""
+        """Init subclass with default_date and configure the transport."""
         super().__init__(bearer_token=bearer_token, base_url=base_url)
         self.default_date: date = date.today() - timedelta(days=1)  # noqa: DTZ011
+        self.cache = cache
+        self.refresh = refresh
+        self.transport = transport or Transport()
+        adapter = self.transport.adapter()
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._session.headers["Accept-Encoding"] = "gzip, deflate"
+
+    def get_day(
+        self: Self, project_id: int, stream_id: str, requested_date: date
+    ) -> Any:  # noqa: ANN401
+        """Fetch the ACRCloud results of a day, using the cache if configured.
+
+        The response is decoded incrementally while it is received and every
+        entry is reduced to the fields reports need right away, see
+        `select_entry()`. Neither the whole response nor all of its fields
+        are held in memory at any time.
+
+        Arguments:
+        ---------
+            project_id: The Project ID of the stream.
+            stream_id: The ID of the stream.
+            requested_date: The date of the entries you want.
+
+        Returns:
+        -------
+            json: The unlocalized and reduced ACR data from date
+
+        """
+        if self.cache and not self.refresh:
+            data = self.cache.get(project_id, stream_id, requested_date)
+            if data is not None:
+                metrics.count("cache_hits")
+                return data
+        with metrics.stage("fetch"):
+            response = self.get(
+                f"/api/bm-cs-projects/{project_id}/streams/{stream_id}/results",
+                params=GetBmCsProjectsResultsParams(
+                    type="day",
+                    date=requested_date.strftime("%Y%m%d"),
+                ),
+                timeout=self.transport.timeout,
+                stream=True,
+            )
+            metrics.count("api_calls")
+            with closing(response):
+                chunks = metrics.counted(
+                    "api_bytes", response.iter_content(self.CHUNK_SIZE)
+                )
+                data = [select_entry(entry) for entry in iter_items(chunks, "data")]
+        if self.cache:
+            self.cache.put(project_id, stream_id, requested_date, data)
+        return data
 
     def get_data(
         self: Self,
@@ -38,7 +205,8 @@ class ACRClient(Client):
         stream_id: str,
         requested_date: date | None = None,
         timezone: str = ACR_TIMEZONE,
-    ) -> Any:  # noqa: ANN401
+        window: tuple[str, str] | None = None,
+    ) -> list[Detection]:
         """Fetch metadata from ACRCloud for `stream_id`.
 
         Arguments:
@@ -47,42 +215,38 @@ class ACRClient(Client):
             stream_id: The ID of the stream.
             requested_date: The date of the entries you want (default: yesterday).
             timezone: The timezone to use for localization.
+            window: Only keep (and localize) entries in this UTC time window.
 
         Returns:
         -------
-            json: The ACR data from date
+            detections: The ACR data from date as localized `Detection` records
 
         """
         if requested_date is None:
             requested_date = self.default_date
-        data = self.get_bm_cs_projects_results(
-            project_id=project_id,
-            stream_id=stream_id,
-            params=GetBmCsProjectsResultsParams(
-                type="day",
-                date=requested_date.strftime("%Y%m%d"),
-            ),
-        )
-        for entry in data:
-            metadata = entry.get("metadata")
-            ts_utc = pytz.utc.localize(
-                datetime.strptime(metadata.get("timestamp_utc"), ACRClient.TS_FMT),  # noqa: DTZ007
-            )
-            ts_local = ts_utc.astimezone(pytz.timezone(timezone))
-            metadata.update({"timestamp_local": ts_local.strftime(ACRClient.TS_FMT)})
+        data = self.get_day(project_id, stream_id, requested_date)
+        if window:
+            with metrics.stage("trim"):
+                data = _in_window(data, window)
+        with metrics.stage("localize"):
+            detections = ingest(data, timezone)
+        metrics.count("detections", len(detections))
+        return detections
 
-        return data
-
-    def get_interval_data(  # noqa: ANN201
+    def get_interval_data(  # noqa: ANN201, PLR0913
         self: Self,
         project_id: int,
         stream_id: str,
         start: date,
         end: date,
         timezone: str = ACR_TIMEZONE,
+        max_workers: int = 1,
     ):
         """Get data specified by interval from start to end.
 
+        Days are fetched concurrently by up to `max_workers` threads, the results
+        are assembled in chronological order regardless of completion order.
+
         Arguments:
         ---------
             project_id: The ID of the project.
@@ -90,57 +254,138 @@ class ACRClient(Client):
             start: The start date of the interval.
             end: The end date of the interval.
             timezone (optional): will be passed to `get_data()`.
+            max_workers (optional): Maximum number of days fetched in parallel.
 
         Returns:
         -------
-            json: The ACR data from start to end.
+            detections: The ACR data from start to end.
+
+        """
+        return list(
+            self.iter_interval_data(
+                project_id, stream_id, start, end, timezone, max_workers
+            )
+        )
+
+    def iter_interval_data(  # noqa: PLR0913
+        self: Self,
+        project_id: int,
+        stream_id: str,
+        start: date,
+        end: date,
+        timezone: str = ACR_TIMEZONE,
+        max_workers: int = 1,
+    ) -> Iterator[Detection]:
+        """Yield the detections of an interval from start to end in chronological order.
 
+        Works like `get_interval_data()` but only keeps the days currently being
+        fetched in memory, at most `max_workers` of them.
         """
-        trim = False
-        # if we have to localize the timestamps we may need more data
-        if timezone != ACRClient.ACR_TIMEZONE:
-            # compute utc offset
-            offset = pytz.timezone(timezone).utcoffset(datetime.now())  # noqa: DTZ005
-            # decrease start by 1 day if we're ahead of utc
-            if offset > timedelta(seconds=1):
-                computed_start = start - timedelta(days=1)
-                computed_end = end
-                trim = True
-            # increase end by 1 day if we're behind of utc
-            elif offset < timedelta(seconds=1):
-                computed_start = start
-                computed_end = end + timedelta(days=1)
-                trim = True
-        else:
-            computed_start = start
-            computed_end = end
-
-        dates = []
-        ptr = computed_start
-        while ptr <= computed_end:
-            dates.append(ptr)
-            ptr += timedelta(days=1)
-        data = []
+        dates, window = interval_window(start, end, timezone)
         # make the prefix longer by this amount so tqdm lines up with
         # the one in the main code
         ljust_amount: int = 27
-        for ptr in tqdm(dates, desc="load ACRCloud data".ljust(ljust_amount)):
-            data += self.get_data(
+        fetch = partial(
+            self.get_data, project_id, stream_id, timezone=timezone, window=window
+        )
+        for day in tqdm(
+            _ordered_map(fetch, dates, max_workers),
+            total=len(dates),
+            desc="load ACRCloud data".ljust(ljust_amount),
+        ):
+            yield from day
+
+
+class AsyncACRClient:
+    """Awaitable wrapper of `ACRClient` for batch runs.
+
+    Lets the jobs of a batch share one client and await their days together
+    on an event loop. This is not a native asyncio client: the blocking HTTP
+    calls of the underlying `ACRClient` run in the default executor, at most
+    `max_concurrency` of them at the same time, so it fetches no faster than
+    `ACRClient` with as many workers.
+
+    Arguments:
+    ---------
+        bearer_token: The bearer token for ACRCloud.
+        base_url: The base URL of the ACRCloud API.
+        max_concurrency: Maximum number of concurrently running day requests.
+        cache: Optional on-disk cache for day results.
+        refresh: Fetch results again even if they are cached.
+        transport: HTTP transport configuration.
+
+    """
+
+    def __init__(  # noqa: PLR0913
+        self: Self,
+        bearer_token: str,
+        base_url: str = "https://eu-api-v2.acrcloud.com",
+        max_concurrency: int = 4,
+        cache: DayCache | None = None,
+        *,
+        refresh: bool = False,
+        transport: Transport | None = None,
+    ) -> None:
+        """Create the wrapped synchronous client."""
+        self.client = ACRClient(
+            bearer_token=bearer_token,
+            base_url=base_url,
+            cache=cache,
+            refresh=refresh,
+            transport=transport,
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @property
+    def default_date(self: Self) -> date:
+        """Date used when `get_data()` is called without a date."""
+        return self.client.default_date
+
+    async def get_data(
+        self: Self,
+        project_id: int,
+        stream_id: str,
+        requested_date: date | None = None,
+        timezone: str = ACRClient.ACR_TIMEZONE,
+        window: tuple[str, str] | None = None,
+    ) -> list[Detection]:
+        """Fetch metadata from ACRCloud for `stream_id`.
+
+        See `ACRClient.get_data()` for the arguments and return value.
+        """
+        async with self._semaphore:
+            return await asyncio.to_thread(
+                self.client.get_data,
                 project_id,
                 stream_id,
-                requested_date=ptr,
+                requested_date=requested_date,
                 timezone=timezone,
+                window=window,
             )
 
-        # if timestamps are localized we will have to removed the unneeded entries.
-        if trim:
-            for entry in reversed(data):
-                metadata = entry.get("metadata")
-                timestamp = metadata.get("timestamp_local")
-                timestamp_date = datetime.strptime(  # noqa: DTZ007
-                    timestamp, ACRClient.TS_FMT
-                ).date()
-                if timestamp_date < start or timestamp_date > end:
-                    data.remove(entry)
+    async def get_interval_data(  # noqa: ANN201
+        self: Self,
+        project_id: int,
+        stream_id: str,
+        start: date,
+        end: date,
+        timezone: str = ACRClient.ACR_TIMEZONE,
+    ):
+        """Get data specified by interval from start to end.
 
-        return data
+        See `ACRClient.get_interval_data()` for the arguments and return value.
+        """
+        dates, window = interval_window(start, end, timezone)
+        days = await asyncio.gather(
+            *(
+                self.get_data(
+                    project_id,
+                    stream_id,
+                    requested_date=ptr,
+                    timezone=timezone,
+                    window=window,
+                )
+                for ptr in dates
+            )
+        )
+        return [entry for day in days for entry in day]
@@ -0,0 +1,109 @@
+"""On-disk cache for ACRCloud day results."""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from contextlib import suppress
+from datetime import UTC, date, datetime, timedelta
+from pathlib import Path
+from threading import Lock
+from typing import Any, Self
+
+
+class DayCache:
+    """Cache the results of ACRCloud day requests on disk.
+
+    Entries are keyed by project, stream and day. Days that lie more than
+    `closed_after` days in the past are considered closed and never change on
+    the ACRCloud side, they are kept until evicted. More recent days are only
+    served for `ttl` seconds after they were stored.
+
+    The size of the cache is only measured on the first write of a run and
+    then estimated from the written entries, the cache is only scanned again
+    once the estimate exceeds `max_size`.
+
+    The cache is best effort, any errors while reading or writing it cause the
+    data to be fetched from ACRCloud instead.
+
+    Arguments:
+    ---------
+        path: Directory to store the cached results in.
+        max_size: Maximum size of the cache in bytes, the least recently
+            used days are evicted once it is exceeded.
+        ttl: Seconds a cached result of a recent day stays valid.
+        closed_after: Number of days after which a day is considered closed.
+
+    """
+
+    def __init__(
+        self: Self,
+        path: str | Path,
+        max_size: int = 256 * 1024 * 1024,
+        ttl: int = 3600,
+        closed_after: int = 3,
+    ) -> None:
+        """Create a cache in `path`."""
+        self.path = Path(path).expanduser()
+        self.max_size = max_size
+        self.ttl = ttl
+        self.closed_after = closed_after
+        # estimated size of the cache, None until it is measured
+        self._size: int | None = None
+        self._lock = Lock()
+
+    def _file(self: Self, project_id: int, stream_id: str, day: date) -> Path:
+        return self.path / str(project_id) / stream_id / f"{day:%Y%m%d}.json"
+
+    def is_closed(self: Self, day: date) -> bool:
+        """Check if ACRCloud results for `day` are final."""
+        today = datetime.now(tz=UTC).date()
+        return day <= today - timedelta(days=self.closed_after)
+
+    def get(self: Self, project_id: int, stream_id: str, day: date) -> Any:  # noqa: ANN401
+        """Get cached results for a day.
+
+        Returns
+        -------
+            The cached data or None if there is no valid entry.
+
+        """
+        file = self._file(project_id, stream_id, day)
+        try:
+            stat = file.stat()
+            if not self.is_closed(day) and time.time() - stat.st_mtime > self.ttl:
+                return None
+            data = json.loads(file.read_bytes())
+            # record the access for eviction while keeping the mtime for the ttl
+            os.utime(file, (time.time(), stat.st_mtime))
+        except (OSError, ValueError):
+            return None
+        return data
+
+    def put(self: Self, project_id: int, stream_id: str, day: date, data: Any) -> None:  # noqa: ANN401
+        """Store results for a day and evict old entries if needed."""
+        file = self._file(project_id, stream_id, day)
+        with suppress(OSError):
+            file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = file.with_suffix(".tmp")
+            content = json.dumps(data).encode("utf-8")
+            tmp.write_bytes(content)
+            tmp.replace(file)
+            with self._lock:
+                # replaced entries are counted twice, which only evicts early
+                if self._size is not None:
+                    self._size += len(content)
+                if self._size is None or self._size > self.max_size:
+                    self.evict()
+
+    def evict(self: Self) -> None:
+        """Remove least recently used entries until the cache fits `max_size`."""
+        files = [(file, file.stat()) for file in self.path.rglob("*.json")]
+        size = sum(stat.st_size for _, stat in files)
+        for file, stat in sorted(files, key=lambda item: item[1].st_atime):
+            if size <= self.max_size:
+                break
+            file.unlink()
+            size -= stat.st_size
+        self._size = size
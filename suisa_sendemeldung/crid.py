@@ -0,0 +1,143 @@
+"""Batched generation of RaBe CRIDs for report rows."""
+
+from __future__ import annotations
+
+from datetime import UTC, date, datetime, timedelta
+from typing import TYPE_CHECKING, NamedTuple, Protocol, Self
+from zoneinfo import ZoneInfo
+
+import cridlib
+from cridlib.lib import canonicalize_show
+from cridlib.util import get_session
+
+if TYPE_CHECKING:  # pragma: no cover
+    from requests import Session
+
+# the archive works with local times
+ARCHIVE_TZ = ZoneInfo("Europe/Zurich")
+
+
+class Broadcast(NamedTuple):
+    """A show in the broadcast schedule."""
+
+    start: datetime
+    end: datetime
+    show: str
+
+
+class Schedule(Protocol):
+    """Source of the broadcast schedule."""
+
+    def get_broadcasts(self: Self, day: date) -> list[Broadcast]:
+        """Get the broadcasts starting on a local day."""
+
+
+class ArchiveSchedule:
+    """Broadcast schedule from the RaBe archive (raar).
+
+    This is the same source `cridlib.get()` asks for past timestamps, but a
+    whole day is fetched at once instead of asking for every single timestamp.
+
+    Arguments:
+    ---------
+        session: The session to use for requests.
+        url: The base URL of the broadcasts endpoint.
+
+    """
+
+    URL = "https://archiv.rabe.ch/api/broadcasts/"
+
+    def __init__(self: Self, session: Session | None = None, url: str = URL) -> None:
+        """Create a schedule."""
+        self.session = session or get_session()
+        self.url = url
+
+    def get_broadcasts(self: Self, day: date) -> list[Broadcast]:
+        """Get the broadcasts starting on a local day.
+
+        Arguments:
+        ---------
+            day: The local day in the archive timezone.
+
+        Returns:
+        -------
+            broadcasts: The broadcasts of the day.
+
+        """
+        response = self.session.get(f"{self.url}{day:%Y/%m/%d}", timeout=10)
+        response.raise_for_status()
+        broadcasts = []
+        for item in response.json().get("data", []):
+            attributes = item["attributes"]
+            broadcasts.append(
+                Broadcast(
+                    start=datetime.fromisoformat(attributes["started_at"]),
+                    end=datetime.fromisoformat(attributes["finished_at"]),
+                    # mimic cridlib.strategy.past
+                    show=str(attributes["label"]).lower().replace(" ", "-"),
+                )
+            )
+        return broadcasts
+
+
+class CridGenerator:
+    """Generate CRIDs like `cridlib.get()` from a cached broadcast schedule.
+
+    The schedule is fetched once per local day and kept for all later rows,
+    so the number of schedule lookups is bounded by the days of a report
+    instead of its rows. Timestamps that are not in the past are handed to
+    `cridlib.get()` as the archive only knows about past shows.
+
+    Arguments:
+    ---------
+        schedule: The source of the broadcast schedule.
+
+    """
+
+    def __init__(self: Self, schedule: Schedule | None = None) -> None:
+        """Create a generator with an empty schedule cache."""
+        self.schedule = schedule or ArchiveSchedule()
+        self._days: dict[date, list[Broadcast]] = {}
+
+    def get_broadcasts(self: Self, day: date) -> list[Broadcast]:
+        """Get the (cached) broadcasts of a local day."""
+        if day not in self._days:
+            self._days[day] = self.schedule.get_broadcasts(day)
+        return self._days[day]
+
+    def get_show(self: Self, timestamp: datetime) -> str:
+        """Get the show that was on air at timestamp."""
+        day = timestamp.astimezone(ARCHIVE_TZ).date()
+        # shows running over midnight started the day before
+        for broadcasts in (
+            self.get_broadcasts(day),
+            self.get_broadcasts(day - timedelta(days=1)),
+        ):
+            for broadcast in broadcasts:
+                if broadcast.start <= timestamp < broadcast.end:
+                    return broadcast.show
+        return ""
+
+    def get(self: Self, timestamp: datetime, fragment: str = "") -> str:
+        """Get a CRID.
+
+        Arguments:
+        ---------
+            timestamp: Timezone aware time to get the CRID for.
+            fragment: Optional fragment to add to the end of the CRID.
+
+        Returns:
+        -------
+            crid: The CRID rendered as string.
+
+        """
+        if timestamp >= datetime.now(UTC):
+            return str(cridlib.get(timestamp=timestamp, fragment=fragment))
+        show = self.get_show(timestamp)
+        if show:
+            show = canonicalize_show(show)
+        tscode = f"t=clock={timestamp.strftime('%Y%m%dT%H%M%S.%f')[:-4]}Z"
+        return (
+            f"crid://rabe.ch/v1{'/' + show if show else ''}"
+            f"#{tscode}{'&' + fragment if fragment else ''}"
+        )
@@ -0,0 +1,108 @@
+"""Incremental decoding of JSON API responses."""
+
+from __future__ import annotations
+
+import codecs
+import json
+import re
+from typing import TYPE_CHECKING, Any, Self
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Iterable, Iterator
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+class _Reader:
+    """Buffer over a stream of byte chunks that decodes one JSON value at a time.
+
+    Only the part of the input that has not been consumed yet is kept.
+    """
+
+    def __init__(self: Self, chunks: Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+
+    def _fill(self: Self) -> bool:
+        """Append the next chunk to the buffer, False if the input is exhausted."""
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            if text:
+                self.buf = self.buf[self.pos :] + text
+                self.pos = 0
+                return True
+        return False
+
+    def peek(self: Self) -> str:
+        """Skip whitespace and return the next character, empty at the end."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()  # type: ignore[union-attr]
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos : self.pos + 1]
+
+    def expect(self: Self, chars: str) -> str:
+        """Consume the next character, it has to be one of chars."""
+        char = self.peek()
+        if not char or char not in chars:
+            msg = f"Expecting one of {chars!r}"
+            raise json.JSONDecodeError(msg, self.buf, self.pos)
+        self.pos += 1
+        return char
+
+    def value(self: Self) -> Any:  # noqa: ANN401
+        """Decode the next complete value, reading more input as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # a number at the end of the buffer may continue in the next chunk
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_items(chunks: Iterable[bytes], key: str) -> Iterator[Any]:
+    """Yield the items of the array `key` of a JSON object one by one.
+
+    The object is decoded from `chunks` while they arrive, so only the item
+    currently being decoded is held in memory, not the whole document. Other
+    members of the object are decoded and discarded.
+
+    Arguments:
+    ---------
+        chunks: The UTF-8 encoded JSON document, e.g. `Response.iter_content()`.
+        key: The member of the top level object containing the array.
+
+    Returns:
+    -------
+        items: The decoded array items, nothing if `key` is missing or no array.
+
+    """
+    reader = _Reader(chunks)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        name = reader.value()
+        reader.expect(":")
+        if name == key and reader.peek() == "[":
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.expect("]")
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.expect(",]") == "]":
+                        break
+        else:
+            reader.value()
+        if reader.expect(",}") == "}":
+            return
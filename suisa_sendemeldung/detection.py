@@ -0,0 +1,233 @@
+"""Compact record model for ACRCloud detections."""
+
+from __future__ import annotations
+
+import sys
+from datetime import date, datetime, time, timedelta
+from typing import TYPE_CHECKING, Any, Self
+
+import pytz
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Iterable
+
+# format of timestamp in api answer
+TS_FMT = "%Y-%m-%d %H:%M:%S"
+
+# plain values of a music item that end up in reports
+_MUSIC_KEYS = ("acrid", "title", "artist", "Artist", "isrc", "label", "release_date")
+
+
+def _intern(value: Any) -> Any:  # noqa: ANN401
+    """Intern strings so repeated values share memory."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def project_music(music: dict) -> dict:
+    """Reduce a music or custom_files item from ACRCloud to the fields reports use.
+
+    Large fields like `external_metadata` or `genres` are dropped and strings
+    that repeat across detections (artists, labels, albums, ...) are interned.
+
+    Arguments:
+    ---------
+        music: music dict from API
+
+    Returns:
+    -------
+        music: music dict containing only the fields needed for reports
+
+    """
+    projected = {key: _intern(music[key]) for key in _MUSIC_KEYS if key in music}
+    if "artists" in music:
+        artists = music["artists"]
+        projected["artists"] = (
+            [{"name": _intern(artist.get("name"))} for artist in artists]
+            if isinstance(artists, list)
+            else _intern(artists)
+        )
+    if music.get("contributors") is not None:
+        composers = music["contributors"].get("composers")
+        if isinstance(composers, list):
+            composers = [_intern(composer) for composer in composers]
+        projected["contributors"] = {"composers": composers}
+    if "works" in music:
+        projected["works"] = [
+            {
+                "creators": [
+                    {"name": _intern(creator["name"]), "role": creator.get("role", "")}
+                    for creator in work["creators"]
+                ]
+            }
+            for work in music["works"]
+        ]
+    if "external_ids" in music:
+        projected["external_ids"] = {
+            key: _intern(value)
+            for key, value in music["external_ids"].items()
+            if key in ("isrc", "upc")
+        }
+    if "album" in music:
+        album = music["album"]
+        # it's a dict if it's from the ACRCloud bucket, a string if from a custom bucket
+        projected["album"] = (
+            {
+                key: _intern(value)
+                for key, value in album.items()
+                if key in ("name", "cd_id")
+            }
+            if isinstance(album, dict)
+            else _intern(album)
+        )
+    return projected
+
+
+def select_entry(entry: dict) -> dict:
+    """Reduce a raw ACRCloud entry to the fields needed to create a `Detection`.
+
+    The result has the same layout as the entry, so it can be cached and be
+    passed to `Detection.from_entry()` in place of the entry.
+
+    Arguments:
+    ---------
+        entry: The entry as returned by ACRCloud.
+
+    Returns:
+    -------
+        entry: The entry containing only the fields needed for reports.
+
+    """
+    metadata = entry["metadata"]
+    selected = {
+        key: metadata[key]
+        for key in ("timestamp_utc", "played_duration")
+        if key in metadata
+    }
+    for key in ("music", "custom_files"):
+        items = metadata.get(key)
+        if items:
+            # only the first item ends up in reports, the others are for dedupe
+            selected[key] = [
+                project_music(items[0]),
+                *({"acrid": item["acrid"]} for item in items[1:]),
+            ]
+    return {"metadata": selected}
+
+
+class Detection:
+    """A single ACRCloud detection holding only what reports need.
+
+    Arguments:
+    ---------
+        timestamp_utc: Start of the detection in UTC.
+        timestamp_local: Start of the detection in the reports timezone.
+        played_duration: Duration of the detection in seconds.
+        music: The first music or custom_files item, see `project_music()`.
+        acrids: The acrids of all music or custom_files items.
+
+    """
+
+    __slots__ = (
+        "acrids",
+        "music",
+        "played_duration",
+        "timestamp_local",
+        "timestamp_utc",
+    )
+
+    def __init__(
+        self: Self,
+        timestamp_utc: datetime,
+        timestamp_local: datetime,
+        played_duration: int,
+        music: dict,
+        acrids: frozenset[str],
+    ) -> None:
+        """Create a detection."""
+        self.timestamp_utc = timestamp_utc
+        self.timestamp_local = timestamp_local
+        self.played_duration = played_duration
+        self.music = music
+        self.acrids = acrids
+
+    def __repr__(self: Self) -> str:
+        """Represent the detection by its time and acrids."""
+        return (
+            f"Detection({self.timestamp_utc.isoformat()}, "
+            f"{self.played_duration}s, {sorted(self.acrids)})"
+        )
+
+    @classmethod
+    def from_entry(cls: type[Self], entry: dict, tz: Any = pytz.utc) -> Self:  # noqa: ANN401
+        """Project a raw ACRCloud entry into a detection.
+
+        This is the only place where ACRCloud timestamps get parsed.
+
+        Arguments:
+        ---------
+            entry: The entry as returned by ACRCloud.
+            tz: The timezone to localize the timestamp to.
+
+        """
+        metadata = entry["metadata"]
+        items = metadata.get("music") or metadata.get("custom_files") or []
+        timestamp_utc = pytz.utc.localize(
+            datetime.strptime(metadata["timestamp_utc"], TS_FMT),  # noqa: DTZ007
+        )
+        return cls(
+            timestamp_utc=timestamp_utc,
+            timestamp_local=timestamp_utc.astimezone(tz),
+            played_duration=metadata.get("played_duration", 0),
+            music=project_music(items[0]) if items else {},
+            acrids=frozenset(_intern(item["acrid"]) for item in items),
+        )
+
+
+def interval_window(
+    start: date, end: date, timezone: str
+) -> tuple[list[date], tuple[str, str]]:
+    """Compute the UTC days and time window covering a local interval.
+
+    The UTC offsets are taken from the interval itself, so intervals that
+    contain a DST change are covered exactly.
+
+    Arguments:
+    ---------
+        start: The start date of the interval.
+        end: The end date of the interval.
+        timezone: The timezone the interval is expressed in.
+
+    Returns:
+    -------
+        dates: The ACRCloud (UTC) days overlapping the interval.
+        window: The first and the first excluded UTC timestamp of the interval.
+
+    """
+    tz = pytz.timezone(timezone)
+    first = tz.localize(datetime.combine(start, time.min)).astimezone(pytz.utc)
+    last = tz.localize(datetime.combine(end + timedelta(days=1), time.min))
+    last = last.astimezone(pytz.utc)
+
+    dates = []
+    ptr = first.date()
+    while datetime.combine(ptr, time.min, tzinfo=pytz.utc) < last:
+        dates.append(ptr)
+        ptr += timedelta(days=1)
+    return dates, (first.strftime(TS_FMT), last.strftime(TS_FMT))
+
+
+def ingest(data: Iterable[dict], timezone: str = "UTC") -> list[Detection]:
+    """Project raw ACRCloud entries into detections localized to timezone.
+
+    Arguments:
+    ---------
+        data: The entries as returned by ACRCloud.
+        timezone: The timezone to localize the timestamps to.
+
+    Returns:
+    -------
+        detections: One detection per entry.
+
+    """
+    tz = pytz.timezone(timezone)
+    return [Detection.from_entry(entry, tz) for entry in data]
@@ -0,0 +1,215 @@
+"""Deliver report emails over reusable SMTP connections."""
+
+from __future__ import annotations
+
+import smtplib
+import time
+from functools import partial
+from smtplib import (
+    SMTP,
+    SMTPException,
+    SMTPRecipientsRefused,
+    SMTPResponseException,
+    SMTPServerDisconnected,
+)
+from threading import BoundedSemaphore, Lock, local
+from typing import TYPE_CHECKING, Self
+
+from .metrics import metrics
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Callable
+    from email.message import Message
+    from types import TracebackType
+
+
+def _is_transient(ex: Exception) -> bool:
+    """Tell whether sending a message again later might succeed."""
+    if isinstance(ex, SMTPResponseException):
+        return 400 <= ex.smtp_code < 500  # noqa: PLR2004
+    if isinstance(ex, SMTPRecipientsRefused):
+        return all(
+            400 <= code < 500  # noqa: PLR2004
+            for code, _ in ex.recipients.values()
+        )
+    if isinstance(ex, SMTPServerDisconnected):
+        return True
+    # network errors may go away, other SMTP errors and bugs will not
+    return isinstance(ex, OSError) and not isinstance(ex, SMTPException)
+
+
+class Mailer:
+    """Send emails over a pool of authenticated SMTP connections.
+
+    Connections are opened when they are first needed and kept open for the
+    following messages, so a batch of reports only pays for the handshake,
+    STARTTLS and login once per connection. Idle connections are probed with
+    NOOP before they are reused, since the server may have closed them in
+    the meantime. Threads sending at the same time use a connection each, at
+    most `connections` of them. Messages that fail for transient reasons,
+    e.g. a dropped connection or a 4xx reply, are sent again over a new
+    connection after an exponential backoff. A message is not sent again if
+    the connection failed after its body went out without a reply, since the
+    server may have accepted it and the recipient would get it twice.
+
+    Arguments:
+    ---------
+        server: The SMTP server to use to send the email.
+        port: The port of the SMTP server.
+        login: The username to log in with, the sender of each message if unset.
+        password: The password for the SMTP server, no login without one.
+        starttls: Upgrade connections with STARTTLS.
+        connections: Maximum number of connections to open at once.
+        retries: Number of retries per message.
+        backoff_factor: Base of the exponential backoff between retries in seconds.
+        timeout: Timeout of blocking operations in seconds.
+
+    """
+
+    def __init__(  # noqa: PLR0913
+        self: Self,
+        server: str = "127.0.0.1",
+        port: int = 587,
+        login: str | None = None,
+        password: str | None = None,
+        *,
+        starttls: bool = True,
+        connections: int = 1,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        timeout: float = 60,
+    ) -> None:
+        """Create a mailer without opening any connections yet."""
+        self.server = server
+        self.port = port
+        self.login = login
+        self.password = password
+        self.starttls = starttls
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self._slots = BoundedSemaphore(connections)
+        self._lock = Lock()
+        # whether the body of the message sent by a thread went out
+        self._local = local()
+        # idle connections with the user they are logged in as
+        self._idle: list[tuple[str, SMTP]] = []
+
+    def __enter__(self: Self) -> Self:
+        """Use the mailer as a context manager that closes its connections."""
+        return self
+
+    def __exit__(
+        self: Self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close all connections."""
+        self.close()
+
+    def _connect(self: Self, user: str) -> SMTP:
+        """Open a new connection logged in as user."""
+        smtp = smtplib.SMTP(host=self.server, port=self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.password:
+                smtp.login(user, self.password)
+        except BaseException:
+            smtp.close()
+            raise
+        smtp.data = partial(self._data, smtp.data)  # type: ignore[method-assign]
+        metrics.count("smtp_connections")
+        return smtp
+
+    def _data(
+        self: Self, data: Callable[[bytes | str], tuple[int, bytes]], msg: bytes | str
+    ) -> tuple[int, bytes]:
+        """Send the body of a message, remembering that it went out."""
+        self._local.body_sent = True
+        return data(msg)
+
+    def _take_idle(self: Self, user: str) -> SMTP | None:
+        """Take an idle connection logged in as user if there is one."""
+        with self._lock:
+            for index, (idle_user, smtp) in enumerate(self._idle):
+                if idle_user == user:
+                    del self._idle[index]
+                    return smtp
+        return None
+
+    def _acquire(self: Self, user: str) -> SMTP:
+        """Take a live idle connection logged in as user or open a new one."""
+        while smtp := self._take_idle(user):
+            if self._alive(smtp):
+                return smtp
+            smtp.close()
+        with self._lock:
+            # make room for a connection as another user
+            stale = self._idle.pop(0)[1] if self._idle else None
+        if stale:
+            self._quit(stale)
+        return self._connect(user)
+
+    @staticmethod
+    def _alive(smtp: SMTP) -> bool:
+        """Tell whether an idle connection still answers."""
+        try:
+            return smtp.noop()[0] == 250  # noqa: PLR2004
+        except OSError:
+            return False
+
+    @staticmethod
+    def _quit(smtp: SMTP) -> None:
+        try:
+            smtp.quit()
+        except OSError:
+            smtp.close()
+
+    def send(self: Self, msg: Message) -> None:
+        """Send a message.
+
+        Arguments:
+        ---------
+            msg: The message to send (an email.message.Message object)
+
+        Raises:
+        ------
+            SMTPException: if the message could not be sent after all retries.
+            OSError: if the server could not be reached after all retries or
+                the connection failed after the body of the message went out.
+
+        """
+        user = self.login or str(msg["From"])
+        with self._slots, metrics.stage("smtp"):
+            for attempt in range(self.retries + 1):
+                smtp = None
+                self._local.body_sent = False
+                try:
+                    smtp = self._acquire(user)
+                    smtp.send_message(msg)
+                except Exception as ex:
+                    # the state of the connection is unknown after errors
+                    if smtp:
+                        smtp.close()
+                    if attempt == self.retries or not _is_transient(ex):
+                        raise
+                    # without a reply to the body it may have been delivered
+                    if self._local.body_sent and not isinstance(
+                        ex, SMTPResponseException
+                    ):
+                        raise
+                    time.sleep(self.backoff_factor * 2**attempt)
+                else:
+                    with self._lock:
+                        self._idle.append((user, smtp))
+                    break
+        metrics.count("emails")
+
+    def close(self: Self) -> None:
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for _, smtp in idle:
+            self._quit(smtp)
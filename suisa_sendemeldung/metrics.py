@@ -0,0 +1,155 @@
+"""Stage timings and counters of a run."""
+
+from __future__ import annotations
+
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock, local
+from typing import TYPE_CHECKING, Any, Self, TypeVar
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Iterable, Iterator
+
+    from .profiling import StageProfiler
+
+T = TypeVar("T")
+
+PREFIX = "suisa_sendemeldung"
+
+
+class Metrics:
+    """Record how long each stage of a run took and count what it processed.
+
+    Stage timings are exclusive: while a stage runs inside another one on the
+    same thread, e.g. when rendering pulls the next merged detection, the
+    time is only booked on the inner stage. Stages running on several threads
+    at once add up, so `fetch` is the total time spent on API requests.
+
+    If `profiler` is set, every stage is profiled separately as well.
+    """
+
+    def __init__(self: Self) -> None:
+        """Create empty metrics."""
+        self.stages: dict[str, float] = {}
+        self.counters: dict[str, int] = {}
+        self._lock = Lock()
+        self._local = local()
+        self.profiler: StageProfiler | None = None
+
+    def reset(self: Self) -> None:
+        """Forget all recorded timings and counters."""
+        with self._lock:
+            self.stages.clear()
+            self.counters.clear()
+
+    def _add(self: Self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self: Self, name: str) -> Iterator[None]:
+        """Time the body of a with statement as stage `name`."""
+        stack: list[list[Any]] = self._local.__dict__.setdefault("stack", [])
+        now = time.perf_counter()
+        if stack:
+            # pause the outer stage
+            outer = stack[-1]
+            self._add(outer[0], now - outer[1])
+        frame: list[Any] = [name, now]
+        stack.append(frame)
+        if self.profiler:
+            self.profiler.enter(name)
+        try:
+            yield
+        finally:
+            if self.profiler:
+                self.profiler.exit(name)
+            now = time.perf_counter()
+            stack.pop()
+            self._add(name, now - frame[1])
+            if stack:
+                stack[-1][1] = now
+
+    def timed(self: Self, name: str, iterable: Iterable[T]) -> Iterator[T]:
+        """Time producing the items of a (lazy) iterable as stage `name`."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count(self: Self, name: str, value: int = 1) -> None:
+        """Add value to counter `name`."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def counted(self: Self, name: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Count the bytes of chunks as they pass through."""
+        for chunk in chunks:
+            self.count(name, len(chunk))
+            yield chunk
+
+    def as_dict(self: Self) -> dict:
+        """Get the recorded stage timings in seconds and counters."""
+        with self._lock:
+            return {
+                "stages": dict(sorted(self.stages.items())),
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def to_json(self: Self, timestamp: float) -> str:
+        """Render the metrics as JSON."""
+        return json.dumps({"timestamp": timestamp, **self.as_dict()}, indent=2)
+
+    def to_prometheus(self: Self, timestamp: float) -> str:
+        """Render the metrics in the Prometheus text exposition format.
+
+        All values describe the last run, so they are exposed as gauges.
+        """
+        values = self.as_dict()
+        lines = [
+            f"# HELP {PREFIX}_stage_seconds Time spent in each stage of the last run.",
+            f"# TYPE {PREFIX}_stage_seconds gauge",
+        ]
+        lines.extend(
+            f'{PREFIX}_stage_seconds{{stage="{stage}"}} {seconds:.6f}'
+            for stage, seconds in values["stages"].items()
+        )
+        for name, value in values["counters"].items():
+            lines.append(f"# TYPE {PREFIX}_{name} gauge")
+            lines.append(f"{PREFIX}_{name} {value}")
+        lines.append(f"# TYPE {PREFIX}_last_run_timestamp_seconds gauge")
+        lines.append(f"{PREFIX}_last_run_timestamp_seconds {timestamp:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self: Self, path: str | Path) -> None:
+        """Write the metrics to a file.
+
+        Files ending in `.prom` are written in the Prometheus text format for
+        the node exporter textfile collector, all others as JSON. The file is
+        replaced atomically, so collectors never read a partial file.
+
+        Arguments:
+        ---------
+            path: The file to write.
+
+        """
+        path = Path(path).expanduser()
+        timestamp = time.time()
+        content = (
+            self.to_prometheus(timestamp)
+            if path.suffix == ".prom"
+            else self.to_json(timestamp)
+        )
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(content, encoding="utf-8")
+        tmp.replace(path)
+
+
+# metrics of the current run
+metrics = Metrics()
@@ -0,0 +1,95 @@
+"""Profile the stages of a run separately."""
+
+from __future__ import annotations
+
+import cProfile
+import pstats
+import threading
+import tracemalloc
+from io import StringIO
+from pathlib import Path
+from typing import Self
+
+
+class StageProfiler:
+    """Profile the stages recorded by `Metrics` with one profile per stage.
+
+    Only one profiler may be active at a time, so like the stage timings the
+    profiles are exclusive: entering a stage pauses the profile of the outer
+    stage. Stages running on other threads than the one that created the
+    profiler are not profiled.
+
+    Arguments:
+    ---------
+        memory: Also record the peak memory of each stage with tracemalloc.
+
+    """
+
+    def __init__(self: Self, *, memory: bool = False) -> None:
+        """Create a profiler for the current thread."""
+        self.memory = memory
+        self.thread = threading.get_ident()
+        self.stats: dict[str, pstats.Stats] = {}
+        self.peaks: dict[str, int] = {}
+        self._stack: list[tuple[str, cProfile.Profile]] = []
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _record_peak(self: Self, name: str) -> None:
+        if self.memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            self.peaks[name] = max(self.peaks.get(name, 0), peak)
+            tracemalloc.reset_peak()
+
+    def enter(self: Self, name: str) -> None:
+        """Start profiling stage `name`, pausing the outer stage."""
+        if threading.get_ident() != self.thread:
+            return
+        if self._stack:
+            outer, profile = self._stack[-1]
+            profile.disable()
+            self._record_peak(outer)
+        elif self.memory:
+            tracemalloc.reset_peak()
+        profile = cProfile.Profile()
+        self._stack.append((name, profile))
+        profile.enable()
+
+    def exit(self: Self, name: str) -> None:
+        """Stop profiling stage `name`, resuming the outer stage."""
+        if threading.get_ident() != self.thread:
+            return
+        _, profile = self._stack.pop()
+        profile.disable()
+        self._record_peak(name)
+        if name in self.stats:
+            self.stats[name].add(profile)
+        else:
+            self.stats[name] = pstats.Stats(profile)
+        if self._stack:
+            self._stack[-1][1].enable()
+
+    def summary(self: Self, limit: int = 20) -> str:
+        """Summarize the hottest functions of each stage by cumulative time."""
+        output = StringIO()
+        for name, stats in sorted(self.stats.items()):
+            output.write(f"=== {name}")
+            if name in self.peaks:
+                output.write(f" (peak memory {self.peaks[name] / 2**20:.1f} MiB)")
+            output.write(" ===\n")
+            stats.stream = output  # type: ignore[attr-defined]
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return output.getvalue()
+
+    def write(self: Self, prefix: str | Path) -> None:
+        """Write a pstats file per stage and a summary of all stages.
+
+        Arguments:
+        ---------
+            prefix: Path prefix, `<prefix>.<stage>.pstats` files and a
+                `<prefix>.profile.txt` summary are written.
+
+        """
+        for name, stats in self.stats.items():
+            stats.dump_stats(f"{prefix}.{name}.pstats")
+        Path(f"{prefix}.profile.txt").write_text(self.summary(), encoding="utf-8")
@@ -3,10 +3,16 @@
 from __future__ import annotations
 
 from enum import StrEnum
+from typing import TYPE_CHECKING
 
 import typed_settings as ts
 from attrs import validators
 
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Callable
+
+    from attrs import Attribute
+
 _EMAIL_TEMPLATE = """
 Hallo SUISA
 
@@ -84,6 +90,13 @@ class IdentifierMode(StrEnum):
     cridlib = "cridlib"
 
 
+class DataSource(StrEnum):
+    """Sources of the data in the report."""
+
+    acr = "acr"
+    store = "store"
+
+
 class FileFormat(StrEnum):
     """File formats for the report."""
 
@@ -91,6 +104,14 @@ class FileFormat(StrEnum):
     csv = "csv"
 
 
+class Compression(StrEnum):
+    """Compression of the report attached to emails."""
+
+    none = "none"
+    zip = "zip"
+    gzip = "gzip"
+
+
 @ts.settings
 class EmailSettings:
     """Email configuration"""  # noqa: D400, D415
@@ -133,6 +154,40 @@ class EmailSettings:
         default="Email generated by <https://github.com/radiorabe/suisa_sendemeldung>",
         click={"show_default": False},
     )
+    starttls: bool = ts.option(
+        help="upgrade the connection to the smtp server with STARTTLS",
+        default=True,
+    )
+    connections: int = ts.option(
+        help="""
+        maximum number of connections to send the emails of a batch or
+        backfill over concurrently, connections are reused for later emails
+        """,
+        default=1,
+        validator=validators.ge(1),
+    )
+    retries: int = ts.option(
+        help="number of retries for emails that failed for transient reasons",
+        default=3,
+        validator=validators.ge(0),
+    )
+    backoff_factor: float = ts.option(
+        help="base of the exponential backoff between retries in seconds",
+        default=0.5,
+        validator=validators.ge(0),
+    )
+    compression: Compression = ts.option(
+        help="compress the attached report, gzip is only supported for csv",
+        default=Compression.none,
+    )
+    compress_above: int = ts.option(
+        help="""
+        zip the attached report if it is larger than this many bytes
+        and --email-compression is none, 0 never does
+        """,
+        default=0,
+        validator=validators.ge(0),
+    )
 
 
 @ts.settings
@@ -143,6 +198,16 @@ class FileSettings:
     path: str = ts.option(default="")
 
 
+def _optional(validator: Callable) -> Callable:
+    """Only run validator on values that are set."""
+
+    def _validate(instance: object, attribute: Attribute, value: str) -> None:
+        if value:
+            validator(instance, attribute, value)
+
+    return _validate
+
+
 @ts.settings
 class ACR:
     """ACRCloud configuration"""  # noqa: D400, D415
@@ -156,8 +221,103 @@ class ACR:
         validator=validators.ge(0),
     )
     stream_id: str = ts.option(
-        help="Id of the stream in ACRCloud",
-        validator=validators.min_len(9),
+        help="Id of the stream in ACRCloud, optional if batch jobs are configured",
+        default="",
+        validator=_optional(validators.min_len(9)),
+    )
+    max_workers: int = ts.option(
+        help="Maximum number of days to fetch from ACRCloud concurrently",
+        default=4,
+        validator=validators.ge(1),
+    )
+    retries: int = ts.option(
+        help="Number of retries for failed ACRCloud requests",
+        default=5,
+        validator=validators.ge(0),
+    )
+    backoff_factor: float = ts.option(
+        help="Base of the exponential backoff between retries in seconds",
+        default=0.5,
+        validator=validators.ge(0),
+    )
+    backoff_jitter: float = ts.option(
+        help="Maximum random jitter added to each backoff in seconds",
+        default=0.5,
+        validator=validators.ge(0),
+    )
+    timeout: float = ts.option(
+        help="Timeout for ACRCloud requests in seconds",
+        default=60,
+        validator=validators.gt(0),
+    )
+
+
+@ts.settings
+class CacheSettings:
+    """ACRCloud result cache configuration"""  # noqa: D400, D415
+
+    enabled: bool = ts.option(
+        help="Cache ACRCloud day results on disk",
+        default=False,
+        click={"param_decls": ("--cache/--no-cache",)},
+    )
+    refresh: bool = ts.option(
+        help="Fetch all days from ACRCloud again and update the cache",
+        default=False,
+        click={"param_decls": ("--refresh",), "is_flag": True},
+    )
+    path: str = ts.option(
+        help="Directory to store cached results in",
+        default="~/.cache/suisa_sendemeldung",
+    )
+    max_size: int = ts.option(
+        help="Maximum size of the cache in MiB",
+        default=256,
+        validator=validators.ge(0),
+    )
+    ttl: int = ts.option(
+        help="Seconds cached results of recent days stay valid",
+        default=3600,
+        validator=validators.ge(0),
+    )
+    closed_after: int = ts.option(
+        help="Days after which results are considered final and cached for good",
+        default=3,
+        validator=validators.ge(1),
+    )
+
+
+@ts.settings
+class StoreSettings:
+    """Local detection store configuration"""  # noqa: D400, D415
+
+    path: str = ts.option(
+        help="SQLite database the collect command stores detections in",
+        default="~/.local/share/suisa_sendemeldung/detections.sqlite3",
+    )
+    overlap: int = ts.option(
+        help="Days before the watermark the collect command fetches again",
+        default=1,
+        validator=validators.ge(0),
+    )
+
+
+@ts.settings
+class ProfileSettings:
+    """Profiling of report runs"""  # noqa: D400, D415
+
+    enabled: bool = ts.option(
+        help="""
+        Profile each stage with cProfile, pstats files and a summary of the
+        hottest functions are written next to the report
+        """,
+        default=False,
+        click={"param_decls": ("--profile",), "is_flag": True},
+    )
+    memory: bool = ts.option(
+        help="Also record the peak memory of each stage with tracemalloc",
+        default=False,
+        click={"param_decls": ("--profile-memory",), "is_flag": True},
     )
 
 
@@ -196,6 +356,14 @@ class RangeSettings:
         default="",
         click={"show_default": False, "show_envvar": False},
     )
+    backfill: bool = ts.option(
+        help="""
+        Create one report per month from --date-start to --date-end,
+        the data of all months is fetched at once
+        """,
+        default=False,
+        click={"param_decls": ("--backfill",), "is_flag": True},
+    )
 
 
 @ts.settings
@@ -206,6 +374,28 @@ class LocalizationSettings:
     locale: str = "de_CH"
 
 
+@ts.settings
+class BatchJob:
+    """Batch job configuration"""  # noqa: D400, D415
+
+    stream_id: str = ts.option(
+        help="Id of the stream in ACRCloud",
+        validator=validators.min_len(9),
+    )
+    # all other values fall back to the main configuration if they are not set
+    project_id: int = ts.option(
+        help="Id of the project in ACRCloud",
+        default=0,
+        validator=validators.ge(0),
+    )
+    name: str = ts.option(help="Station name, used in output and emails", default="")
+    name_short: str = ts.option(
+        help="Shortname for station as used in filenames", default=""
+    )
+    path: str = ts.option(help="Path of the report file", default="")
+    to: str = ts.option(help="the recipients of the email", default="")
+
+
 @ts.settings
 class Settings:
     """Settings"""  # noqa: D400, D415
@@ -217,10 +407,34 @@ class Settings:
         help="How to generate the identifier in the report",
         default=IdentifierMode.local,
     )
+    source: DataSource = ts.option(
+        help="Fetch the data from ACRCloud or read it from the local store",
+        default=DataSource.acr,
+    )
+    workers: int = ts.option(
+        help="Processes rendering report rows, 1 renders them in the main process",
+        default=1,
+        validator=validators.ge(1),
+    )
+    metrics: str = ts.option(
+        help="""
+        Write stage timings and counters to this file when the run ends,
+        in the Prometheus text format if it ends in .prom, as JSON otherwise
+        """,
+        default="",
+    )
 
     acr: ACR = ts.option(default=None)
+    cache: CacheSettings = ts.option(default=CacheSettings())
+    store: StoreSettings = ts.option(default=StoreSettings())
+    profile: ProfileSettings = ts.option(default=ProfileSettings())
     date: RangeSettings = ts.option(default=RangeSettings())
     station: StationSettings = ts.option(default=StationSettings())
     l10n: LocalizationSettings = ts.option(default=LocalizationSettings())
     file: FileSettings = ts.option(default=FileSettings())
     email: EmailSettings = ts.option(default=EmailSettings())
+    batch: list[BatchJob] = ts.option(
+        help="Reports to create in a single run, configured in the config file",
+        factory=list,
+        click={"hidden": True},
+    )
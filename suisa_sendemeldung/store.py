@@ -0,0 +1,196 @@
+"""Local SQLite store for collected ACRCloud detections."""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+from datetime import date, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Self
+
+import pytz
+
+from .detection import TS_FMT, Detection, interval_window, project_music
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Iterable, Iterator
+    from types import TracebackType
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    project_id INTEGER NOT NULL,
+    stream_id TEXT NOT NULL,
+    timestamp_utc TEXT NOT NULL,
+    acrid TEXT NOT NULL,
+    played_duration INTEGER NOT NULL,
+    acrids TEXT NOT NULL,
+    music TEXT NOT NULL,
+    PRIMARY KEY (project_id, stream_id, timestamp_utc, acrid)
+);
+-- the primary key doubles as the index for time ranges of a stream
+CREATE INDEX IF NOT EXISTS detections_timestamp ON detections (timestamp_utc);
+CREATE INDEX IF NOT EXISTS detections_acrid ON detections (acrid);
+CREATE TABLE IF NOT EXISTS watermarks (
+    project_id INTEGER NOT NULL,
+    stream_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    PRIMARY KEY (project_id, stream_id)
+);
+"""
+
+
+class DetectionStore:
+    """Store detections of ACRCloud streams in a local SQLite database.
+
+    Detections are keyed by stream, start time and acrid, adding a detection
+    that is already stored is a no-op. For every stream a watermark records
+    the last UTC day that has been collected completely.
+
+    Detections are indexed by their UTC timestamp, stream and acrid, reading a
+    time range seeks to its start in the index instead of scanning the table.
+
+    Arguments:
+    ---------
+        path: The SQLite database file, it is created if missing.
+
+    """
+
+    def __init__(self: Self, path: str | Path) -> None:
+        """Open (and create) the database at `path`."""
+        if str(path) != ":memory:":
+            path = Path(path).expanduser()
+            path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(_SCHEMA)
+
+    def __enter__(self: Self) -> Self:
+        """Use the store as a context manager that closes it on exit."""
+        return self
+
+    def __exit__(
+        self: Self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the store."""
+        self.close()
+
+    def close(self: Self) -> None:
+        """Close the database connection."""
+        self.connection.close()
+
+    def add(
+        self: Self, project_id: int, stream_id: str, detections: Iterable[Detection]
+    ) -> int:
+        """Add detections of a stream in bulk in a single transaction.
+
+        Detections that are stored already are updated, ACRCloud may report a
+        longer duration or more results for a detection when a day is fetched
+        again later.
+
+        Arguments:
+        ---------
+            project_id: The Project ID of the stream.
+            stream_id: The ID of the stream.
+            detections: The detections to add.
+
+        Returns:
+        -------
+            added: The number of detections that were not stored yet.
+
+        """
+        rows = [
+            (
+                project_id,
+                stream_id,
+                detection.timestamp_utc.strftime(TS_FMT),
+                detection.music.get("acrid", ""),
+                detection.played_duration,
+                json.dumps(sorted(detection.acrids)),
+                json.dumps(detection.music),
+            )
+            for detection in detections
+        ]
+        if not rows:
+            return 0
+        # updates count as changes too, count the rows of the span instead
+        timestamps = [row[2] for row in rows]
+        span = (project_id, stream_id, min(timestamps), max(timestamps))
+        count = (
+            "SELECT COUNT(*) FROM detections WHERE project_id = ? AND stream_id = ?"
+            " AND timestamp_utc BETWEEN ? AND ?"
+        )
+        with self.connection:
+            before = self.connection.execute(count, span).fetchone()[0]
+            self.connection.executemany(
+                "INSERT INTO detections VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (project_id, stream_id, timestamp_utc, acrid)"
+                " DO UPDATE SET played_duration = excluded.played_duration,"
+                " acrids = excluded.acrids, music = excluded.music",
+                rows,
+            )
+            after = self.connection.execute(count, span).fetchone()[0]
+        return after - before
+
+    def iter_interval_data(
+        self: Self,
+        project_id: int,
+        stream_id: str,
+        start: date,
+        end: date,
+        timezone: str = "UTC",
+    ) -> Iterator[Detection]:
+        """Yield the stored detections of an interval in chronological order.
+
+        Works like `ACRClient.iter_interval_data()` but reads from the store.
+
+        Arguments:
+        ---------
+            project_id: The ID of the project.
+            stream_id: The ID of the stream.
+            start: The start date of the interval.
+            end: The end date of the interval.
+            timezone: The timezone of the interval and the local timestamps.
+
+        Returns:
+        -------
+            detections: The detections from start to end.
+
+        """
+        _, (first, last) = interval_window(start, end, timezone)
+        tz = pytz.timezone(timezone)
+        rows = self.connection.execute(
+            "SELECT timestamp_utc, played_duration, music, acrids FROM detections"
+            " WHERE project_id = ? AND stream_id = ?"
+            " AND timestamp_utc >= ? AND timestamp_utc < ?"
+            " ORDER BY timestamp_utc, acrid",
+            (project_id, stream_id, first, last),
+        )
+        for timestamp, played_duration, music, acrids in rows:
+            timestamp_utc = pytz.utc.localize(
+                datetime.strptime(timestamp, TS_FMT),  # noqa: DTZ007
+            )
+            yield Detection(
+                timestamp_utc=timestamp_utc,
+                timestamp_local=timestamp_utc.astimezone(tz),
+                played_duration=played_duration,
+                music=project_music(json.loads(music)),
+                acrids=frozenset(json.loads(acrids)),
+            )
+
+    def get_watermark(self: Self, project_id: int, stream_id: str) -> date | None:
+        """Get the last UTC day of a stream that has been collected completely."""
+        row = self.connection.execute(
+            "SELECT day FROM watermarks WHERE project_id = ? AND stream_id = ?",
+            (project_id, stream_id),
+        ).fetchone()
+        return date.fromisoformat(row[0]) if row else None
+
+    def set_watermark(self: Self, project_id: int, stream_id: str, day: date) -> None:
+        """Record that all days of a stream up to `day` have been collected."""
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?)",
+                (project_id, stream_id, day.isoformat()),
+            )
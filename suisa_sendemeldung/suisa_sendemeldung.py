@@ -7,45 +7,89 @@ takes care of sending the report to SUISA via email for hands-off operations.
 
 from __future__ import annotations
 
-from csv import reader, writer
-from datetime import date, datetime, timedelta
-from email.encoders import encode_base64
-from email.mime.base import MIMEBase
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.utils import formatdate
-from io import BytesIO, StringIO
+import hashlib
+import json
+import sys
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from csv import writer
+from datetime import UTC, date, datetime, timedelta
+from functools import cache, partial
+from io import BytesIO, TextIOWrapper
+from itertools import chain, islice
 from pathlib import Path
-from smtplib import SMTP
 from string import Template
-from typing import TYPE_CHECKING, TypeVar, cast
+from typing import IO, TYPE_CHECKING, NamedTuple, Self, TextIO, TypeVar, cast
 
 import click
-import cridlib
-import pytz
 import typed_settings
-from babel.dates import format_date
-from dateutil.relativedelta import relativedelta
-from iso3901 import ISRC
-from openpyxl import Workbook
-from openpyxl.cell.cell import Cell, MergedCell
-from openpyxl.styles import Border, Font, PatternFill, Side
-from tqdm import tqdm
 from typed_settings.cli_click import OptionGroupFactory
 from typed_settings.exceptions import InvalidValueError
 
-from suisa_sendemeldung.settings import FileFormat, IdentifierMode, OutputMode, Settings
+from suisa_sendemeldung.settings import (
+    BatchJob,
+    Compression,
+    DataSource,
+    FileFormat,
+    IdentifierMode,
+    OutputMode,
+    Settings,
+)
 
-from .acrclient import ACRClient
+from .metrics import metrics
 
+# heavy dependencies are imported where they are needed, so short invocations
+# like --help, csv reports or the collect command start quickly
 if TYPE_CHECKING:  # pragma: no cover
-    from openpyxl.worksheet.worksheet import Worksheet
+    from collections.abc import Iterable, Iterator
+    from concurrent.futures import Future
+    from email.mime.base import MIMEBase
+    from email.mime.multipart import MIMEMultipart
 
+    from .acrclient import ACRClient, Transport
+    from .cache import DayCache
+    from .crid import CridGenerator
+    from .detection import Detection
+    from .mailer import Mailer
+    from .store import DetectionStore
 
-T = TypeVar("T")
 
+T = TypeVar("T")
 
-def validate_arguments(settings: Settings) -> None:
+HEADER = [
+    "Sender",
+    "Titel des Musikwerks",
+    "Name des Komponisten",
+    "Interpret(en)",
+    "Sendedatum",
+    "Sendedauer",
+    "Sendezeit",
+    "ISRC",
+    "Label",
+    "Identifikationsnummer",
+    "Eigenaufnahmen",
+    "EAN / GTIN",
+    "Albumtitel / Titel des Tonträgers",
+    "Aufnahmedatum",
+    "Aufnahmeland",
+    "Erstveröffentlichungsdatum",
+    "Katalog-Nummer / CD ID",
+    "Werkverzeichnisangaben",
+    "Bestellnummer",
+    "Veröffentlichungsland",
+    "Liveaufnahme",
+]
+# index of the "Sendedatum" column
+SENDEDATUM = 4
+# index of the "Aufnahmedatum" and "Erstveröffentlichungsdatum" columns
+DATE_COLUMNS = (13, 15)
+# number of detections rendered by a worker process at once
+ROW_CHUNK_SIZE = 5000
+# number of rows the xlsx column widths are estimated from
+XLSX_WIDTH_SAMPLE = 1000
+
+
+def validate_arguments(settings: Settings) -> None:  # noqa: C901, PLR0912
     """Validate the arguments provided to the script.
 
     After this function we are sure that there are no conflicts in the arguments.
@@ -67,9 +111,48 @@ def validate_arguments(settings: Settings) -> None:
         and settings.file.format == FileFormat.xlsx
     ):
         msgs.append("xlsx cannot be printed to stdout, please set --file-format to csv")
+    # gzip only holds a single stream, xlsx files are zip archives already
+    if (
+        settings.email.compression == Compression.gzip
+        and settings.file.format == FileFormat.xlsx
+    ):
+        msgs.append("gzip compression is only supported for csv, please use zip")
     # last_month is in conflict with start_date and end_date
     if settings.date.last_month and (settings.date.start or settings.date.end):
         msgs.append("argument --last-month not allowed with --date-start or --date-end")
+    # a batch creates several reports that cannot share stdout
+    if settings.batch and settings.output == OutputMode.stdout:
+        msgs.append("batch jobs cannot be printed to stdout, please set --output")
+    # concurrent jobs writing to the same file would overwrite each other
+    if settings.output == OutputMode.file:
+        targets = [
+            (str(Path(job.path).resolve()), "")
+            if job.path
+            else ("", job.name_short or settings.station.name_short)
+            for job in settings.batch
+        ]
+        if len(set(targets)) < len(targets):
+            msgs.append(
+                "batch jobs write to the same file, please set a distinct"
+                " name_short or path per job"
+            )
+    # backfills are by month and always end up in several files
+    if settings.date.backfill:
+        if settings.date.last_month or not settings.date.start:
+            msgs.append("argument --backfill requires --by-date and --date-start")
+        # months are reported whole, the current one is not complete yet
+        elif parse_date(settings)[1] >= date.today().replace(day=1):  # noqa: DTZ011
+            msgs.append(
+                "argument --backfill only covers complete months,"
+                " please set --date-end before the current month"
+            )
+        if settings.output == OutputMode.stdout or settings.file.path:
+            msgs.append("argument --backfill not allowed with stdout or --file-path")
+        if settings.batch:
+            msgs.append("argument --backfill not allowed with batch jobs")
+    # without a batch there is nothing to report on unless a stream is set
+    if not settings.batch and settings.acr and not settings.acr.stream_id:
+        msgs.append("argument --acr-stream-id is required without batch jobs")
     # exit if there are error messages
     if msgs:
         raise InvalidValueError(msgs)
@@ -108,6 +191,30 @@ def parse_date(settings: Settings) -> tuple[date, date]:
     return start_date, end_date
 
 
+def get_months(start_date: date, end_date: date) -> list[tuple[date, date]]:
+    """Get the calendar months overlapping an interval.
+
+    Arguments:
+    ---------
+        start_date: the start date of the interval
+        end_date: the end date of the interval
+
+    Returns:
+    -------
+        months: the first and last day of each month, in order
+
+    """
+    from dateutil.relativedelta import relativedelta  # noqa: PLC0415
+
+    months = []
+    month = start_date.replace(day=1)
+    while month <= end_date:
+        next_month = month + relativedelta(months=+1)
+        months.append((month, next_month - timedelta(days=1)))
+        month = next_month
+    return months
+
+
 def parse_filename(settings: Settings, start_date: date) -> str:
     """Parse filename from settings and start_date.
 
@@ -135,7 +242,135 @@ def parse_filename(settings: Settings, start_date: date) -> str:
     return filename
 
 
-def check_duplicate(entry_a: dict, entry_b: dict) -> bool:
+def get_job_settings(settings: Settings, job: BatchJob) -> Settings:
+    """Create the settings for a single job of a batch.
+
+    Values that are not set in the job are taken from settings.
+
+    Arguments:
+    ---------
+        settings: the settings provided to the script
+        job: the batch job
+
+    Returns:
+    -------
+        settings: the settings to create the report of the job with
+
+    """
+    changes = {
+        "acr": {
+            "stream_id": job.stream_id,
+            "project_id": job.project_id or settings.acr.project_id,
+        },
+        "station": {
+            "name": job.name or settings.station.name,
+            "name_short": job.name_short or settings.station.name_short,
+        },
+        "file": {"path": job.path},
+        "email": {"to": job.to or settings.email.to},
+        "batch": [],
+    }
+    return cast(
+        "Settings",
+        typed_settings.evolve(settings, **changes),  # type: ignore[arg-type]
+    )
+
+
+def get_profile_settings(settings: Settings) -> Settings:
+    """Adapt settings so all stages of a run can be profiled.
+
+    Profiles are only recorded on the main thread, so days are fetched and
+    rows are rendered there instead of in thread or process pools.
+
+    Arguments:
+    ---------
+        settings: the settings provided to the script
+
+    Returns:
+    -------
+        settings: the settings to profile a run with
+
+    """
+    changes: dict = {"workers": 1}
+    if settings.acr:
+        changes["acr"] = {"max_workers": 1}
+    return cast("Settings", typed_settings.evolve(settings, **changes))  # type: ignore[arg-type]
+
+
+def get_cache(settings: Settings) -> DayCache | None:
+    """Create the ACRCloud day cache configured in settings.
+
+    Arguments:
+    ---------
+        settings: the settings provided to the script
+
+    Returns:
+    -------
+        cache: the cache or None if caching is disabled
+
+    """
+    from .cache import DayCache  # noqa: PLC0415
+
+    if not settings.cache.enabled:
+        return None
+    return DayCache(
+        settings.cache.path,
+        max_size=settings.cache.max_size * 1024 * 1024,
+        ttl=settings.cache.ttl,
+        closed_after=settings.cache.closed_after,
+    )
+
+
+def get_transport(settings: Settings) -> Transport:
+    """Create the ACRCloud HTTP transport configured in settings.
+
+    Arguments:
+    ---------
+        settings: the settings provided to the script
+
+    Returns:
+    -------
+        transport: the transport configuration, sized for the fetch workers
+
+    """
+    from .acrclient import Transport  # noqa: PLC0415
+
+    return Transport(
+        retries=settings.acr.retries,
+        backoff_factor=settings.acr.backoff_factor,
+        backoff_jitter=settings.acr.backoff_jitter,
+        timeout=settings.acr.timeout,
+        pool_size=settings.acr.max_workers,
+    )
+
+
+def get_mailer(settings: Settings) -> Mailer:
+    """Create the mailer configured in settings.
+
+    Arguments:
+    ---------
+        settings: the settings provided to the script
+
+    Returns:
+    -------
+        mailer: the mailer, connections are opened when the first email is sent
+
+    """
+    from .mailer import Mailer  # noqa: PLC0415
+
+    return Mailer(
+        server=settings.email.server,
+        port=settings.email.port,
+        login=settings.email.username,
+        password=settings.email.password,
+        starttls=settings.email.starttls,
+        connections=settings.email.connections,
+        retries=settings.email.retries,
+        backoff_factor=settings.email.backoff_factor,
+    )
+
+
+def check_duplicate(entry_a: Detection, entry_b: Detection) -> bool:
     """Check if two entries are duplicates by checking their acrid in all music items.
 
     Arguments:
@@ -148,22 +383,10 @@ def check_duplicate(entry_a: dict, entry_b: dict) -> bool:
         True if the entries are duplicates, False otherwise
 
     """
-    try:
-        entry_a = entry_a["metadata"]["music"]
-    except KeyError:
-        entry_a = entry_a["metadata"]["custom_files"]
-    try:
-        entry_b = entry_b["metadata"]["music"]
-    except KeyError:
-        entry_b = entry_b["metadata"]["custom_files"]
-    for music_a in entry_a:
-        for music_b in entry_b:
-            if music_a["acrid"] == music_b["acrid"]:
-                return True
-    return False
+    return not entry_a.acrids.isdisjoint(entry_b.acrids)
 
 
-def merge_duplicates(data: list) -> list:
+def merge_duplicates(data: list[Detection]) -> list[Detection]:
     """Merge consecutive entries into one if they are duplicates.
 
     Arguments:
@@ -175,38 +398,91 @@ def merge_duplicates(data: list) -> list:
         data: The processed data
 
     """
-    prev = data[0]
-    mark = []
-    for entry in data[1:]:
-        if check_duplicate(prev, entry):
-            prev["metadata"]["played_duration"] = (
-                prev["metadata"]["played_duration"]
-                + entry["metadata"]["played_duration"]
-            )
-            # mark entry for removal
-            mark.append(entry)
-        else:
-            prev = entry
-    # remove marked entries
-    for entry in mark:
-        data.remove(entry)
-    return data
+    return list(iter_merge_duplicates(data))
 
 
-def funge_release_date(release_date: str = "") -> str:
-    """Make a release_date from ACR conform to what seems to be the spec."""
+def iter_merge_duplicates(data: Iterable[Detection]) -> Iterator[Detection]:
+    """Merge consecutive entries into one if they are duplicates while streaming.
+
+    Only the entry currently being merged into is kept in memory, it is yielded
+    as soon as the next entry turns out not to be a duplicate of it and
+    `played_duration` is accumulated on the way.
+
+    Arguments:
+    ---------
+        data: The data provided by ACRClient
+
+    Returns:
+    -------
+        data: The processed data
+
+    """
+    prev = None
+    for entry in data:
+        if prev is not None and check_duplicate(prev, entry):
+            prev.played_duration += entry.played_duration
+            continue
+        if prev is not None:
+            yield prev
+        prev = entry
+    if prev is not None:
+        yield prev
+
+
+def iter_months(
+    data: Iterable[Detection], months: list[tuple[date, date]]
+) -> Iterator[tuple[date, list[Detection]]]:
+    """Split chronological data into months.
+
+    Each month is yielded as soon as the data has moved past it, so it can be
+    processed while later months are still being fetched. Months without any
+    entries are yielded with an empty list.
+
+    Arguments:
+    ---------
+        data: The data provided by ACRClient, in chronological order
+        months: The months as returned by `get_months()`
+
+    Returns:
+    -------
+        months: The first day of each month with the entries of the month
+
+    """
+    pending = iter(months)
+    month_start, month_end = next(pending)
+    entries: list[Detection] = []
+    for entry in data:
+        day = entry.timestamp_local.date()
+        while day > month_end:
+            yield month_start, entries
+            entries = []
+            month_start, month_end = next(pending)
+        entries.append(entry)
+    yield month_start, entries
+    for month_start, _ in pending:
+        yield month_start, []
+
+
+def parse_release_date(release_date: str = "") -> date | None:
+    """Parse a release_date from ACR if it has day precision."""
     if len(release_date) == 10:  # noqa: PLR2004
-        # we can make it look like what suisa has in their examples if it's the
-        # right length
         try:
-            return datetime.strptime(release_date, "%Y-%m-%d").strftime("%Y%m%d")  # noqa: DTZ007
+            return date.fromisoformat(release_date)
         except ValueError:
-            return ""
+            return None
     # we discard other records since there is no way to convert records like a plain
     # year into dd/mm/yyyy properly without further guidance from whomever ingests
     # the data, in some cases this means we discard data that only contain a year
     # since they dont have that amount of precision.
-    return ""
+    return None
+
+
+def funge_release_date(release_date: str = "") -> str:
+    """Make a release_date from ACR conform to what seems to be the spec."""
+    # we can make it look like what suisa has in their examples if it's the
+    # right length
+    parsed = parse_release_date(release_date)
+    return parsed.strftime("%Y%m%d") if parsed else ""
 
 
 def get_artist(music: dict) -> str:
@@ -268,6 +544,8 @@ def get_composer(music: dict) -> str:
 
 def get_isrc(music: dict) -> str:
     """Get a valid ISRC from the music record or return an empty string."""
+    from iso3901 import ISRC  # noqa: PLC0415
+
     isrc = ""
     if music.get("external_ids", {}).get("isrc"):
         isrc = music.get("external_ids", {}).get("isrc")
@@ -291,164 +569,354 @@ def get_isrc(music: dict) -> str:
     return isrc
 
 
-def get_csv(data: list, settings: Settings) -> str:
-    """Create SUISA compatible csv data.
+class Track(NamedTuple):
+    """The fields of a report row that only depend on the detected track."""
+
+    title: str | None
+    composer: str
+    artist: str
+    isrc: str
+    label: str | None
+    upc: str
+    album: str
+    cd_id: str
+    release_date: date | None
+
+
+def get_track(music: dict) -> Track:
+    """Derive the per track fields of a report row from a music dict.
 
     Arguments:
     ---------
-        data: To data to create csv from
+        music: music dict from API
+
+    Returns:
+    -------
+        track: the fields of the track
+
+    """
+    artist = get_artist(music)
+    composer = get_composer(music)
+
+    works_composer = ", ".join(
+        [
+            c["name"]
+            for c in [
+                item
+                for sublist in [w["creators"] for w in music.get("works", [])]
+                for item in sublist
+            ]
+            if c.get("role", "") in ["C", "Composer", "W", "Writer"]
+        ],
+    )
+    if works_composer and (not composer or composer == artist):
+        composer = works_composer
+
+    # load some "best-effort" fields
+    album = music.get("album", "")
+    cd_id = ""
+    # it's a dict if it's from the ACRCloud bucket, a string if from a custom bucket
+    if isinstance(album, dict):
+        cd_id = album.get("cd_id", "")
+        album = album.get("name", "")
+
+    return Track(
+        title=music.get("title"),
+        composer=composer,
+        artist=artist,
+        isrc=get_isrc(music),
+        label=music.get("label"),
+        upc=music.get("external_ids", {}).get("upc", ""),
+        album=album,
+        cd_id=cd_id,
+        release_date=parse_release_date(music.get("release_date", "")),
+    )
+
+
+class TrackCache:
+    """Bounded LRU cache of `get_track()` results.
+
+    Tracks are keyed by their acrid, music dicts without an acrid by a hash of
+    their content. A cached track is only used if it was derived from an equal
+    music dict, so edited custom files that keep their acrid are picked up.
+
+    Arguments:
+    ---------
+        max_size: Maximum number of tracks to keep.
+
+    """
+
+    def __init__(self: Self, max_size: int = 4096) -> None:
+        """Create an empty cache."""
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._tracks: OrderedDict[str, tuple[dict, Track]] = OrderedDict()
+
+    def get(self: Self, music: dict) -> Track:
+        """Get the track of a music dict, deriving it on a miss."""
+        key = (
+            music.get("acrid")
+            or hashlib.sha256(json.dumps(music, sort_keys=True).encode()).hexdigest()
+        )
+        cached = self._tracks.get(key)
+        if cached is not None and (cached[0] is music or cached[0] == music):
+            self._tracks.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        track = get_track(music)
+        self._tracks[key] = (music, track)
+        self._tracks.move_to_end(key)
+        if len(self._tracks) > self.max_size:
+            self._tracks.popitem(last=False)
+        return track
+
+
+def get_rows(
+    data: Iterable[Detection],
+    settings: Settings,
+    tracks: TrackCache,
+    crids: CridGenerator | None = None,
+    *,
+    progress: bool = True,
+) -> Iterator[list]:
+    """Create typed rows of SUISA compatible report data.
+
+    Dates are returned as `date` objects (or None if unknown) so each output
+    format can render them as it needs to, all other values are strings.
+
+    Arguments:
+    ---------
+        data: To data to create rows from
         settings: The settings provided to the script
+        tracks: Cache for the per track fields, its hits and misses are counted
+            by the caller
+        crids: CRID generator for cridlib mode, a new one is used if not set
+        progress: Show a progress bar
 
     Returns:
     -------
-        csv: The converted data
+        rows: One row per entry, in the order of `HEADER`
 
     """
+    from tqdm import tqdm  # noqa: PLC0415
+
     station_name = settings.station.name
-    header = [
-        "Sender",
-        "Titel des Musikwerks",
-        "Name des Komponisten",
-        "Interpret(en)",
-        "Sendedatum",
-        "Sendedauer",
-        "Sendezeit",
-        "ISRC",
-        "Label",
-        "Identifikationsnummer",
-        "Eigenaufnahmen",
-        "EAN / GTIN",
-        "Albumtitel / Titel des Tonträgers",
-        "Aufnahmedatum",
-        "Aufnahmeland",
-        "Erstveröffentlichungsdatum",
-        "Katalog-Nummer / CD ID",
-        "Werkverzeichnisangaben",
-        "Bestellnummer",
-        "Veröffentlichungsland",
-        "Liveaufnahme",
-    ]
-    csv = StringIO()
-    csv_writer = writer(csv, dialect="excel")
-    csv_writer.writerow(header)
+    if settings.crid_mode != IdentifierMode.cridlib:
+        crids = None
+    elif crids is None:
+        from .crid import CridGenerator  # noqa: PLC0415
+
+        crids = CridGenerator()
 
-    for entry in tqdm(data, desc="preparing tracks for report"):
-        metadata = entry.get("metadata")
-        # parse timestamp
-        timestamp = datetime.strptime(metadata.get("timestamp_local"), ACRClient.TS_FMT)  # noqa: DTZ007
+    for entry in tqdm(data, desc="preparing tracks for report", disable=not progress):
+        timestamp = entry.timestamp_local
 
-        ts_date = timestamp.strftime("%Y-%m-%d")
         ts_time = timestamp.strftime("%H:%M:%S")
-        hours, remainder = divmod(metadata.get("played_duration"), 60 * 60)
+        hours, remainder = divmod(entry.played_duration, 60 * 60)
         minutes, seconds = divmod(remainder, 60)
         # required format of duration field: hh:mm:ss
         duration = f"{hours:02}:{minutes:02}:{seconds:02}"
 
-        try:
-            music = metadata.get("music")[0]
-        except TypeError:
-            music = metadata.get("custom_files")[0]
-        title = music.get("title")
-
-        artist = get_artist(music)
-        composer = get_composer(music)
-
-        works_composer = ", ".join(
-            [
-                c["name"]
-                for c in [
-                    item
-                    for sublist in [w["creators"] for w in music.get("works", [])]
-                    for item in sublist
-                ]
-                if c.get("role", "") in ["C", "Composer", "W", "Writer"]
-            ],
-        )
-        if works_composer and (not composer or composer == artist):
-            composer = works_composer
-
-        isrc = get_isrc(music)
-        label = music.get("label")
-
-        # load some "best-effort" fields
-        album = music.get("album", "")
-        cd_id = ""
-        # it's a dict if it's from the ACRCloud bucket, a string if from a custom bucket
-        if isinstance(album, dict):
-            cd_id = album.get("cd_id", "")
-            album = album.get("name", "")
-        upc = music.get("external_ids", {}).get("upc", "")
-        release_date = funge_release_date(music.get("release_date", ""))
+        music = entry.music
+        track = tracks.get(music)
 
         local_id: str = ""
-        # cridlib only supports timezone-aware datetime values, so we convert one
-        timestamp_utc = pytz.utc.localize(
-            datetime.strptime(metadata.get("timestamp_utc"), ACRClient.TS_FMT),  # noqa: DTZ007
-        )
+        # cridlib only supports timezone-aware datetime values
+        timestamp_utc = entry.timestamp_utc
         # we include the acrid in our CRID so we know about the data's provenience
         # in case any questions about the data we delivered are asked
         acrid = music.get("acrid")
 
-        if settings.crid_mode == IdentifierMode.cridlib:
-            local_id = str(
-                cridlib.get(timestamp=timestamp_utc, fragment=f"acrid={acrid}")
-            )
+        if crids is not None:
+            local_id = crids.get(timestamp_utc, fragment=f"acrid={acrid}")
         elif settings.crid_mode == IdentifierMode.local:
             local_id = f"{timestamp_utc.isoformat()}#acrid={acrid}"
 
-        csv_writer.writerow(
-            [
-                station_name,
-                title,
-                composer,
-                artist,
-                ts_date,
-                duration,
-                ts_time,
-                isrc,
-                label,
-                local_id,
-                "nein",  # Eigenaufnahmen
-                upc,
-                album,
-                "",  # Aufnahmedatum
-                "",  # Aufnahmeland
-                release_date,
-                cd_id,
-                "",  # Werkverzeichnisangaben
-                "",  # Bestellnummer
-                "",  # Veröffentlichungsland
-                "",  # Liveaufnahme
-            ],
-        )
-    return csv.getvalue()
+        yield [
+            station_name,
+            track.title,
+            track.composer,
+            track.artist,
+            timestamp.date(),  # Sendedatum
+            duration,
+            ts_time,
+            track.isrc,
+            track.label,
+            local_id,
+            "nein",  # Eigenaufnahmen
+            track.upc,
+            track.album,
+            None,  # Aufnahmedatum
+            "",  # Aufnahmeland
+            track.release_date,
+            track.cd_id,
+            "",  # Werkverzeichnisangaben
+            "",  # Bestellnummer
+            "",  # Veröffentlichungsland
+            "",  # Liveaufnahme
+        ]
+
+
+@cache
+def _worker_caches() -> tuple[TrackCache, CridGenerator]:
+    """Get the caches shared by all chunks rendered in a worker process."""
+    from .crid import CridGenerator  # noqa: PLC0415
+
+    return TrackCache(), CridGenerator()
+
+
+def _render_rows(
+    chunk: list[Detection], settings: Settings
+) -> tuple[list[list], int, int]:
+    """Render a chunk of rows in a worker process.
+
+    The metrics of worker processes are lost, so the track cache hits and
+    misses of the chunk are returned along with its rows.
+    """
+    tracks, crids = _worker_caches()
+    hits, misses = tracks.hits, tracks.misses
+    # a bar per chunk would only garble the output
+    rows = list(get_rows(chunk, settings, tracks, crids, progress=False))
+    return rows, tracks.hits - hits, tracks.misses - misses
+
+
+def _count_tracks(hits: int, misses: int) -> None:
+    """Count the track cache hits and misses of rendered rows."""
+    metrics.count("track_cache_hits", hits)
+    metrics.count("track_cache_misses", misses)
+
+
+def _rendered(future: Future[tuple[list[list], int, int]]) -> list[list]:
+    """Get the rows of a chunk rendered in a worker process."""
+    rows, hits, misses = future.result()
+    _count_tracks(hits, misses)
+    return rows
+
 
+def iter_rows(data: Iterable[Detection], settings: Settings) -> Iterator[list]:
+    """Create typed rows of SUISA compatible report data in one or more processes.
 
-def get_xlsx(data: list[dict], settings: Settings) -> BytesIO:
-    """Create SUISA compatible xlsx data.
+    With more than one worker the data is split into chunks of
+    `ROW_CHUNK_SIZE` detections that are rendered by `get_rows()` in a
+    process pool. Rows are yielded in the order of data, so the output is the
+    same as with a single worker. Only a few chunks per worker are in flight
+    at once, data is still consumed as it arrives. Workers are started from a
+    fork server (or spawned where there is none) rather than forked from this
+    process, which may run other threads, e.g. batch jobs or fetches.
 
     Arguments:
     ---------
-        data: The data to create xlsx from
+        data: To data to create rows from
         settings: The settings provided to the script
 
     Returns:
     -------
-        xlsx: The converted data as BytesIO object
+        rows: One row per entry, in the order of `HEADER`
 
     """
-    csv = get_csv(data, settings=settings)
-    csv_reader = reader(StringIO(csv))
+    import multiprocessing  # noqa: PLC0415
+    from concurrent.futures import ProcessPoolExecutor  # noqa: PLC0415
+
+    if settings.workers <= 1:
+        tracks = TrackCache()
+        try:
+            yield from get_rows(data, settings, tracks)
+        finally:
+            _count_tracks(tracks.hits, tracks.misses)
+        return
+    entries = iter(data)
+    render = partial(_render_rows, settings=settings)
+    pending: deque[Future[tuple[list[list], int, int]]] = deque()
+    method = (
+        "forkserver"
+        if "forkserver" in multiprocessing.get_all_start_methods()
+        else "spawn"
+    )
+    with ProcessPoolExecutor(
+        max_workers=settings.workers, mp_context=multiprocessing.get_context(method)
+    ) as executor:
+        while chunk := list(islice(entries, ROW_CHUNK_SIZE)):
+            pending.append(executor.submit(render, chunk))
+            if len(pending) > 2 * settings.workers:
+                yield from _rendered(pending.popleft())
+        while pending:
+            yield from _rendered(pending.popleft())
+
+
+def write_csv_data(
+    data: Iterable[Detection], settings: Settings, output: TextIO
+) -> None:
+    """Write SUISA compatible csv data to output row by row.
 
-    xlsx = BytesIO()
-    workbook: Workbook = Workbook()
+    Arguments:
+    ---------
+        data: To data to create csv from
+        settings: The settings provided to the script
+        output: The file like object to write to
+
+    """
+    csv_writer = writer(output, dialect="excel")
+    csv_writer.writerow(HEADER)
+
+    for row in metrics.timed("render", iter_rows(data, settings)):
+        metrics.count("rows")
+        row[SENDEDATUM] = row[SENDEDATUM].strftime("%Y-%m-%d")
+        for col in DATE_COLUMNS:
+            row[col] = row[col].strftime("%Y%m%d") if row[col] else ""
+        csv_writer.writerow(row)
+
+
+def write_xlsx_data(
+    data: Iterable[Detection], settings: Settings, output: str | IO[bytes]
+) -> None:
+    """Write SUISA compatible xlsx data to output.
+
+    The workbook is written in openpyxl's write-only mode, cells are streamed
+    to output with their style and date format set as they are created. Since
+    column widths have to be written before any rows, they are estimated from
+    the first `XLSX_WIDTH_SAMPLE` rows, only those are held in memory.
+
+    Arguments:
+    ---------
+        data: The data to create xlsx from
+        settings: The settings provided to the script
+        output: The filename or binary file like object to write to
+
+    """
+    rows = metrics.timed("render", iter_rows(data, settings))
+    sample = list(islice(rows, XLSX_WIDTH_SAMPLE))
+
+    # Try to approximate the required width by finding the longest values per column
+    widths = [len(title) for title in HEADER]
+    for row in sample:
+        for col, value in enumerate(row):
+            if value:
+                widths[col] = max(widths[col], len(str(value)))
+
+    # the remaining rows are rendered while saving, on the render stage still
+    with metrics.stage("xlsx_save"):
+        _save_xlsx(chain(sample, rows), widths, output)
+
+
+def _save_xlsx(
+    rows: Iterable[list], widths: list[int], output: str | IO[bytes]
+) -> None:
+    """Write rendered rows to a styled write-only workbook."""
+    from openpyxl import Workbook  # noqa: PLC0415
+    from openpyxl.cell import WriteOnlyCell  # noqa: PLC0415
+    from openpyxl.styles import Border, Font, PatternFill, Side  # noqa: PLC0415
+    from openpyxl.utils import get_column_letter  # noqa: PLC0415
+
+    workbook = Workbook(write_only=True)
     workbook.iso_dates = True
-    if not workbook.active:  # pragma: no cover
-        raise RuntimeError
-    worksheet: Worksheet = workbook.active  # type: ignore[assignment]
+    worksheet = workbook.create_sheet("Sheet")
 
-    for row in csv_reader:
-        worksheet.append(row)
+    # apply estimated width to each column
+    padding = 3
+    for col, width in enumerate(widths, start=1):
+        worksheet.column_dimensions[get_column_letter(col)].width = width + padding
 
     # the columns that should be styled as required (grey background)
     required_columns = [
@@ -479,87 +947,156 @@ def get_xlsx(data: list[dict], settings: Settings) -> BytesIO:
     border = Border(top=side, left=side, right=side, bottom=side)
     required_fill = PatternFill("solid", bgColor="bfbfbf", fgColor="bfbfbf")
     subsdiary_fill = PatternFill("solid", bgColor="ebf1de", fgColor="ebf1de")
-    for cell in worksheet[1]:  # xlsx is 1-indexed
+    header = []
+    for title in HEADER:
+        cell = WriteOnlyCell(worksheet, value=title)
         cell.font = font
         cell.border = border
-        if cell.value in required_columns:
+        if title in required_columns:
             cell.fill = required_fill
-        elif cell.value in subsidiary_columns:
+        elif title in subsidiary_columns:
             cell.fill = subsdiary_fill
+        header.append(cell)
+    worksheet.append(header)
+
+    # "Sendedatum" as well as "Aufnahmedatum" and "Erstveröffentlichungsdatum"
+    date_columns = (SENDEDATUM, *DATE_COLUMNS)
+    for row in rows:
+        metrics.count("rows")
+        for col in date_columns:
+            row[col] = WriteOnlyCell(worksheet, value=row[col])
+            row[col].number_format = "dd.mm.yyyy"
+        worksheet.append(row)
 
-    # Try to approximate the required width by finding the longest values per column
-    dims: dict[str, int] = {}
-    calc_row: tuple[Cell | MergedCell, ...]
-    for calc_row in worksheet.rows:
-        for cell in calc_row:
-            if isinstance(cell, Cell) and cell.value:
-                dims[cell.column_letter] = max(
-                    (dims.get(cell.column_letter, 0), len(str(cell.value))),
-                )
-    # apply estimated width to each column
-    padding = 3
-    for col, value in dims.items():
-        worksheet.column_dimensions[col].width = value + padding
+    workbook.save(output)
 
-    reformat_start_date_in_xlsx(worksheet)
 
-    workbook.save(xlsx)
-    return xlsx
+@contextmanager
+def replace_on_success(filename: str) -> Iterator[Path]:
+    """Yield a temporary path that replaces filename once the body succeeded.
 
+    Reports are written while the data streams in, so a failure part way
+    through would leave a truncated report. Writing next to the target and
+    replacing it atomically keeps the previous file intact instead.
+
+    Arguments:
+    ---------
+        filename: The file to replace.
+
+    """
+    path = Path(filename)
+    tmp = path.with_name(f".{path.name}.tmp")
+    try:
+        yield tmp
+        tmp.replace(path)
+    finally:
+        tmp.unlink(missing_ok=True)
 
-def reformat_start_date_in_xlsx(worksheet: Worksheet) -> None:
-    """Set date number formatting on relevant columns."""
-    for idx, row in enumerate(worksheet.rows):
-        # skip first row
-        if idx < 1:
-            continue
 
-        # turn the str from the CSV into a real datetime.datetime in Sendedatum column
-        row[4].value = datetime.strptime(  # noqa: DTZ007
-            f"{row[4].value} {row[6].value}", "%Y-%m-%d %H:%M:%S"
-        ).date()  # pyright: ignore[reportAttributeAccessIssue]
-        # adjust the formatting
-        row[4].number_format = "dd.mm.yyyy"
+def write_report_data(
+    data: Iterable[Detection], settings: Settings, output: IO[bytes]
+) -> None:
+    """Write the report in the configured file format to a binary stream.
+
+    Arguments:
+    ---------
+        data: The data to create the report from
+        settings: The settings provided to the script
+        output: The binary file like object to write to
 
-        # same thing for date fields "Aufnahmedatum" and "Erstveröffentlichungsdatum"
-        for col_idx in [13, 15]:
-            row[col_idx].value = (
-                datetime.strptime(  # noqa: DTZ007
-                    str(row[col_idx].value), "%Y%m%d"
-                ).date()
-                if row[col_idx].value
-                else None
-            )  # pyright: ignore[reportAttributeAccessIssue]
-            row[col_idx].number_format = "dd.mm.yyyy"
+    """
+    if settings.file.format == FileFormat.xlsx:
+        write_xlsx_data(data, settings, output)
+        return
+    text = TextIOWrapper(output, encoding="utf-8", newline="", write_through=True)
+    write_csv_data(data, settings, text)
+    # keep output open for the caller
+    text.detach()
 
 
-def write_csv(filename: str, csv: BytesIO | str) -> None:  # pragma: no cover
-    """Write contents of `csv` to file.
+@contextmanager
+def compressed(
+    output: IO[bytes], name: str, compression: Compression
+) -> Iterator[IO[bytes]]:
+    """Compress everything written to the yielded stream into output.
 
     Arguments:
     ---------
-        filename: The file to write to.
-        csv: The data to write to `filename`.
+        output: The binary file like object to write the compressed data to
+        name: The name of the compressed file
+        compression: The compression to use, zip or gzip
 
     """
-    with Path(filename).open("w", encoding="utf-8") as csvfile:
-        csvfile.write(str(csv))
+    if compression == Compression.gzip:
+        from gzip import GzipFile  # noqa: PLC0415
+
+        with GzipFile(filename=name, mode="wb", fileobj=output, mtime=0) as stream:
+            yield cast("IO[bytes]", stream)
+        return
+    from zipfile import ZIP_DEFLATED, ZipFile  # noqa: PLC0415
+
+    with (
+        ZipFile(output, "w", ZIP_DEFLATED) as archive,
+        archive.open(name, "w") as stream,
+    ):
+        yield stream
+
 
+def get_attachment(
+    data: Iterable[Detection], settings: Settings, filename: str
+) -> tuple[BytesIO, Compression]:
+    """Render the report to attach to an email, compressed as configured.
 
-def write_xlsx(filename: str, xlsx: BytesIO) -> None:  # pragma: no cover
-    """Write contents of `xlsx` to file.
+    The report is compressed while it is rendered, so the uncompressed
+    report is never held in memory next to the compressed one. With
+    `compress_above` it is spooled to a temporary file instead, which moves
+    to disk once it grows past the threshold and gets zipped from there.
 
     Arguments:
     ---------
-        filename: The file to write to.
-        xlsx: The data to write to `filename`.
+        data: The data to create the report from
+        settings: The settings provided to the script
+        filename: The filename of the report
+
+    Returns:
+    -------
+        payload: The (compressed) report
+        compression: The compression used for payload
 
     """
-    with Path(filename).open("wb") as xlsxfile:
-        xlsxfile.write(xlsx.getvalue())
+    from shutil import copyfileobj  # noqa: PLC0415
+    from tempfile import SpooledTemporaryFile  # noqa: PLC0415
+
+    name = Path(filename).name
+    compression = settings.email.compression
+    threshold = settings.email.compress_above
+    payload = BytesIO()
+    if compression != Compression.none:
+        with compressed(payload, name, compression) as stream:
+            write_report_data(data, settings, stream)
+    elif not threshold:
+        write_report_data(data, settings, payload)
+    else:
+        with SpooledTemporaryFile(max_size=threshold) as spool:
+            write_report_data(data, settings, spool)
+            size = spool.tell()
+            spool.seek(0)
+            if size > threshold:
+                compression = Compression.zip
+                with compressed(payload, name, compression) as stream:
+                    copyfileobj(spool, stream)
+            else:
+                copyfileobj(spool, payload)
+    metrics.count("attachment_bytes", payload.tell())
+    return payload, compression
 
 
-def get_email_attachment(filename: str, filetype: str, data: BytesIO | str) -> MIMEBase:
+def get_email_attachment(
+    filename: str,
+    filetype: str,
+    data: BytesIO | str,
+    compression: Compression = Compression.none,
+) -> MIMEBase:
     """Create attachment based on required filetype and data.
 
     Arguments:
@@ -567,11 +1104,22 @@ def get_email_attachment(filename: str, filetype: str, data: BytesIO | str) -> M
         filename: The filename of the attachment
         filetype: The filetype of the attachment
         data: The attachment data
+        compression: The compression of data
 
     """
+    from email.encoders import encode_base64  # noqa: PLC0415
+    from email.mime.base import MIMEBase  # noqa: PLC0415
+
+    name = Path(filename).name
     maintype = "application"
     subtype = "vnd.ms-excel"
-    if filetype == "csv":
+    if compression == Compression.zip:
+        subtype = "zip"
+        name = Path(name).with_suffix(".zip").name
+    elif compression == Compression.gzip:
+        subtype = "gzip"
+        name = f"{name}.gz"
+    elif filetype == "csv":
         maintype = "text"
         subtype = "csv"
 
@@ -582,9 +1130,7 @@ def get_email_attachment(filename: str, filetype: str, data: BytesIO | str) -> M
     part = MIMEBase(maintype, subtype)
     part.set_payload(payload)
     encode_base64(part)
-    part.add_header(
-        "Content-Disposition", f"attachment; filename={Path(filename).name}"
-    )
+    part.add_header("Content-Disposition", f"attachment; filename={name}")
     return part
 
 
@@ -598,6 +1144,7 @@ def create_message(  # noqa: PLR0913
     data: BytesIO | str,
     cc: str | None = None,
     bcc: str | None = None,
+    compression: Compression = Compression.none,
 ) -> MIMEMultipart:
     """Create email message.
 
@@ -612,8 +1159,13 @@ def create_message(  # noqa: PLR0913
         data: The attachment data.
         cc: cc recipient
         bcc: bcc recipient
+        compression: The compression of the attachment data
 
     """
+    from email.mime.multipart import MIMEMultipart  # noqa: PLC0415
+    from email.mime.text import MIMEText  # noqa: PLC0415
+    from email.utils import formatdate  # noqa: PLC0415
+
     msg = MIMEMultipart()
     msg["From"] = sender
     msg["To"] = recipient
@@ -625,7 +1177,7 @@ def create_message(  # noqa: PLR0913
     msg["Subject"] = subject
     # set body
     msg.attach(MIMEText(text))
-    msg.attach(get_email_attachment(filename, filetype, data))
+    msg.attach(get_email_attachment(filename, filetype, data, compression))
 
     return msg
 
@@ -637,7 +1189,9 @@ def send_message(
     login: str | None = None,
     password: str | None = None,
 ) -> None:
-    """Send email.
+    """Send email over a new connection.
+
+    Use a `Mailer` to send several emails over the same connection.
 
     Arguments:
     ---------
@@ -648,38 +1202,334 @@ def send_message(
         password: The password for `sender`@`server`.
 
     """
-    with SMTP(host=server, port=port) as smtp:
-        smtp.starttls()
-        if password:
-            if login:
-                smtp.login(login, password)
-            else:
-                smtp.login(msg["From"], password)
-        smtp.send_message(msg)
+    from .mailer import Mailer  # noqa: PLC0415
+
+    with Mailer(server, port, login, password) as mailer:
+        mailer.send(msg)
 
 
 def main(settings: Settings) -> None:  # pragma: no cover
     """ACRCloud client for SUISA reporting @ RaBe."""
+    import asyncio  # noqa: PLC0415
+
+    if settings.batch:
+        if not echo_summary(asyncio.run(run_batch(settings))):
+            sys.exit(1)
+        return
+    if settings.date.backfill:
+        if not echo_summary(run_backfill(settings)):
+            sys.exit(1)
+        return
     validate_arguments(settings)
 
     start_date, end_date = parse_date(settings)
-    filename = parse_filename(settings, start_date)
 
-    client = ACRClient(bearer_token=str(settings.acr.bearer_token))
-    data = client.get_interval_data(
-        settings.acr.project_id,
-        str(settings.acr.stream_id),
-        start_date,
-        end_date,
-        timezone=settings.l10n.timezone,
+    data = iter_interval_data(settings, start_date, end_date)
+    report(settings, data, start_date)
+
+
+def iter_interval_data(
+    settings: Settings, start_date: date, end_date: date
+) -> Iterator[Detection]:
+    """Yield the detections of an interval from the source configured in settings.
+
+    Detections are either fetched from ACRCloud or read from the local store
+    filled by the collect command. The store must have been collected up to
+    the last day of the interval, a report from a lagging collector would be
+    silently incomplete.
+
+    Arguments:
+    ---------
+        settings: the settings provided to the script
+        start_date: the start date of the interval
+        end_date: the end date of the interval
+
+    Returns:
+    -------
+        detections: the detections from start_date to end_date
+
+    Raises:
+    ------
+        RuntimeError: if the store has not been collected up to end_date
+
+    """
+    if settings.source == DataSource.store:
+        from .detection import interval_window  # noqa: PLC0415
+        from .store import DetectionStore  # noqa: PLC0415
+
+        stream_id = str(settings.acr.stream_id)
+        # the last UTC day the local interval reaches into
+        dates, _ = interval_window(start_date, end_date, settings.l10n.timezone)
+        with DetectionStore(settings.store.path) as store:
+            watermark = store.get_watermark(settings.acr.project_id, stream_id)
+            if not watermark or watermark < dates[-1]:
+                msg = (
+                    f"stream {stream_id} is collected up to {watermark or 'never'},"
+                    f" the report needs {dates[-1]}, run collect or use --source acr"
+                )
+                raise RuntimeError(msg)
+            yield from metrics.timed(
+                "load",
+                store.iter_interval_data(
+                    settings.acr.project_id,
+                    stream_id,
+                    start_date,
+                    end_date,
+                    timezone=settings.l10n.timezone,
+                ),
+            )
+        return
+    from .acrclient import ACRClient  # noqa: PLC0415
+
+    client = ACRClient(
+        bearer_token=str(settings.acr.bearer_token),
+        cache=get_cache(settings),
+        refresh=settings.cache.refresh,
+        transport=get_transport(settings),
     )
-    data = merge_duplicates(data)
-    if settings.file.format == FileFormat.xlsx:
-        data = get_xlsx(data, settings=settings)
-    elif settings.file.format == FileFormat.csv:
-        data = get_csv(data, settings=settings)
+    # waiting for the days fetched in other threads
+    yield from metrics.timed(
+        "load",
+        client.iter_interval_data(
+            settings.acr.project_id,
+            str(settings.acr.stream_id),
+            start_date,
+            end_date,
+            timezone=settings.l10n.timezone,
+            max_workers=settings.acr.max_workers,
+        ),
+    )
+
+
+async def run_batch(settings: Settings) -> list[tuple[str, int | Exception]]:
+    """Create the reports of all batch jobs in settings.
+
+    All jobs share a single client and connection pool. Their days are
+    fetched concurrently, at most `settings.acr.max_workers` at a time, and each
+    report is rendered as soon as its data is complete. Emails are sent over a
+    shared pool of SMTP connections. A failing job does not stop the others.
+
+    Arguments:
+    ---------
+        settings: the settings provided to the script
+
+    Returns:
+    -------
+        results: the name of each job with the number of fetched entries or
+            the exception the job failed with
+
+    """
+    import asyncio  # noqa: PLC0415
+
+    from .acrclient import AsyncACRClient  # noqa: PLC0415
+
+    validate_arguments(settings)
+
+    start_date, end_date = parse_date(settings)
+    jobs = [get_job_settings(settings, job) for job in settings.batch]
+
+    client = AsyncACRClient(
+        bearer_token=str(settings.acr.bearer_token),
+        max_concurrency=settings.acr.max_workers,
+        cache=get_cache(settings),
+        refresh=settings.cache.refresh,
+        transport=get_transport(settings),
+    )
+    mailer = get_mailer(settings)
+
+    async def _run(job: Settings) -> int | Exception:
+        try:
+            if job.source == DataSource.store:
+                # reading the store blocks, keep the other jobs going meanwhile
+                data = await asyncio.to_thread(
+                    list, iter_interval_data(job, start_date, end_date)
+                )
+            else:
+                data = await client.get_interval_data(
+                    job.acr.project_id,
+                    job.acr.stream_id,
+                    start_date,
+                    end_date,
+                    timezone=job.l10n.timezone,
+                )
+            await asyncio.to_thread(report, job, data, start_date, mailer)
+        except Exception as ex:  # noqa: BLE001
+            return ex
+        return len(data)
+
+    with mailer:
+        results = await asyncio.gather(*(_run(job) for job in jobs))
+    return [
+        (f"{job.station.name_short} ({job.acr.stream_id})", result)
+        for job, result in zip(jobs, results, strict=True)
+    ]
+
+
+def run_backfill(settings: Settings) -> list[tuple[str, int | Exception]]:
+    """Create one report per month from the start to the end date in settings.
+
+    The days of all months are fetched once by a single client, so days at the
+    boundaries of months are not fetched twice. Each month is rendered in a
+    thread pool as soon as its data is complete while later months are still
+    being fetched. Reports are named like `--last-month` reports and emails are
+    sent over a shared pool of SMTP connections. A failing report does not stop
+    the others.
+
+    Arguments:
+    ---------
+        settings: the settings provided to the script
+
+    Returns:
+    -------
+        results: the filename of each report with the number of fetched
+            entries or the exception creating the report failed with
+
+    """
+    from concurrent.futures import ThreadPoolExecutor  # noqa: PLC0415
+
+    validate_arguments(settings)
+
+    start_date, end_date = parse_date(settings)
+    months = get_months(start_date, end_date)
+    # every month is reported like a --last-month report
+    month_settings = cast(
+        "Settings",
+        typed_settings.evolve(
+            settings,  # type: ignore[arg-type]
+            date={"last_month": True, "start": "", "end": "", "backfill": False},
+        ),
+    )
+
+    data = iter_interval_data(settings, months[0][0], months[-1][1])
+
+    def _report(month: date, entries: list[Detection]) -> int:
+        report(month_settings, entries, month, mailer)
+        return len(entries)
+
+    with (
+        get_mailer(settings) as mailer,
+        ThreadPoolExecutor(max_workers=settings.acr.max_workers) as executor,
+    ):
+        futures = [
+            (month, executor.submit(_report, month, entries))
+            for month, entries in iter_months(data, months)
+        ]
+    results: list[tuple[str, int | Exception]] = []
+    for month, future in futures:
+        name = parse_filename(month_settings, month)
+        try:
+            results.append((name, future.result()))
+        except Exception as ex:  # noqa: BLE001
+            results.append((name, ex))
+    return results
+
+
+def echo_summary(results: list[tuple[str, int | Exception]]) -> bool:
+    """Print a summary of a run creating several reports to stderr.
+
+    Arguments:
+    ---------
+        results: the results as returned by `run_batch()` or `run_backfill()`
+
+    Returns:
+    -------
+        True if all reports were created, False otherwise
+
+    """
+    failed = 0
+    for name, result in results:
+        if isinstance(result, Exception):
+            failed += 1
+            click.echo(f"{name}: failed: {result}", err=True)
+        else:
+            click.echo(f"{name}: {result} entries reported", err=True)
+    click.echo(f"{len(results) - failed} of {len(results)} reports created", err=True)
+    return not failed
+
+
+def collect(settings: Settings, client: ACRClient, store: DetectionStore) -> int:
+    """Collect the detections since the last watermark into the store.
+
+    The days from `settings.store.overlap` days before the watermark (or from
+    the start of the reporting period on the first run) up to today are
+    fetched concurrently. Only new detections are added. The watermark is
+    moved to the last day before today, the current day is fetched again on
+    the next run.
+
+    Arguments:
+    ---------
+        settings: the settings provided to the script
+        client: the client to fetch detections with
+        store: the store to add the detections to
+
+    Returns:
+    -------
+        added: the number of new detections
+
+    """
+    from concurrent.futures import ThreadPoolExecutor  # noqa: PLC0415
+
+    project_id = settings.acr.project_id
+    stream_id = str(settings.acr.stream_id)
+    today = datetime.now(tz=UTC).date()
+
+    watermark = store.get_watermark(project_id, stream_id)
+    if watermark:
+        start = watermark + timedelta(days=1 - settings.store.overlap)
+    else:
+        start, _ = parse_date(settings)
+    days = [start + timedelta(days=i) for i in range((today - start).days + 1)]
+
+    added = 0
+    fetch = partial(client.get_data, project_id, stream_id)
+    with ThreadPoolExecutor(max_workers=settings.acr.max_workers) as executor:
+        for day, detections in zip(days, executor.map(fetch, days), strict=True):
+            added += store.add(project_id, stream_id, detections)
+            if day < today:
+                store.set_watermark(project_id, stream_id, day)
+    return added
+
+
+def report(
+    settings: Settings,
+    data: Iterable[Detection],
+    start_date: date,
+    mailer: Mailer | None = None,
+) -> None:  # pragma: no cover
+    """Render the report from ACRCloud data and output it as configured.
+
+    Arguments:
+    ---------
+        settings: The settings provided to the script
+        data: The data provided by ACRClient
+        start_date: start of reporting period
+        mailer: The mailer to send emails with, a new one if unset
+
+    """
+    filename = parse_filename(settings, start_date)
+
+    data = metrics.timed("merge", iter_merge_duplicates(data))
+    # files and stdout are written while the data streams in
+    if settings.file.format == FileFormat.csv and settings.output == OutputMode.stdout:
+        write_csv_data(data, settings, sys.stdout)
+        return
+    if settings.file.format == FileFormat.csv and settings.output == OutputMode.file:
+        with (
+            replace_on_success(filename) as path,
+            path.open("w", encoding="utf-8", newline="") as csvfile,
+        ):
+            write_csv_data(data, settings, csvfile)
+        return
+    if settings.file.format == FileFormat.xlsx and settings.output == OutputMode.file:
+        with replace_on_success(filename) as path:
+            write_xlsx_data(data, settings, str(path))
+        return
 
     if settings.output == OutputMode.email:
+        payload, compression = get_attachment(data, settings, filename)
+        from babel.dates import format_date  # noqa: PLC0415
+        from dateutil.relativedelta import relativedelta  # noqa: PLC0415
+
         email_subject = Template(settings.email.subject).substitute(
             {
                 "station_name": settings.station.name,
@@ -722,29 +1572,19 @@ def main(settings: Settings) -> None:  # pragma: no cover
             text,
             filename,
             settings.file.format,
-            data,  # pyright: ignore[reportArgumentType]
+            payload,
             cc=settings.email.cc,
             bcc=settings.email.bcc,
+            compression=compression,
         )
-        send_message(
-            msg,
-            server=settings.email.server,
-            port=settings.email.port,
-            login=settings.email.username,
-            password=settings.email.password,
-        )
-
-    elif settings.output == OutputMode.file and settings.file.format == FileFormat.xlsx:
-        write_xlsx(filename, data)  # pyright: ignore[reportArgumentType]
-    elif settings.output == OutputMode.file and settings.file.format == FileFormat.csv:
-        write_csv(filename, data)  # pyright: ignore[reportArgumentType]
-    elif (
-        settings.output == OutputMode.stdout and settings.file.format == FileFormat.csv
-    ):
-        print(data)  # noqa: T201
+        if mailer:
+            mailer.send(msg)
+            return
+        with get_mailer(settings) as single:
+            single.send(msg)
 
 
-@click.command()
+@click.group(invoke_without_command=True)
 @typed_settings.click_options(
     Settings,
     loaders=typed_settings.default_loaders(
@@ -757,14 +1597,60 @@ def main(settings: Settings) -> None:  # pragma: no cover
     decorator_factory=OptionGroupFactory(),
     show_envvars_in_help=True,
 )
-def cli(settings: Settings) -> None:  # pragma: no cover
+@click.pass_context
+def cli(ctx: click.Context, settings: Settings) -> None:  # pragma: no cover
     """SUISA Sendemeldung.
 
     Create and send playout reports to SUISA.
 
     The reports are based on data from ACRCloud.
     """
-    main(settings)
+    from .profiling import StageProfiler  # noqa: PLC0415
+
+    if settings.metrics:
+        # written when the command (or a subcommand) ends, even if it failed
+        ctx.call_on_close(partial(metrics.write, settings.metrics))
+    if settings.profile.enabled:
+        if settings.batch or settings.date.backfill:
+            # cProfile can only profile one thread at a time
+            click.echo(
+                "warning: reports of batch jobs and backfills are rendered on"
+                " worker threads, only fetching is profiled",
+                err=True,
+            )
+        settings = get_profile_settings(settings)
+        profiler = StageProfiler(memory=settings.profile.memory)
+        metrics.profiler = profiler
+        prefix = Path(parse_filename(settings, parse_date(settings)[0])).with_suffix("")
+        ctx.call_on_close(partial(profiler.write, prefix))
+    if ctx.invoked_subcommand is None:
+        main(settings)
+
+
+@cli.command("collect")
+@typed_settings.pass_settings
+def collect_cli(settings: Settings) -> None:
+    """Collect new detections from ACRCloud into the local store.
+
+    Meant to run daily or hourly, options are passed before the command. The
+    streams of all batch jobs are collected if there are any.
+    """
+    from .acrclient import ACRClient  # noqa: PLC0415
+    from .store import DetectionStore  # noqa: PLC0415
+
+    validate_arguments(settings)
+
+    # the store replaces the cache, there is no need to keep the data twice
+    client = ACRClient(
+        bearer_token=str(settings.acr.bearer_token),
+        transport=get_transport(settings),
+    )
+    jobs = [get_job_settings(settings, job) for job in settings.batch] or [settings]
+    with DetectionStore(settings.store.path) as store:
+        for job in jobs:
+            added = collect(job, client, store)
+            metrics.count("detections_added", added)
+            click.echo(f"{job.acr.stream_id}: {added} new detections", err=True)
 
 
 if __name__ == "__main__":  # pragma: no cover
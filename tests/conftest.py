@@ -1,5 +1,19 @@
 """Pytest fixtures for suisa_sendemeldung tests."""
 
+import base64
+import gc
+import gzip
+import json
+import random
+import threading
+import time
+import timeit
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+from urllib.parse import parse_qs, urlparse
+
 import pytest
 
 from suisa_sendemeldung.settings import (
@@ -29,3 +43,401 @@ def settings():
             name_short="stationname",
         ),
     )
+
+
+class ACRStub:
+    """Local stand-in for the ACRCloud results endpoint.
+
+    Answers every day request with one entry at 13:12 UTC on that day unless
+    `days` contains a list of entries for the requested `YYYYmmdd` date.
+    Responses are gzipped if the client accepts it. `errors` may contain
+    `(status, headers)` tuples that are answered before any successful one.
+    """
+
+    def __init__(self):
+        self.days = {}
+        self.errors = []
+        self.requests = []
+        self.headers = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                day = parse_qs(url.query)["date"][0]
+                stub.requests.append((url.path, day))
+                stub.headers.append(dict(self.headers))
+                if stub.errors:
+                    status, headers = stub.errors.pop(0)
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                timestamp = f"{day[:4]}-{day[4:6]}-{day[6:]} 13:12:00"
+                data = stub.days.get(day, [{"metadata": {"timestamp_utc": timestamp}}])
+                body = json.dumps({"data": data}).encode()
+                self.send_response(200)
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def acr_stub():
+    """Run an ACRStub on a random local port for the duration of a test."""
+    stub = ACRStub()
+    thread = threading.Thread(target=stub.server.serve_forever, daemon=True)
+    thread.start()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+
+
+class SMTPHandler(StreamRequestHandler):
+    """Answer SMTP commands for the SMTPStub of the server."""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.stub = self.server.stub
+        with self.stub.lock:
+            self.stub.connections += 1
+        self.reply("220 stub ready")
+        self.open = True
+        for line in self.rfile:
+            verb, *args = line.decode().split()
+            getattr(self, f"smtp_{verb.lower()}", self.smtp_other)(*args)
+            if not self.open:
+                return
+
+    def smtp_ehlo(self, *_):
+        self.reply("250-stub")
+        self.reply("250 AUTH PLAIN")
+
+    def smtp_auth(self, _, response):
+        _, user, password = base64.b64decode(response).split(b"\0")
+        if password == b"wrong":
+            self.reply("535 denied")
+            return
+        with self.stub.lock:
+            self.stub.logins.append(user.decode())
+        self.reply("235 authenticated")
+
+    def smtp_mail(self, *_):
+        with self.stub.lock:
+            reply = self.stub.replies.pop(0) if self.stub.replies else "250 ok"
+        if reply == "drop":
+            self.open = False
+            return
+        self.reply(reply)
+
+    def smtp_data(self):
+        self.reply("354 go ahead")
+        lines = []
+        for line in self.rfile:
+            if line == b".\r\n":
+                break
+            lines.append(line)
+        with self.stub.lock:
+            self.stub.messages.append(b"".join(lines))
+            if self.stub.drop_after_data:
+                self.stub.drop_after_data = False
+                self.open = False
+                return
+        self.reply("250 queued")
+
+    def smtp_quit(self):
+        self.reply("221 bye")
+        self.open = False
+
+    def smtp_other(self, *_):
+        self.reply("250 ok")
+
+
+class SMTPStub:
+    """Local stand-in for an SMTP server.
+
+    Speaks just enough SMTP for smtplib to log in with AUTH PLAIN, where the
+    password `wrong` is refused, and to send messages. `replies` may contain
+    replies to MAIL commands that are answered before accepting any sender,
+    `drop` closes the connection instead. If `drop_after_data` is set, the
+    connection of the next message is closed after it has been received
+    instead of replying.
+    """
+
+    def __init__(self):
+        self.replies = []
+        self.drop_after_data = False
+        self.connections = 0
+        self.logins = []
+        self.messages = []
+        self.lock = threading.Lock()
+        self.server = ThreadingTCPServer(("127.0.0.1", 0), SMTPHandler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self.port = self.server.server_address[1]
+
+
+@pytest.fixture
+def smtp_stub():
+    """Run an SMTPStub on a random local port for the duration of a test."""
+    stub = SMTPStub()
+    thread = threading.Thread(target=stub.server.serve_forever, daemon=True)
+    thread.start()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+
+
+class Workload:
+    """Generator for realistic synthetic ACRCloud results.
+
+    Tracks are picked from a catalog with a long tail of rarely played
+    tracks. Some tracks are reported as runs of consecutive duplicate
+    detections like ACRCloud does for long plays. The result is deterministic
+    for a seed.
+
+    Arguments:
+    ---------
+        per_hour: Average number of tracks per hour.
+        duplicate_runs: Share of tracks detected as a run of 2 to 4 entries.
+        custom_files: Share of detections from the custom bucket (jingles).
+        works: Share of music items with `works` creators.
+        bad_isrc: Share of music items with a malformed or missing ISRC.
+        catalog: Number of distinct music tracks.
+        seed: Seed of the random generator.
+
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        per_hour=12,
+        duplicate_runs=0.2,
+        custom_files=0.1,
+        works=0.3,
+        bad_isrc=0.2,
+        catalog=2000,
+        seed=1993,
+    ):
+        self.per_hour = per_hour
+        self.duplicate_runs = duplicate_runs
+        self.custom_files = custom_files
+        self.rng = random.Random(seed)  # noqa: S311
+        self.music = [self._music(i, works, bad_isrc) for i in range(catalog)]
+        self.weights = [1 / (i + 1) for i in range(catalog)]
+        self.jingles = [
+            {
+                "acrid": f"jingle{i:04}",
+                "title": f"Jingle {i}",
+                "artist": "Station",
+                "album": "Station Jingles",
+                "release_date": "1993",
+            }
+            for i in range(20)
+        ]
+
+    def _isrc(self, i, bad_isrc):
+        isrc = f"CHA65{i % 100:02}{i:05}"
+        if self.rng.random() >= bad_isrc:
+            return self.rng.choice([isrc, isrc, isrc, f"ISRC{isrc}", [isrc]])
+        return self.rng.choice([None, "", "unknown", f"{isrc[:2]} {isrc[2:]}-x"])
+
+    def _music(self, i, works, bad_isrc):
+        artists = [{"name": f"Artist {i % 700}"}]
+        if i % 5 == 0:
+            artists.append({"name": f"Featuring {i % 300}"})
+        music = {
+            "acrid": f"{i:032x}",
+            "title": f"Title {i}",
+            "artists": artists,
+            "album": {"name": f"Album {i % 900}", "cd_id": f"CD{i:06}"},
+            "label": f"Label {i % 150}",
+            "release_date": f"{1960 + i % 64}-{1 + i % 12:02}-{1 + i % 28:02}",
+            "external_ids": {"isrc": self._isrc(i, bad_isrc), "upc": f"{i:012}"},
+            "contributors": {"composers": [f"Composer {i % 400}"]},
+            "external_metadata": {"spotify": {"track": {"id": f"{i:022}"}}},
+            "genres": [{"name": "Pop"}],
+            "score": 100,
+        }
+        if self.rng.random() < works:
+            music["works"] = [
+                {
+                    "creators": [
+                        {"name": f"Writer {i % 350}", "role": "W"},
+                        {"name": f"Composer {i % 400}", "role": "C"},
+                        {"name": f"Arranger {i % 50}", "role": "A"},
+                    ]
+                }
+            ]
+        return music
+
+    def _entry(self, timestamp, played_duration):
+        if self.rng.random() < self.custom_files:
+            key, items = "custom_files", [self.rng.choice(self.jingles)]
+        else:
+            # ACRCloud reports a few candidates, only the first one is reported
+            key = "music"
+            items = self.rng.choices(self.music, self.weights, k=self.rng.randint(1, 3))
+        return {
+            "metadata": {
+                "timestamp_utc": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                "played_duration": played_duration,
+                key: items,
+            },
+        }
+
+    def day(self, day):
+        """Get the results of a UTC day."""
+        entries = []
+        timestamp = datetime.combine(day, datetime.min.time())
+        end = timestamp + timedelta(days=1)
+        gap = 3600 / self.per_hour
+        while timestamp < end:
+            duration = self.rng.randint(60, int(gap))
+            runs = (
+                self.rng.randint(2, 4) if self.rng.random() < self.duplicate_runs else 1
+            )
+            entry = self._entry(timestamp, duration // runs)
+            for run in range(runs):
+                metadata = dict(entry["metadata"])
+                offset = timedelta(seconds=run * (duration // runs))
+                metadata["timestamp_utc"] = (timestamp + offset).strftime(
+                    "%Y-%m-%d %H:%M:%S"
+                )
+                entries.append({"metadata": metadata})
+            gap_to_next = max(duration, self.rng.uniform(0.5, 1.5) * gap)
+            timestamp += timedelta(seconds=gap_to_next)
+        return [
+            entry for entry in entries if entry["metadata"]["timestamp_utc"] < str(end)
+        ]
+
+    def days(self, start, days):
+        """Get the results of consecutive days keyed by `YYYYmmdd`."""
+        return {
+            f"{start + timedelta(days=n):%Y%m%d}": self.day(start + timedelta(days=n))
+            for n in range(days)
+        }
+
+
+@pytest.fixture(scope="session")
+def workload():
+    """Return a factory for synthetic ACRCloud results, see `Workload`."""
+    return Workload
+
+
+# the periods the benchmarks can be run for
+BENCHMARK_DAYS = {"week": 7, "month": 31, "year": 365}
+BENCHMARK_BASELINES = Path(__file__).parent / "__benchmarks__" / "baselines.json"
+
+
+def pytest_addoption(parser):
+    """Add the options of the benchmark suite."""
+    group = parser.getgroup("benchmarks")
+    group.addoption(
+        "--bench-period",
+        choices=list(BENCHMARK_DAYS),
+        default="week",
+        help="amount of synthetic data the benchmarks process (default: week)",
+    )
+    group.addoption(
+        "--bench-update",
+        action="store_true",
+        help="record the measured timings as new benchmark baselines",
+    )
+    group.addoption(
+        "--bench-tolerance",
+        type=float,
+        default=3.0,
+        help="factor a benchmark may be slower than its baseline (default: 3)",
+    )
+
+
+def _calibrate():
+    """Time a fixed pure Python workload to normalize timings across hosts."""
+
+    def _work():
+        counts = {}
+        for value in sorted(str(i) for i in range(100_000)):
+            counts[value[-1]] = counts.get(value[-1], 0) + 1
+        return counts
+
+    return min(timeit.repeat(_work, number=1, repeat=5))
+
+
+class Benchmark:
+    """Compare the runtime of hot paths to recorded baselines.
+
+    Timings are stored relative to a calibration workload, so baselines
+    recorded on one host apply to others. A benchmark fails if it is more
+    than `tolerance` times slower than its baseline.
+    """
+
+    def __init__(self, period, tolerance, *, update):
+        self.period = period
+        self.days = BENCHMARK_DAYS[period]
+        self.tolerance = tolerance
+        self.update = update
+        self.unit = _calibrate()
+        self.baselines = json.loads(BENCHMARK_BASELINES.read_text())
+        self.results = {}
+
+    def __call__(self, name, func, setup=lambda: None, repeat=3):
+        """Time func on inputs from setup and compare to the baseline of name."""
+        timings = []
+        for _ in range(repeat):
+            data = setup()
+            # like the calibration, time without garbage collection runs that
+            # depend on what other tests left on the heap
+            gc.collect()
+            gc.disable()
+            try:
+                start = time.perf_counter()
+                func(data)
+                timings.append(time.perf_counter() - start)
+            finally:
+                gc.enable()
+        relative = min(timings) / self.unit
+        self.results[name] = round(relative, 3)
+        baseline = self.baselines.get(self.period, {}).get(name)
+        if self.update or baseline is None:
+            return
+        assert relative <= baseline * self.tolerance, (
+            f"{name} ({self.period}) took {relative:.2f} units,"
+            f" the baseline is {baseline:.2f}"
+        )
+
+    def save(self):
+        """Record the results as the baselines of the period."""
+        self.baselines.setdefault(self.period, {}).update(self.results)
+        BENCHMARK_BASELINES.write_text(
+            json.dumps(self.baselines, indent=2, sort_keys=True) + "\n"
+        )
+
+
+@pytest.fixture(scope="session")
+def bench(request):
+    """Return the benchmark runner for the period selected on the command line."""
+    bench = Benchmark(
+        request.config.getoption("bench_period"),
+        request.config.getoption("bench_tolerance"),
+        update=request.config.getoption("bench_update"),
+    )
+    yield bench
+    if bench.update:
+        bench.save()
@@ -1,11 +1,17 @@
 """Tests for the ACR client module."""
 
-from datetime import date
+import asyncio
+import json
+from datetime import UTC, date, datetime, timedelta
 
+import pytest
+import requests
 import requests_mock
 from freezegun import freeze_time
 
 from suisa_sendemeldung import acrclient
+from suisa_sendemeldung.cache import DayCache
+from suisa_sendemeldung.metrics import metrics
 
 _ACR_URL = "https://eu-api-v2.acrcloud.com/api/bm-cs-projects/project-id/streams/stream-id/results"
 
@@ -49,6 +55,46 @@ def test_get_data():
     assert len(result) == 1
 
 
+def test_get_day_selects_fields():
+    """Test that ACRClient.get_day only keeps the fields reports need."""
+    data = {
+        "data": [
+            {
+                "metadata": {
+                    "timestamp_utc": "1993-03-01 13:12:00",
+                    "played_duration": 60,
+                    "music": [
+                        {
+                            "acrid": "a1",
+                            "title": "Uhrenvergleich",
+                            "external_metadata": {"spotify": {"id": "x" * 1000}},
+                        }
+                    ],
+                },
+                "stream_id": "stream-id",
+            }
+        ],
+        "meta": {"total": 1},
+    }
+    acr = acrclient.ACRClient("secret-key")
+    acr.CHUNK_SIZE = 16
+    metrics.reset()
+    with requests_mock.Mocker() as mock:
+        mock.get(_ACR_URL, json=data)
+        result = acr.get_day("project-id", "stream-id", date(1993, 3, 1))
+    assert metrics.counters == {"api_calls": 1, "api_bytes": len(json.dumps(data))}
+    assert list(metrics.stages) == ["fetch"]
+    assert result == [
+        {
+            "metadata": {
+                "timestamp_utc": "1993-03-01 13:12:00",
+                "played_duration": 60,
+                "music": [{"acrid": "a1", "title": "Uhrenvergleich"}],
+            }
+        }
+    ]
+
+
 def test_get_interval_data():
     """Test ACRClient.get_interval_data."""
     bearer_token = "secret-key"
@@ -133,3 +179,224 @@ def test_get_interval_data():
             "America/Nuuk",
         )
     assert len(result) == 0
+
+
+def test_get_interval_data_concurrent():
+    """Test ACRClient.get_interval_data with a worker pool keeps day order."""
+    bearer_token = "secret-key"
+
+    def _day(request, _):
+        day = request.qs["date"][0]
+        return {
+            "data": [
+                {
+                    "metadata": {
+                        "timestamp_utc": f"{day[:4]}-{day[4:6]}-{day[6:]} 13:12:00"
+                    }
+                }
+            ]
+        }
+
+    acr = acrclient.ACRClient(bearer_token)
+    with requests_mock.Mocker() as mock:
+        mock.get(_ACR_URL, json=_day)
+        result = acr.get_interval_data(
+            "project-id",
+            "stream-id",
+            date(1993, 3, 1),
+            date(1993, 3, 31),
+            max_workers=8,
+        )
+    timestamps = [entry.timestamp_utc for entry in result]
+    assert len(timestamps) == 31  # noqa: PLR2004
+    assert timestamps == sorted(timestamps)
+
+
+def test_async_client(acr_stub):
+    """Test AsyncACRClient against a local stub server."""
+    with freeze_time("1993-03-02"):
+        acr = acrclient.AsyncACRClient("secret-key", base_url=acr_stub.base_url)
+    assert acr.default_date == date(1993, 3, 1)
+
+    result = asyncio.run(acr.get_data(123, "stream-id"))
+    assert result[0].timestamp_local == datetime(1993, 3, 1, 13, 12, tzinfo=UTC)
+    assert acr_stub.requests == [
+        ("/api/bm-cs-projects/123/streams/stream-id/results", "19930301")
+    ]
+
+    # "1993-03-01 13:12:00 UTC" = "1993-03-01 14:12:00 Zurich" → trimmed
+    # "1993-03-01 23:30:00 UTC" = "1993-03-02 00:30:00 Zurich" → kept
+    acr_stub.days["19930301"] = [
+        {"metadata": {"timestamp_utc": "1993-03-01 13:12:00"}},
+        {"metadata": {"timestamp_utc": "1993-03-01 23:30:00"}},
+    ]
+    with freeze_time("1993-03-05"):
+        result = asyncio.run(
+            acr.get_interval_data(
+                123, "stream-id", date(1993, 3, 2), date(1993, 3, 4), "Europe/Zurich"
+            )
+        )
+    assert [f"{entry.timestamp_local:%Y-%m-%d %H:%M:%S}" for entry in result] == [
+        "1993-03-02 00:30:00",
+        "1993-03-02 14:12:00",
+        "1993-03-03 14:12:00",
+        "1993-03-04 14:12:00",
+    ]
+
+
+def test_async_client_multiplexes_streams(acr_stub):
+    """Several streams can be fetched on one event loop."""
+    acr = acrclient.AsyncACRClient(
+        "secret-key", base_url=acr_stub.base_url, max_concurrency=2
+    )
+
+    async def _fetch():
+        return await asyncio.gather(
+            acr.get_interval_data(123, "stream-a", date(1993, 3, 1), date(1993, 3, 3)),
+            acr.get_interval_data(123, "stream-b", date(1993, 3, 1), date(1993, 3, 3)),
+        )
+
+    stream_a, stream_b = asyncio.run(_fetch())
+    assert len(stream_a) == len(stream_b) == 3  # noqa: PLR2004
+    assert len(acr_stub.requests) == 6  # noqa: PLR2004
+
+
+def test_get_data_cached(acr_stub, tmp_path):
+    """Test ACRClient.get_data with a day cache."""
+    cache = DayCache(tmp_path)
+    acr = acrclient.ACRClient("secret-key", base_url=acr_stub.base_url, cache=cache)
+    first = acr.get_data(123, "stream-id", requested_date=date(1993, 3, 1))
+    second = acr.get_data(123, "stream-id", requested_date=date(1993, 3, 1))
+    assert repr(first) == repr(second)
+    assert len(acr_stub.requests) == 1
+    # cached data is stored as returned by ACRCloud
+    cached = cache.get(123, "stream-id", date(1993, 3, 1))[0]
+    assert cached["metadata"]["timestamp_utc"] == "1993-03-01 13:12:00"
+
+    # refresh bypasses the cache but updates it
+    acr = acrclient.ACRClient(
+        "secret-key", base_url=acr_stub.base_url, cache=cache, refresh=True
+    )
+    acr.get_data(123, "stream-id", requested_date=date(1993, 3, 1))
+    assert len(acr_stub.requests) == 2  # noqa: PLR2004
+
+
+def test_transport(acr_stub):
+    """Test retries, compression and connection reuse of the transport."""
+    transport = acrclient.Transport(
+        retries=3, backoff_factor=0, backoff_jitter=0, timeout=5, pool_size=2
+    )
+    acr = acrclient.ACRClient(
+        "secret-key", base_url=acr_stub.base_url, transport=transport
+    )
+    acr_stub.errors = [(502, {}), (429, {"Retry-After": "0"}), (503, {})]
+    result = acr.get_data(123, "stream-id", requested_date=date(1993, 3, 1))
+    assert len(result) == 1
+    assert len(acr_stub.requests) == 4  # noqa: PLR2004
+    assert "gzip" in acr_stub.headers[-1]["Accept-Encoding"]
+
+    adapter = acr._session.get_adapter(acr_stub.base_url)  # noqa: SLF001
+    assert adapter.max_retries.total == 3  # noqa: PLR2004
+    assert 502 in adapter.max_retries.status_forcelist  # noqa: PLR2004
+
+    # give up once all retries are spent
+    acr_stub.errors = [(502, {})] * 4
+    with pytest.raises(requests.exceptions.RetryError):
+        acr.get_data(123, "stream-id", requested_date=date(1993, 3, 1))
+
+
+def test_get_interval_data_window(acr_stub):
+    """Test that the UTC window is computed for the interval, not for today."""
+    acr = acrclient.ACRClient("secret-key", base_url=acr_stub.base_url)
+    # "1993-06-30 23:30:00 UTC" = "1993-07-01 00:30:00 London" (BST, UTC+1)
+    acr_stub.days["19930630"] = [
+        {"metadata": {"timestamp_utc": "1993-06-30 22:59:59"}},
+        {"metadata": {"timestamp_utc": "1993-06-30 23:30:00"}},
+    ]
+    # "1993-07-02 23:00:00 UTC" = "1993-07-03 00:00:00 London" → trimmed
+    acr_stub.days["19930702"] = [
+        {"metadata": {"timestamp_utc": "1993-07-02 22:59:59"}},
+        {"metadata": {"timestamp_utc": "1993-07-02 23:00:00"}},
+    ]
+    # London is on UTC in January, the interval is not
+    with freeze_time("1993-01-15"):
+        result = acr.get_interval_data(
+            123, "stream-id", date(1993, 7, 1), date(1993, 7, 2), "Europe/London"
+        )
+    assert [day for _, day in acr_stub.requests] == [
+        "19930630",
+        "19930701",
+        "19930702",
+    ]
+    assert [f"{entry.timestamp_local:%Y-%m-%d %H:%M:%S}" for entry in result] == [
+        "1993-07-01 00:30:00",
+        "1993-07-01 14:12:00",
+        "1993-07-02 23:59:59",
+    ]
+
+
+class _Timestamp(str):
+    """A timestamp that counts how often it is compared."""
+
+    __slots__ = ()
+    comparisons = 0
+
+    def __ge__(self, other):
+        _Timestamp.comparisons += 1
+        return str.__ge__(self, other)
+
+    def __lt__(self, other):
+        _Timestamp.comparisons += 1
+        return str.__lt__(self, other)
+
+
+def test_in_window_is_linear():
+    """Windowing compares each timestamp at most twice without parsing it."""
+    start = datetime(1993, 1, 1)
+    data = [
+        {
+            "metadata": {
+                "timestamp_utc": _Timestamp(
+                    (start + timedelta(minutes=minute)).strftime(
+                        acrclient.ACRClient.TS_FMT
+                    )
+                )
+            }
+        }
+        for minute in range(0, 365 * 24 * 60, 3)
+    ]
+    _Timestamp.comparisons = 0
+    result = acrclient._in_window(  # noqa: SLF001
+        data, ("1993-01-01 23:00:00", "1993-12-31 23:00:00")
+    )
+    assert 0 < len(result) < len(data)
+    assert len(data) <= _Timestamp.comparisons <= 2 * len(data)
+    # entries are passed on as they are, starting with the one at 23:00
+    first = 23 * 60 // 3
+    assert all(entry is data[first + index] for index, entry in enumerate(result))
+
+
+def test_ordered_map():
+    """_ordered_map keeps order and only submits up to max_workers items ahead."""
+    calls = []
+
+    def _func(item):
+        calls.append(item)
+        return item * 2
+
+    results = acrclient._ordered_map(_func, range(10), 2)  # noqa: SLF001
+    assert next(results) == 0
+    assert len(calls) <= 2  # noqa: PLR2004
+    assert list(results) == [i * 2 for i in range(1, 10)]
+
+
+def test_iter_interval_data(acr_stub):
+    """Test that ACRClient.iter_interval_data streams entries in order."""
+    acr = acrclient.ACRClient("secret-key", base_url=acr_stub.base_url)
+    entries = acr.iter_interval_data(
+        123, "stream-id", date(1993, 3, 1), date(1993, 3, 10), max_workers=3
+    )
+    first = next(entries)
+    assert first.timestamp_utc == datetime(1993, 3, 1, 13, 12, tzinfo=UTC)
+    assert len(acr_stub.requests) <= 3  # noqa: PLR2004
+    assert len(list(entries)) == 9  # noqa: PLR2004
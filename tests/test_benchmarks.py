@@ -0,0 +1,101 @@
+"""Benchmarks of the hot paths on synthetic ACRCloud results.
+
+Benchmarks only run with `-m benchmark`. A week of data is processed by
+default, pass `--bench-period month` or `--bench-period year` for more. See
+`Benchmark` in conftest.py.
+"""
+
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+
+import pytest
+
+from suisa_sendemeldung import suisa_sendemeldung
+from suisa_sendemeldung.acrclient import ACRClient
+from suisa_sendemeldung.detection import ingest
+
+START = date(1993, 3, 1)
+
+
+@pytest.fixture(scope="module")
+def days(bench, workload):
+    """Synthetic results of the benchmark period keyed by `YYYYmmdd`."""
+    return workload().days(START, bench.days)
+
+
+@pytest.fixture(scope="module")
+def entries(days):
+    """Synthetic results of the benchmark period in chronological order."""
+    return [entry for day in days.values() for entry in day]
+
+
+@pytest.fixture(scope="module")
+def merged(entries):
+    """Merged detections of the benchmark period."""
+    return suisa_sendemeldung.merge_duplicates(ingest(entries, "Europe/Zurich"))
+
+
+def test_workload(workload):
+    """Test that the synthetic results are realistic and deterministic."""
+    days = workload().days(START, 2)
+    assert days == workload().days(START, 2)
+    assert list(days) == ["19930301", "19930302"]
+    entries = days["19930301"]
+    assert 300 < len(entries) < 600  # noqa: PLR2004
+    timestamps = [entry["metadata"]["timestamp_utc"] for entry in entries]
+    assert timestamps == sorted(timestamps)
+    assert all(timestamp.startswith("1993-03-01") for timestamp in timestamps)
+
+    items = [item for entry in entries for item in entry["metadata"].get("music", [])]
+    assert any("works" in item for item in items)
+    assert any(not suisa_sendemeldung.get_isrc(item) for item in items)
+    assert any(suisa_sendemeldung.get_isrc(item) for item in items)
+    assert any("custom_files" in entry["metadata"] for entry in entries)
+
+    detections = ingest(entries)
+    assert len(suisa_sendemeldung.merge_duplicates(detections)) < len(entries)
+
+
+@pytest.mark.benchmark
+def test_get_interval_data(bench, days, acr_stub):
+    """Benchmark fetching, trimming and localizing the period."""
+    acr_stub.days = days
+    client = ACRClient(bearer_token="secret-key", base_url=acr_stub.base_url)
+    end = START + timedelta(days=bench.days - 1)
+
+    def _fetch(_):
+        client.get_interval_data(
+            "project-id", "stream-id", START, end, "Europe/Zurich", max_workers=4
+        )
+
+    bench("get_interval_data", _fetch)
+
+
+@pytest.mark.benchmark
+def test_merge_duplicates(bench, entries):
+    """Benchmark merging duplicates."""
+    bench(
+        "merge_duplicates",
+        suisa_sendemeldung.merge_duplicates,
+        setup=lambda: ingest(entries, "Europe/Zurich"),
+    )
+
+
+@pytest.mark.benchmark
+def test_write_csv_data(bench, merged, settings):
+    """Benchmark rendering csv reports."""
+    settings.crid_mode = "local"
+    bench(
+        "write_csv_data",
+        lambda _: suisa_sendemeldung.write_csv_data(merged, settings, StringIO()),
+    )
+
+
+@pytest.mark.benchmark
+def test_write_xlsx_data(bench, merged, settings):
+    """Benchmark rendering xlsx reports."""
+    settings.crid_mode = "local"
+    bench(
+        "write_xlsx_data",
+        lambda _: suisa_sendemeldung.write_xlsx_data(merged, settings, BytesIO()),
+    )
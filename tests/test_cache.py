@@ -0,0 +1,89 @@
+"""Tests for the ACRCloud day cache."""
+
+import os
+import time
+from datetime import date
+from unittest.mock import patch
+
+from freezegun import freeze_time
+
+from suisa_sendemeldung.cache import DayCache
+
+_DATA = [{"metadata": {"timestamp_utc": "1993-03-01 13:12:00"}}]
+
+
+def test_put_get(tmp_path):
+    """Test that stored days are returned."""
+    cache = DayCache(tmp_path)
+    assert cache.get(1, "stream-id", date(1993, 3, 1)) is None
+    cache.put(1, "stream-id", date(1993, 3, 1), _DATA)
+    assert cache.get(1, "stream-id", date(1993, 3, 1)) == _DATA
+    assert cache.get(2, "stream-id", date(1993, 3, 1)) is None
+    assert cache.get(1, "other-id", date(1993, 3, 1)) is None
+    assert (tmp_path / "1" / "stream-id" / "19930301.json").is_file()
+
+
+def test_ttl(tmp_path):
+    """Test that only recent days expire."""
+    cache = DayCache(tmp_path, ttl=60, closed_after=3)
+    cache.put(1, "stream-id", date(1993, 3, 1), _DATA)
+    cache.put(1, "stream-id", date(1993, 3, 5), _DATA)
+
+    with freeze_time("1993-03-06"):
+        stale = time.time() - 120
+        for file in (tmp_path / "1" / "stream-id").iterdir():
+            os.utime(file, (stale, stale))
+
+        assert cache.is_closed(date(1993, 3, 3))
+        assert not cache.is_closed(date(1993, 3, 4))
+        # closed days are immutable
+        assert cache.get(1, "stream-id", date(1993, 3, 1)) == _DATA
+        # recent days are only valid for ttl seconds
+        assert cache.get(1, "stream-id", date(1993, 3, 5)) is None
+
+
+def test_evict(tmp_path):
+    """Test that least recently used days are evicted."""
+    cache = DayCache(tmp_path)
+    cache.put(1, "stream-id", date(1993, 3, 1), _DATA)
+    cache.put(1, "stream-id", date(1993, 3, 2), _DATA)
+    size = (tmp_path / "1" / "stream-id" / "19930301.json").stat().st_size
+    old = time.time() - 120
+    os.utime(tmp_path / "1" / "stream-id" / "19930301.json", (old, old))
+
+    cache.max_size = size * 2
+    cache.put(1, "stream-id", date(1993, 3, 3), _DATA)
+    assert cache.get(1, "stream-id", date(1993, 3, 1)) is None
+    assert cache.get(1, "stream-id", date(1993, 3, 2)) == _DATA
+    assert cache.get(1, "stream-id", date(1993, 3, 3)) == _DATA
+
+
+def test_evict_scans_rarely(tmp_path):
+    """Test that the cache is only scanned when it might be too large."""
+    cache = DayCache(tmp_path)
+    with patch.object(
+        DayCache, "evict", autospec=True, side_effect=DayCache.evict
+    ) as evict:
+        for day in range(1, 29):
+            cache.put(1, "stream-id", date(1993, 2, day), _DATA)
+        # measured once on the first write
+        assert evict.call_count == 1
+
+        cache.max_size = cache._size  # noqa: SLF001
+        cache.put(1, "stream-id", date(1993, 3, 1), _DATA)
+        assert evict.call_count == 2  # noqa: PLR2004
+
+
+def test_errors(tmp_path):
+    """Test that the cache never fails a run."""
+    # corrupt entries are ignored
+    cache = DayCache(tmp_path)
+    cache.put(1, "stream-id", date(1993, 3, 1), _DATA)
+    (tmp_path / "1" / "stream-id" / "19930301.json").write_text("{")
+    assert cache.get(1, "stream-id", date(1993, 3, 1)) is None
+
+    # unwritable cache directories are ignored
+    (tmp_path / "file").touch()
+    cache = DayCache(tmp_path / "file")
+    cache.put(1, "stream-id", date(1993, 3, 1), _DATA)
+    assert cache.get(1, "stream-id", date(1993, 3, 1)) is None
@@ -0,0 +1,87 @@
+"""Test the suisa_sendemeldung.crid module."""
+
+from datetime import date, datetime, timezone
+from unittest.mock import Mock, patch
+
+from freezegun import freeze_time
+
+from suisa_sendemeldung.crid import ArchiveSchedule, Broadcast, CridGenerator
+
+
+class _Schedule:
+    """Local stand-in for the archive."""
+
+    def __init__(self, broadcasts):
+        self.broadcasts = broadcasts
+        self.days = []
+
+    def get_broadcasts(self, day):
+        self.days.append(day)
+        return [b for b in self.broadcasts if b.start.date() == day]
+
+
+def _utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_archive_schedule():
+    """Test fetching a day from the archive."""
+    session = Mock()
+    session.get.return_value.json.return_value = {
+        "data": [
+            {
+                "attributes": {
+                    "label": "Info Sendung",
+                    "started_at": "1993-03-01T11:00:00.000+01:00",
+                    "finished_at": "1993-03-01T12:00:00.000+01:00",
+                }
+            }
+        ]
+    }
+    schedule = ArchiveSchedule(session=session, url="http://archive/")
+    assert schedule.get_broadcasts(date(1993, 3, 1)) == [
+        Broadcast(
+            start=_utc(1993, 3, 1, 10),
+            end=_utc(1993, 3, 1, 11),
+            show="info-sendung",
+        )
+    ]
+    session.get.assert_called_once_with("http://archive/1993/03/01", timeout=10)
+
+
+@freeze_time("1993-03-02")
+def test_crid_generator():
+    """Test CRIDs are generated from the cached schedule."""
+    schedule = _Schedule(
+        [
+            Broadcast(_utc(1993, 2, 28, 22), _utc(1993, 3, 1, 1), "Nacht Schicht"),
+            Broadcast(_utc(1993, 3, 1, 13), _utc(1993, 3, 1, 14), "test"),
+        ]
+    )
+    crids = CridGenerator(schedule)
+    assert (
+        crids.get(_utc(1993, 3, 1, 13, 12), fragment="acrid=a1")
+        == "crid://rabe.ch/v1/test#t=clock=19930301T131200.00Z&acrid=a1"
+    )
+    assert (
+        crids.get(_utc(1993, 3, 1, 0, 30))
+        == "crid://rabe.ch/v1/nacht-schicht#t=clock=19930301T003000.00Z"
+    )
+    assert (
+        crids.get(_utc(1993, 3, 1, 15), fragment="acrid=a2")
+        == "crid://rabe.ch/v1#t=clock=19930301T150000.00Z&acrid=a2"
+    )
+    assert schedule.days == [date(1993, 3, 1), date(1993, 2, 28)]
+
+
+@freeze_time("1993-03-01 12:00:00")
+@patch("cridlib.get")
+def test_crid_generator_future(mock_cridlib_get):
+    """Test that timestamps that are not in the past are passed to cridlib."""
+    mock_cridlib_get.return_value = "crid://rabe.ch/v1/future"
+    schedule = _Schedule([])
+    crids = CridGenerator(schedule)
+    timestamp = _utc(1993, 3, 1, 13)
+    assert crids.get(timestamp, fragment="acrid=a1") == "crid://rabe.ch/v1/future"
+    mock_cridlib_get.assert_called_once_with(timestamp=timestamp, fragment="acrid=a1")
+    assert schedule.days == []
@@ -0,0 +1,65 @@
+"""Test the suisa_sendemeldung.decode module."""
+
+import json
+
+import pytest
+
+from suisa_sendemeldung.decode import iter_items
+
+
+def _chunks(document, size):
+    raw = document.encode()
+    return [raw[i : i + size] for i in range(0, len(raw), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 4096])
+def test_iter_items(size):
+    """Test that items are decoded regardless of how the input is chunked."""
+    document = {
+        "meta": {"page": 1, "total": [12345, 2.5e3]},
+        "data": [
+            {"metadata": {"title": "Grüezi 🎶", "played_duration": 12345}},
+            [],
+            'string with \\"escapes\\" and ] brackets }',
+            1234567890,
+            None,
+        ],
+        "after": True,
+    }
+    raw = json.dumps(document, indent=2, ensure_ascii=False)
+    items = iter_items(_chunks(raw, size), "data")
+    assert list(items) == document["data"]
+
+
+@pytest.mark.parametrize(
+    ("document", "expected"),
+    [
+        ("{}", []),
+        (" { } ", []),
+        ('{"data": []}', []),
+        ('{"data": null}', []),
+        ('{"other": [1]}', []),
+        ('{"data": [1], "data2": [2]}', [1]),
+    ],
+)
+def test_iter_items_without_items(document, expected):
+    """Test documents without (usable) items."""
+    assert list(iter_items(_chunks(document, 3), "data")) == expected
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        "",
+        "[]",
+        '{"data": [nope]}',
+        '{"data": [1 2]}',
+        '{"data": [1, 2',
+        '{"data" [1]}',
+        '{"data": [1]',
+    ],
+)
+def test_iter_items_invalid(document):
+    """Test that malformed documents raise a decoding error."""
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_items(_chunks(document, 3), "data"))
@@ -0,0 +1,101 @@
+"""Test the suisa_sendemeldung.detection module."""
+
+import sys
+from datetime import UTC, datetime
+
+from suisa_sendemeldung.detection import ingest, project_music, select_entry
+
+
+def test_project_music():
+    """Test that project_music keeps only the fields used in reports."""
+    music = {
+        "acrid": "a1",
+        "title": "Uhrenvergleich",
+        "artists": [{"name": "Da Gang", "langs": [{"code": "de"}]}],
+        "contributors": {"composers": ["Da Composah"], "lyricists": ["Da Lyrah"]},
+        "works": [{"creators": [{"name": "Worker", "role": "W", "ipi": 1}]}],
+        "external_ids": {"isrc": "DEZ650710376", "upc": "123", "iswc": "T1"},
+        "external_metadata": {"spotify": {"track": {"id": "x"}}},
+        "album": {"name": "Da Alboom", "cd_id": "cd1", "langs": []},
+        "genres": [{"name": "Dub"}],
+        "release_date": "2022-12-13",
+    }
+    assert project_music(music) == {
+        "acrid": "a1",
+        "title": "Uhrenvergleich",
+        "artists": [{"name": "Da Gang"}],
+        "contributors": {"composers": ["Da Composah"]},
+        "works": [{"creators": [{"name": "Worker", "role": "W"}]}],
+        "external_ids": {"isrc": "DEZ650710376", "upc": "123"},
+        "album": {"name": "Da Alboom", "cd_id": "cd1"},
+        "release_date": "2022-12-13",
+    }
+
+    # custom files use plain strings for some fields
+    music = {"acrid": "a2", "artists": "Da Gang", "album": "Da Alboom"}
+    assert project_music(music) == music
+    assert project_music({"contributors": {"composers": None}}) == {
+        "contributors": {"composers": None}
+    }
+
+
+def test_project_music_interns_strings():
+    """Test that repeated strings are shared between detections."""
+    label = "".join(["Jane ", "Records"])
+    projected = project_music({"label": label})
+    assert projected["label"] is sys.intern("Jane Records")
+
+
+def test_ingest():
+    """Test ingesting raw ACRCloud entries."""
+    detections = ingest(
+        [
+            {
+                "metadata": {
+                    "timestamp_utc": "1993-03-01 13:12:00",
+                    "played_duration": 60,
+                    "music": [{"acrid": "a1", "title": "T"}, {"acrid": "a2"}],
+                }
+            },
+            {"metadata": {"timestamp_utc": "1993-03-01 13:13:00"}},
+        ],
+        "Europe/Zurich",
+    )
+    detection = detections[0]
+    assert detection.timestamp_utc == datetime(1993, 3, 1, 13, 12, tzinfo=UTC)
+    assert str(detection.timestamp_local) == "1993-03-01 14:12:00+01:00"
+    assert detection.played_duration == 60  # noqa: PLR2004
+    assert detection.music == {"acrid": "a1", "title": "T"}
+    assert detection.acrids == {"a1", "a2"}
+    assert not hasattr(detection, "__dict__")
+    assert repr(detection) == "Detection(1993-03-01T13:12:00+00:00, 60s, ['a1', 'a2'])"
+
+    detection = detections[1]
+    assert detection.music == {}
+    assert detection.acrids == frozenset()
+    assert detection.played_duration == 0
+
+
+def test_select_entry():
+    """Test reducing raw entries to the fields needed for detections."""
+    entry = {
+        "metadata": {
+            "timestamp_utc": "1993-03-01 13:12:00",
+            "played_duration": 60,
+            "type": "delay",
+            "music": [
+                {"acrid": "a1", "title": "T", "genres": [{"name": "Dub"}]},
+                {"acrid": "a2", "title": "Other"},
+            ],
+            "custom_files": [],
+        }
+    }
+    selected = select_entry(entry)
+    assert selected == {
+        "metadata": {
+            "timestamp_utc": "1993-03-01 13:12:00",
+            "played_duration": 60,
+            "music": [{"acrid": "a1", "title": "T"}, {"acrid": "a2"}],
+        }
+    }
+    assert repr(ingest([selected])) == repr(ingest([entry]))
@@ -0,0 +1,175 @@
+"""Test the suisa_sendemeldung.mailer module."""
+
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from smtplib import (
+    SMTPAuthenticationError,
+    SMTPNotSupportedError,
+    SMTPRecipientsRefused,
+    SMTPSenderRefused,
+    SMTPServerDisconnected,
+)
+
+import pytest
+
+from suisa_sendemeldung.mailer import Mailer, _is_transient
+from suisa_sendemeldung.metrics import metrics
+
+
+def _message(sender="from@example.org", text="report"):
+    msg = EmailMessage()
+    msg["From"] = sender
+    msg["To"] = "to@example.org"
+    msg.set_content(text)
+    return msg
+
+
+def _mailer(stub, **kwargs):
+    kwargs.setdefault("password", "secret")
+    return Mailer("127.0.0.1", stub.port, starttls=False, backoff_factor=0, **kwargs)
+
+
+def test_send_reuses_connection(smtp_stub):
+    """Test that messages are sent over a single logged in connection."""
+    metrics.reset()
+    with _mailer(smtp_stub, login="user") as mailer:
+        for text in ("one", "two", "three"):
+            mailer.send(_message(text=text))
+    assert smtp_stub.connections == 1
+    assert smtp_stub.logins == ["user"]
+    assert [b"two" in message for message in smtp_stub.messages] == [
+        False,
+        True,
+        False,
+    ]
+    assert metrics.counters == {"smtp_connections": 1, "emails": 3}
+
+
+def test_send_logs_in_as_sender(smtp_stub):
+    """Test that connections are logged in as the sender without a login."""
+    with _mailer(smtp_stub) as mailer:
+        mailer.send(_message("a@example.org"))
+        mailer.send(_message("a@example.org"))
+        mailer.send(_message("b@example.org"))
+    assert smtp_stub.logins == ["a@example.org", "b@example.org"]
+    assert smtp_stub.connections == 2  # noqa: PLR2004
+
+
+def test_send_concurrently(smtp_stub):
+    """Test that concurrent messages share a bounded pool of connections."""
+    with (
+        _mailer(smtp_stub, connections=2) as mailer,
+        ThreadPoolExecutor(max_workers=6) as executor,
+    ):
+        list(executor.map(mailer.send, [_message() for _ in range(12)]))
+    assert len(smtp_stub.messages) == 12  # noqa: PLR2004
+    assert 1 <= smtp_stub.connections <= 2  # noqa: PLR2004
+
+
+def test_send_retries(smtp_stub):
+    """Test that transient failures are retried over a new connection."""
+    with _mailer(smtp_stub, retries=2) as mailer:
+        mailer.send(_message())
+        # the idle connection is dropped and the next one refused for now
+        smtp_stub.replies = ["drop", "421 try again later"]
+        mailer.send(_message())
+    assert len(smtp_stub.messages) == 2  # noqa: PLR2004
+    assert smtp_stub.connections == 3  # noqa: PLR2004
+
+    # retries are exhausted
+    smtp_stub.replies = ["451 later", "451 later"]
+    with (
+        _mailer(smtp_stub, retries=1) as mailer,
+        pytest.raises(SMTPSenderRefused),
+    ):
+        mailer.send(_message())
+    assert smtp_stub.replies == []
+
+
+def test_send_probes_idle_connections(smtp_stub):
+    """Test that idle connections closed in the meantime are replaced."""
+    metrics.reset()
+    with _mailer(smtp_stub, retries=0) as mailer:
+        mailer.send(_message())
+        # the connection broke while it was idle
+        mailer._idle[0][1].sock.shutdown(socket.SHUT_RDWR)  # noqa: SLF001
+        mailer.send(_message())
+        # live connections are still reused
+        mailer.send(_message())
+    assert len(smtp_stub.messages) == 3  # noqa: PLR2004
+    assert smtp_stub.connections == 2  # noqa: PLR2004
+    assert metrics.counters == {"smtp_connections": 2, "emails": 3}
+
+
+def test_send_does_not_duplicate(smtp_stub):
+    """Test that messages the server may have accepted are not sent again."""
+    smtp_stub.drop_after_data = True
+    with (
+        _mailer(smtp_stub, retries=2) as mailer,
+        pytest.raises(SMTPServerDisconnected),
+    ):
+        mailer.send(_message())
+    assert len(smtp_stub.messages) == 1
+    assert smtp_stub.connections == 1
+
+    # the next message is sent as usual
+    with _mailer(smtp_stub) as mailer:
+        mailer.send(_message())
+    assert len(smtp_stub.messages) == 2  # noqa: PLR2004
+
+
+def test_send_fails(smtp_stub):
+    """Test that permanent failures are not retried."""
+    smtp_stub.replies = ["550 no such sender"]
+    with _mailer(smtp_stub) as mailer, pytest.raises(SMTPSenderRefused):
+        mailer.send(_message())
+    assert smtp_stub.connections == 1
+
+    with (
+        _mailer(smtp_stub, password="wrong") as mailer,
+        pytest.raises(SMTPAuthenticationError),
+    ):
+        mailer.send(_message())
+    assert smtp_stub.connections == 2  # noqa: PLR2004
+
+    # STARTTLS is not offered by the stub
+    mailer = Mailer("127.0.0.1", smtp_stub.port, retries=0)
+    with pytest.raises(SMTPNotSupportedError):
+        mailer.send(_message())
+
+    # nobody is listening on a closed port
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    mailer = Mailer("127.0.0.1", port, retries=1, backoff_factor=0, timeout=1)
+    with pytest.raises(ConnectionRefusedError):
+        mailer.send(_message())
+
+
+def test_close(smtp_stub):
+    """Test that closing quits idle connections, even broken ones."""
+    mailer = _mailer(smtp_stub)
+    mailer.send(_message())
+    # a connection that broke while it was idle
+    mailer._idle[0][1].sock.shutdown(socket.SHUT_RDWR)  # noqa: SLF001
+    mailer.close()
+    assert mailer._idle == []  # noqa: SLF001
+
+
+def test_is_transient():
+    """Test which failures are worth retrying."""
+    assert _is_transient(SMTPSenderRefused(421, b"busy", "a@example.org"))
+    assert not _is_transient(SMTPSenderRefused(550, b"no", "a@example.org"))
+    assert _is_transient(SMTPRecipientsRefused({"a@example.org": (452, b"full")}))
+    assert not _is_transient(
+        SMTPRecipientsRefused(
+            {"a@example.org": (452, b"full"), "b@example.org": (550, b"no")}
+        )
+    )
+    assert _is_transient(SMTPServerDisconnected())
+    assert _is_transient(ConnectionResetError())
+    assert not _is_transient(SMTPNotSupportedError())
+    # bugs will not go away by retrying
+    assert not _is_transient(ValueError())
+    assert not _is_transient(UnicodeEncodeError("ascii", "ä", 0, 1, "no"))
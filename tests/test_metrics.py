@@ -0,0 +1,70 @@
+"""Test the suisa_sendemeldung.metrics module."""
+
+import json
+from unittest.mock import patch
+
+from suisa_sendemeldung.metrics import Metrics
+
+
+def test_stage():
+    """Test that nested stages are timed exclusively."""
+    metrics = Metrics()
+    clock = iter([0.0, 1.0, 3.0, 3.5, 10.0, 16.0])
+    with patch("time.perf_counter", lambda: next(clock)):
+        with metrics.stage("render"), metrics.stage("merge"):
+            pass
+        with metrics.stage("render"):
+            pass
+    assert metrics.as_dict() == {
+        "stages": {"merge": 2.0, "render": 7.5},
+        "counters": {},
+    }
+
+
+def test_timed():
+    """Test timing a lazy iterable."""
+    metrics = Metrics()
+    assert list(metrics.timed("load", iter([1, 2]))) == [1, 2]
+    assert list(metrics.as_dict()["stages"]) == ["load"]
+
+
+def test_count():
+    """Test counters."""
+    metrics = Metrics()
+    metrics.count("rows")
+    metrics.count("rows", 2)
+    assert list(metrics.counted("api_bytes", [b"ab", b"cde"])) == [b"ab", b"cde"]
+    assert metrics.as_dict()["counters"] == {"api_bytes": 5, "rows": 3}
+    metrics.reset()
+    assert metrics.as_dict() == {"stages": {}, "counters": {}}
+
+
+def test_write(tmp_path):
+    """Test writing JSON and Prometheus textfiles."""
+    metrics = Metrics()
+    metrics.stages["fetch"] = 1.5
+    metrics.count("api_calls", 3)
+
+    with patch("time.time", return_value=731000000.0):
+        metrics.write(tmp_path / "metrics.json")
+        metrics.write(tmp_path / "metrics.prom")
+
+    assert json.loads((tmp_path / "metrics.json").read_text()) == {
+        "timestamp": 731000000.0,
+        "stages": {"fetch": 1.5},
+        "counters": {"api_calls": 3},
+    }
+    assert (tmp_path / "metrics.prom").read_text() == (
+        "# HELP suisa_sendemeldung_stage_seconds"
+        " Time spent in each stage of the last run.\n"
+        "# TYPE suisa_sendemeldung_stage_seconds gauge\n"
+        'suisa_sendemeldung_stage_seconds{stage="fetch"} 1.500000\n'
+        "# TYPE suisa_sendemeldung_api_calls gauge\n"
+        "suisa_sendemeldung_api_calls 3\n"
+        "# TYPE suisa_sendemeldung_last_run_timestamp_seconds gauge\n"
+        "suisa_sendemeldung_last_run_timestamp_seconds 731000000.000\n"
+    )
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "metrics.json",
+        "metrics.prom",
+    ]
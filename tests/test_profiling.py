@@ -0,0 +1,69 @@
+"""Test the suisa_sendemeldung.profiling module."""
+
+import pstats
+import threading
+
+from suisa_sendemeldung.metrics import Metrics
+from suisa_sendemeldung.profiling import StageProfiler
+
+
+def _render():
+    return sum(range(1000))
+
+
+def _merge():
+    return sorted(range(1000), reverse=True)
+
+
+def _fetch(metrics):
+    with metrics.stage("fetch"):
+        pass
+
+
+def test_stage_profiler(tmp_path):
+    """Test that stages are profiled separately."""
+    metrics = Metrics()
+    metrics.profiler = StageProfiler(memory=True)
+    with metrics.stage("render"):
+        _render()
+        with metrics.stage("merge"):
+            _merge()
+            # stages on other threads are only timed
+            thread = threading.Thread(target=_fetch, args=(metrics,))
+            thread.start()
+            thread.join()
+        _render()
+    with metrics.stage("merge"):
+        _merge()
+
+    profiler = metrics.profiler
+    functions = {
+        name: {func[2] for func in stats.stats}
+        for name, stats in profiler.stats.items()
+    }
+    assert set(functions) == {"merge", "render"}
+    assert "_render" in functions["render"]
+    assert "_merge" not in functions["render"]
+    assert "_merge" in functions["merge"]
+    assert set(profiler.peaks) == {"merge", "render"}
+
+    profiler.write(tmp_path / "rabe_1993_03")
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "rabe_1993_03.merge.pstats",
+        "rabe_1993_03.profile.txt",
+        "rabe_1993_03.render.pstats",
+    ]
+    stats = pstats.Stats(str(tmp_path / "rabe_1993_03.merge.pstats"))
+    assert stats.total_calls > 0
+    summary = (tmp_path / "rabe_1993_03.profile.txt").read_text()
+    assert summary.startswith("=== merge (peak memory ")
+    assert "=== render (peak memory " in summary
+
+
+def test_stage_profiler_without_memory():
+    """Test profiling without tracemalloc."""
+    profiler = StageProfiler()
+    profiler.enter("render")
+    profiler.exit("render")
+    assert profiler.peaks == {}
+    assert profiler.summary().startswith("=== render ===\n")
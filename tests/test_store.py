@@ -0,0 +1,128 @@
+"""Tests for the local detection store."""
+
+import copy
+from datetime import date
+
+from suisa_sendemeldung.detection import ingest
+from suisa_sendemeldung.store import DetectionStore
+
+_DATA = [
+    {
+        "metadata": {
+            "timestamp_utc": "1993-03-01 13:12:00",
+            "played_duration": 60,
+            "music": [{"acrid": "a1", "title": "Uhrenvergleich"}, {"acrid": "a2"}],
+        }
+    },
+    {
+        "metadata": {
+            "timestamp_utc": "1993-03-01 13:13:00",
+            "played_duration": 30,
+            "custom_files": [{"acrid": "c1", "title": "Jingle"}],
+        }
+    },
+]
+
+
+def test_add(tmp_path):
+    """Test that detections are only added once."""
+    path = tmp_path / "sub" / "detections.sqlite3"
+    with DetectionStore(path) as store:
+        assert store.add(1, "stream-id", ingest(_DATA)) == 2  # noqa: PLR2004
+        assert store.add(1, "stream-id", ingest(_DATA)) == 0
+        assert store.add(1, "other-id", ingest(_DATA[:1])) == 1
+        rows = store.connection.execute(
+            "SELECT * FROM detections ORDER BY stream_id, timestamp_utc"
+        ).fetchall()
+    assert rows[0] == (
+        1,
+        "other-id",
+        "1993-03-01 13:12:00",
+        "a1",
+        60,
+        '["a1", "a2"]',
+        '{"acrid": "a1", "title": "Uhrenvergleich"}',
+    )
+    assert len(rows) == 3  # noqa: PLR2004
+
+    # data survives reopening the database
+    with DetectionStore(path) as store:
+        assert store.add(1, "stream-id", ingest(_DATA)) == 0
+        assert store.add(1, "stream-id", []) == 0
+
+        # fetching a day again updates late results
+        late = copy.deepcopy(_DATA[:1])
+        late[0]["metadata"]["played_duration"] = 90
+        late[0]["metadata"]["music"][0]["album"] = {"name": "Late"}
+        late[0]["metadata"]["music"].append({"acrid": "a3"})
+        assert store.add(1, "stream-id", ingest(late)) == 0
+        rows = store.connection.execute(
+            "SELECT played_duration, acrids, music FROM detections"
+            " WHERE stream_id = 'stream-id' ORDER BY timestamp_utc"
+        ).fetchall()
+    assert rows == [
+        (
+            90,
+            '["a1", "a2", "a3"]',
+            '{"acrid": "a1", "title": "Uhrenvergleich", "album": {"name": "Late"}}',
+        ),
+        (30, '["c1"]', '{"acrid": "c1", "title": "Jingle"}'),
+    ]
+
+
+def test_watermark():
+    """Test watermarks are kept per stream."""
+    with DetectionStore(":memory:") as store:
+        assert store.get_watermark(1, "stream-id") is None
+        store.set_watermark(1, "stream-id", date(1993, 3, 1))
+        store.set_watermark(1, "stream-id", date(1993, 3, 2))
+        assert store.get_watermark(1, "stream-id") == date(1993, 3, 2)
+        assert store.get_watermark(1, "other-id") is None
+        assert store.get_watermark(2, "stream-id") is None
+
+
+def test_iter_interval_data():
+    """Test reading detections of a local interval."""
+    data = [
+        {"metadata": {"timestamp_utc": ts, "music": [{"acrid": "a1"}]}}
+        for ts in (
+            "1993-02-28 22:59:59",
+            "1993-02-28 23:00:00",
+            "1993-03-31 21:59:59",
+            "1993-03-31 22:00:00",
+        )
+    ]
+    with DetectionStore(":memory:") as store:
+        store.add(1, "stream-id", ingest(reversed(data)))
+        store.add(1, "other-id", ingest(data))
+        store.add(1, "stream-id", ingest(_DATA[:1]))
+        result = list(
+            store.iter_interval_data(
+                1, "stream-id", date(1993, 3, 1), date(1993, 3, 31), "Europe/Zurich"
+            )
+        )
+    assert [
+        f"{detection.timestamp_local:%Y-%m-%d %H:%M:%S}" for detection in result
+    ] == [
+        "1993-03-01 00:00:00",
+        "1993-03-01 14:12:00",
+        "1993-03-31 23:59:59",
+    ]
+    assert result[1].music == {"acrid": "a1", "title": "Uhrenvergleich"}
+    assert result[1].acrids == {"a1", "a2"}
+    assert result[1].played_duration == 60  # noqa: PLR2004
+
+
+def test_indexes():
+    """Test that range reads and acrid lookups use an index."""
+    with DetectionStore(":memory:") as store:
+        plan = store.connection.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM detections WHERE project_id = 1"
+            " AND stream_id = 's' AND timestamp_utc >= 'a' AND timestamp_utc < 'b'"
+        ).fetchall()
+        assert "INDEX" in plan[0][-1]
+        for where in ("timestamp_utc >= 'a'", "acrid = 'a1'"):
+            plan = store.connection.execute(
+                f"EXPLAIN QUERY PLAN SELECT * FROM detections WHERE {where}"  # noqa: S608
+            ).fetchall()
+            assert "USING INDEX" in plan[0][-1]
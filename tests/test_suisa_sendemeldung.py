@@ -1,30 +1,45 @@
 """Test the suisa_sendemeldung.suisa_sendemeldung module."""
 
-from datetime import date, datetime, timezone
+import asyncio
+import gzip
+import json
+import subprocess
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
 from email.message import Message
-from io import BytesIO
-from typing import TYPE_CHECKING
+from functools import partial
+from io import BytesIO, StringIO
 from unittest.mock import call, patch
+from zipfile import ZipFile
 
 import pytest
 from click.testing import CliRunner
 from freezegun import freeze_time
-from openpyxl import Workbook, load_workbook
+from openpyxl import load_workbook
 from typed_settings.exceptions import InvalidValueError
 
-from suisa_sendemeldung import suisa_sendemeldung
+from suisa_sendemeldung import acrclient, suisa_sendemeldung
+from suisa_sendemeldung.crid import Broadcast
+from suisa_sendemeldung.detection import Detection, ingest
+from suisa_sendemeldung.metrics import metrics
 from suisa_sendemeldung.settings import (
     ACR,
+    BatchJob,
+    CacheSettings,
+    Compression,
+    DataSource,
+    EmailSettings,
     FileFormat,
     FileSettings,
+    LocalizationSettings,
     OutputMode,
     RangeSettings,
     Settings,
     StationSettings,
 )
-
-if TYPE_CHECKING:  # pragma: no cover
-    from openpyxl.worksheet.worksheet import Worksheet
+from suisa_sendemeldung.store import DetectionStore
 
 
 def test_validate_arguments():
@@ -80,6 +95,90 @@ def test_validate_arguments():
         excinfo.value
     )
 
+    settings = Settings(
+        output=OutputMode.email,
+        file=FileSettings(format=FileFormat.xlsx),
+        email=EmailSettings(compression=Compression.gzip),
+    )
+    with pytest.raises(InvalidValueError) as excinfo:
+        suisa_sendemeldung.validate_arguments(settings)
+    assert "gzip compression is only supported for csv, please use zip" in str(
+        excinfo.value
+    )
+
+    settings = Settings(batch=[BatchJob(stream_id="123456789")])
+    settings.output = OutputMode.stdout
+    with pytest.raises(InvalidValueError) as excinfo:
+        suisa_sendemeldung.validate_arguments(settings)
+    assert "batch jobs cannot be printed to stdout, please set --output" in str(
+        excinfo.value
+    )
+
+    settings = Settings(
+        date=RangeSettings(),
+        output=OutputMode.file,
+        batch=[
+            BatchJob(stream_id="123456789"),
+            BatchJob(stream_id="987654321", name_short="other"),
+            BatchJob(stream_id="192837465", path="a.csv"),
+            BatchJob(stream_id="918273645", name_short="a.csv"),
+        ],
+    )
+    suisa_sendemeldung.validate_arguments(settings)
+    # the same default name or the same path
+    for jobs in (
+        [BatchJob(stream_id="192837465", name_short="rabe")],
+        [BatchJob(stream_id="918273645", path="./a.csv")],
+    ):
+        settings.batch.extend(jobs)
+        with pytest.raises(InvalidValueError) as excinfo:
+            suisa_sendemeldung.validate_arguments(settings)
+        assert excinfo.value.args[0] == [
+            "batch jobs write to the same file, please set a distinct"
+            " name_short or path per job"
+        ]
+        del settings.batch[-1]
+
+    settings = Settings(date=RangeSettings(backfill=True))
+    settings.output = OutputMode.stdout
+    settings.file.format = FileFormat.csv
+    settings.batch = [BatchJob(stream_id="123456789")]
+    with pytest.raises(InvalidValueError) as excinfo:
+        suisa_sendemeldung.validate_arguments(settings)
+    assert excinfo.value.args[0] == [
+        "batch jobs cannot be printed to stdout, please set --output",
+        "argument --backfill requires --by-date and --date-start",
+        "argument --backfill not allowed with stdout or --file-path",
+        "argument --backfill not allowed with batch jobs",
+    ]
+
+    settings = Settings(acr=ACR(bearer_token="_" * 32, project_id=1))
+    with pytest.raises(InvalidValueError) as excinfo:
+        suisa_sendemeldung.validate_arguments(settings)
+    assert "argument --acr-stream-id is required without batch jobs" in str(
+        excinfo.value
+    )
+
+
+def test_validate_arguments_backfill():
+    """Test that backfills are limited to complete months."""
+    # the current month is not complete, --date-end defaults to today
+    first = date.today().replace(day=1)  # noqa: DTZ011
+    for end in ("", str(first)):
+        settings = Settings(
+            date=RangeSettings(
+                last_month=False, backfill=True, start="2024-01-01", end=end
+            )
+        )
+        with pytest.raises(InvalidValueError) as excinfo:
+            suisa_sendemeldung.validate_arguments(settings)
+        assert excinfo.value.args[0] == [
+            "argument --backfill only covers complete months,"
+            " please set --date-end before the current month"
+        ]
+    settings.date.end = str(first - timedelta(days=1))
+    suisa_sendemeldung.validate_arguments(settings)
+
 
 def test_parse_date():
     """Test parse_date."""
@@ -155,47 +254,386 @@ def test_parse_filename():
     assert filename == "test_1996-03-01.xlsx"
 
 
+def test_get_profile_settings(settings):
+    """Test that profiled runs stay on the main thread."""
+    settings.workers = 4
+    settings.acr.max_workers = 8
+    profile_settings = suisa_sendemeldung.get_profile_settings(settings)
+    assert profile_settings.workers == 1
+    assert profile_settings.acr.max_workers == 1
+    assert profile_settings.acr.bearer_token == settings.acr.bearer_token
+
+    settings.acr = None
+    assert suisa_sendemeldung.get_profile_settings(settings).acr is None
+
+
+def test_get_cache():
+    """Test get_cache."""
+    # the cache is opt-in
+    assert suisa_sendemeldung.get_cache(Settings()) is None
+
+    settings = Settings(
+        cache=CacheSettings(enabled=True, path="/tmp/cache", max_size=1, ttl=60)
+    )
+    cache = suisa_sendemeldung.get_cache(settings)
+    assert cache is not None
+    assert str(cache.path) == "/tmp/cache"
+    assert cache.max_size == 1024 * 1024
+    assert cache.ttl == 60  # noqa: PLR2004
+
+
+def test_get_job_settings(settings):
+    """Test get_job_settings."""
+    settings.email.to = "suisa@example.org"
+    settings.batch = [BatchJob(stream_id="987654321")]
+    job = suisa_sendemeldung.get_job_settings(settings, settings.batch[0])
+    assert job.acr.stream_id == "987654321"
+    assert job.acr.project_id == settings.acr.project_id
+    assert job.station == settings.station
+    assert job.email.to == "suisa@example.org"
+    assert job.batch == []
+
+    job = suisa_sendemeldung.get_job_settings(
+        settings,
+        BatchJob(
+            stream_id="987654321",
+            project_id=42,
+            name="Other Station",
+            name_short="other",
+            path="other.csv",
+            to="other@example.org",
+        ),
+    )
+    assert job.acr.project_id == 42  # noqa: PLR2004
+    assert job.station == StationSettings(name="Other Station", name_short="other")
+    assert job.file.path == "other.csv"
+    assert job.email.to == "other@example.org"
+    # the main settings are left alone
+    assert settings.station.name_short == "stationname"
+    assert settings.file.path == ""
+
+
+def test_run_batch(settings, acr_stub, tmp_path):
+    """Test run_batch creates a report per job."""
+    settings.file.format = FileFormat.csv
+    settings.crid_mode = "local"
+    settings.cache.enabled = False
+    settings.date.last_month = False
+    settings.date.start = "1993-03-01"
+    settings.date.end = "1993-03-02"
+    settings.batch = [
+        BatchJob(stream_id="stream-a-1", path=str(tmp_path / "a.csv")),
+        BatchJob(stream_id="stream-b-1", path=str(tmp_path / "b.csv")),
+        BatchJob(stream_id="stream-c-1", path=str(tmp_path / "missing" / "c.csv")),
+    ]
+    client = partial(acrclient.AsyncACRClient, base_url=acr_stub.base_url)
+    with patch.object(acrclient, "AsyncACRClient", client):
+        results = asyncio.run(suisa_sendemeldung.run_batch(settings))
+
+    assert [name for name, _ in results] == [
+        "stationname (stream-a-1)",
+        "stationname (stream-b-1)",
+        "stationname (stream-c-1)",
+    ]
+    assert [result for _, result in results[:2]] == [2, 2]
+    assert isinstance(results[2][1], FileNotFoundError)
+    assert len(acr_stub.requests) == 6  # noqa: PLR2004
+    lines = (tmp_path / "a.csv").read_text().splitlines()
+    assert len(lines) == 3  # noqa: PLR2004
+    assert lines[1].startswith("Station Name,")
+
+    # reading from the store does not touch ACRCloud or block the event loop
+    acr_stub.requests.clear()
+    settings.source = DataSource.store
+    settings.store.path = str(tmp_path / "detections.sqlite3")
+    with DetectionStore(settings.store.path) as store:
+        for job in settings.batch[:2]:
+            store.set_watermark(123456789, job.stream_id, date(1993, 3, 2))
+    iter_interval_data = suisa_sendemeldung.iter_interval_data
+    threads = []
+
+    def _iter_interval_data(*args):
+        threads.append(threading.get_ident())
+        yield from iter_interval_data(*args)
+
+    with patch.object(
+        suisa_sendemeldung, "iter_interval_data", side_effect=_iter_interval_data
+    ):
+        results = asyncio.run(suisa_sendemeldung.run_batch(settings))
+    assert [result for _, result in results[:2]] == [0, 0]
+    assert acr_stub.requests == []
+    assert threads
+    assert threading.get_ident() not in threads
+
+
+def test_run_backfill(settings, acr_stub, tmp_path, monkeypatch):
+    """Test run_backfill creates a report per month from a single fetch."""
+    monkeypatch.chdir(tmp_path)
+    settings.file.format = FileFormat.csv
+    settings.crid_mode = "local"
+    settings.cache.enabled = False
+    settings.date.last_month = False
+    settings.date.backfill = True
+    settings.date.start = "1993-01-15"
+    settings.date.end = "1993-03-01"
+    acr_stub.days["19930201"] = []
+    client = partial(acrclient.ACRClient, base_url=acr_stub.base_url)
+    with patch.object(acrclient, "ACRClient", client):
+        results = suisa_sendemeldung.run_backfill(settings)
+
+    assert results == [
+        ("stationname_1993_01.csv", 31),
+        ("stationname_1993_02.csv", 27),
+        ("stationname_1993_03.csv", 31),
+    ]
+    # every day is fetched exactly once
+    days = [day for _, day in acr_stub.requests]
+    assert len(days) == len(set(days)) == 31 + 28 + 31
+    lines = (tmp_path / "stationname_1993_02.csv").read_text().splitlines()
+    assert len(lines) == 1 + 27
+    assert lines[1].split(",")[4] == "1993-02-02"
+
+    # failing reports do not stop the others
+    def _report(_settings, _data, month, _mailer):
+        if month.month == 2:  # noqa: PLR2004
+            msg = "disk full"
+            raise OSError(msg)
+
+    with (
+        patch.object(acrclient, "ACRClient", client),
+        patch.object(suisa_sendemeldung, "report", side_effect=_report),
+    ):
+        results = suisa_sendemeldung.run_backfill(settings)
+    assert results[0] == ("stationname_1993_01.csv", 31)
+    assert isinstance(results[1][1], OSError)
+    assert results[2] == ("stationname_1993_03.csv", 31)
+
+
+def test_collect(settings, acr_stub):
+    """Test collect fetches the days since the watermark into the store."""
+    today = datetime.now(tz=timezone.utc).date()
+    settings.date.last_month = False
+    settings.date.start = str(today - timedelta(days=2))
+    client = acrclient.ACRClient("secret-key", base_url=acr_stub.base_url)
+    with DetectionStore(":memory:") as store:
+        # the first run starts at the start of the reporting period
+        assert suisa_sendemeldung.collect(settings, client, store) == 3  # noqa: PLR2004
+        assert store.get_watermark(123456789, "123456789") == today - timedelta(1)
+        assert len(acr_stub.requests) == 3  # noqa: PLR2004
+
+        # later runs fetch the overlap and today again
+        acr_stub.requests.clear()
+        assert suisa_sendemeldung.collect(settings, client, store) == 0
+        assert sorted(day for _, day in acr_stub.requests) == [
+            f"{today - timedelta(days=1):%Y%m%d}",
+            f"{today:%Y%m%d}",
+        ]
+
+        # without overlap only today is fetched
+        acr_stub.requests.clear()
+        settings.store.overlap = 0
+        assert suisa_sendemeldung.collect(settings, client, store) == 0
+        assert [day for _, day in acr_stub.requests] == [f"{today:%Y%m%d}"]
+
+
+def test_collect_cli(acr_stub, tmp_path):
+    """Test the collect command requires a stream before it touches the store."""
+    today = datetime.now(tz=timezone.utc).date()
+    path = tmp_path / "detections.sqlite3"
+    args = [
+        "--acr-bearer-token=" + "_" * 32,
+        "--acr-project-id=123456789",
+        f"--store-path={path}",
+        "--by-date",
+        f"--date-start={today - timedelta(days=1)}",
+    ]
+    runner = CliRunner()
+    result = runner.invoke(suisa_sendemeldung.cli, [*args, "collect"])
+    assert isinstance(result.exception, InvalidValueError)
+    assert result.exception.args[0] == [
+        "argument --acr-stream-id is required without batch jobs"
+    ]
+    assert not path.exists()
+
+    client = partial(acrclient.ACRClient, base_url=acr_stub.base_url)
+    with patch.object(acrclient, "ACRClient", client):
+        result = runner.invoke(
+            suisa_sendemeldung.cli, [*args, "--acr-stream-id=123456789", "collect"]
+        )
+    assert result.exit_code == 0
+    assert result.output == "123456789: 2 new detections\n"
+    with DetectionStore(str(path)) as store:
+        assert store.get_watermark(123456789, "123456789") == today - timedelta(1)
+
+
+def test_iter_interval_data(settings, acr_stub, tmp_path):
+    """Test iter_interval_data reads from the configured source."""
+    settings.cache.enabled = False
+    settings.store.path = str(tmp_path / "detections.sqlite3")
+    client = partial(acrclient.ACRClient, base_url=acr_stub.base_url)
+    with patch.object(acrclient, "ACRClient", client):
+        data = list(
+            suisa_sendemeldung.iter_interval_data(
+                settings, date(1993, 3, 1), date(1993, 3, 2)
+            )
+        )
+    assert len(data) == 2  # noqa: PLR2004
+    assert len(acr_stub.requests) == 2  # noqa: PLR2004
+
+    with DetectionStore(settings.store.path) as store:
+        store.add(123456789, "123456789", data[1:])
+        store.set_watermark(123456789, "123456789", date(1993, 3, 2))
+    settings.source = DataSource.store
+    result = suisa_sendemeldung.iter_interval_data(
+        settings, date(1993, 3, 1), date(1993, 3, 2)
+    )
+    assert [repr(detection) for detection in result] == [repr(data[1])]
+    assert len(acr_stub.requests) == 2  # noqa: PLR2004
+
+
+def test_iter_interval_data_lagging_collector(settings, tmp_path):
+    """Test reports from the store fail unless it is collected up to the end."""
+    settings.source = DataSource.store
+    settings.store.path = str(tmp_path / "detections.sqlite3")
+    result = suisa_sendemeldung.iter_interval_data(
+        settings, date(1993, 3, 1), date(1993, 3, 2)
+    )
+    with pytest.raises(RuntimeError, match="collected up to never, the report needs"):
+        next(result)
+
+    # the collector stopped a day early
+    with DetectionStore(settings.store.path) as store:
+        store.set_watermark(123456789, "123456789", date(1993, 3, 1))
+    result = suisa_sendemeldung.iter_interval_data(
+        settings, date(1993, 3, 1), date(1993, 3, 2)
+    )
+    with pytest.raises(
+        RuntimeError, match="up to 1993-03-01, the report needs 1993-03-02"
+    ):
+        next(result)
+
+    # local days west of UTC end on the next UTC day
+    settings.l10n = LocalizationSettings(timezone="America/New_York")
+    with DetectionStore(settings.store.path) as store:
+        store.set_watermark(123456789, "123456789", date(1993, 3, 2))
+    result = suisa_sendemeldung.iter_interval_data(
+        settings, date(1993, 3, 1), date(1993, 3, 2)
+    )
+    with pytest.raises(RuntimeError, match="the report needs 1993-03-03"):
+        next(result)
+
+
+def test_echo_summary(capsys):
+    """Test echo_summary."""
+    assert suisa_sendemeldung.echo_summary([("a.csv", 12), ("b.csv", 3)])
+    assert capsys.readouterr().err == (
+        "a.csv: 12 entries reported\n"
+        "b.csv: 3 entries reported\n"
+        "2 of 2 reports created\n"
+    )
+
+    results = [("a.csv", 12), ("b.csv", ValueError("boom"))]
+    assert not suisa_sendemeldung.echo_summary(results)
+    assert capsys.readouterr().err == (
+        "a.csv: 12 entries reported\nb.csv: failed: boom\n1 of 2 reports created\n"
+    )
+
+
+def test_get_months():
+    """Test get_months."""
+    assert suisa_sendemeldung.get_months(date(1993, 3, 1), date(1993, 3, 1)) == [
+        (date(1993, 3, 1), date(1993, 3, 31))
+    ]
+    assert suisa_sendemeldung.get_months(date(1992, 12, 24), date(1993, 2, 1)) == [
+        (date(1992, 12, 1), date(1992, 12, 31)),
+        (date(1993, 1, 1), date(1993, 1, 31)),
+        (date(1993, 2, 1), date(1993, 2, 28)),
+    ]
+
+
+def test_iter_months():
+    """Test iter_months."""
+    months = suisa_sendemeldung.get_months(date(1993, 1, 1), date(1993, 4, 30))
+    data = [
+        _detection(timestamp_utc=ts)
+        for ts in (
+            "1993-01-01 00:00:00",
+            "1993-01-31 23:59:59",
+            "1993-03-01 00:00:00",
+        )
+    ]
+    result = suisa_sendemeldung.iter_months(iter(data), months)
+    assert next(result) == (date(1993, 1, 1), data[:2])
+    assert list(result) == [
+        (date(1993, 2, 1), []),
+        (date(1993, 3, 1), data[2:]),
+        (date(1993, 4, 1), []),
+    ]
+
+
+def test_get_transport(settings):
+    """Test get_transport."""
+    settings.acr.max_workers = 16
+    settings.acr.retries = 2
+    transport = suisa_sendemeldung.get_transport(settings)
+    assert transport.pool_size == 16  # noqa: PLR2004
+    assert transport.retries == 2  # noqa: PLR2004
+    assert transport.timeout == 60  # noqa: PLR2004
+
+
+def _detection(played_duration=0, **metadata):
+    return Detection.from_entry(
+        {
+            "metadata": {
+                "timestamp_utc": "1993-03-01 13:12:00",
+                "played_duration": played_duration,
+                **metadata,
+            }
+        }
+    )
+
+
 def test_check_duplicate():
     """Test check_duplicates."""
 
     # both records are music and not duplicate
-    entry_a = {"metadata": {"music": [{"acrid": "123456789"}]}}
-    entry_b = {"metadata": {"music": [{"acrid": "987654321"}]}}
+    entry_a = _detection(music=[{"acrid": "123456789"}])
+    entry_b = _detection(music=[{"acrid": "987654321"}])
     assert not suisa_sendemeldung.check_duplicate(entry_a, entry_b)
 
     # both records are music and duplicate
-    entry_a = {"metadata": {"music": [{"acrid": "123456789"}]}}
-    entry_b = {"metadata": {"music": [{"acrid": "123456789"}]}}
+    entry_a = _detection(music=[{"acrid": "123456789"}])
+    entry_b = _detection(music=[{"acrid": "123456789"}])
     assert suisa_sendemeldung.check_duplicate(entry_a, entry_b)
 
     # first record is custom and not duplicate
-    entry_a = {"metadata": {"custom_files": [{"acrid": "123456789"}]}}
-    entry_b = {"metadata": {"music": [{"acrid": "987654321"}]}}
+    entry_a = _detection(custom_files=[{"acrid": "123456789"}])
+    entry_b = _detection(music=[{"acrid": "987654321"}])
     assert not suisa_sendemeldung.check_duplicate(entry_a, entry_b)
 
     # first record is custom and duplicate
-    entry_a = {"metadata": {"custom_files": [{"acrid": "123456789"}]}}
-    entry_b = {"metadata": {"music": [{"acrid": "123456789"}]}}
+    entry_a = _detection(custom_files=[{"acrid": "123456789"}])
+    entry_b = _detection(music=[{"acrid": "123456789"}])
     assert suisa_sendemeldung.check_duplicate(entry_a, entry_b)
 
     # second record is custom and not duplicate
-    entry_a = {"metadata": {"music": [{"acrid": "123456789"}]}}
-    entry_b = {"metadata": {"custom_files": [{"acrid": "987654321"}]}}
+    entry_a = _detection(music=[{"acrid": "123456789"}])
+    entry_b = _detection(custom_files=[{"acrid": "987654321"}])
     assert not suisa_sendemeldung.check_duplicate(entry_a, entry_b)
 
     # second record is custom and duplicate
-    entry_a = {"metadata": {"music": [{"acrid": "123456789"}]}}
-    entry_b = {"metadata": {"custom_files": [{"acrid": "123456789"}]}}
+    entry_a = _detection(music=[{"acrid": "123456789"}])
+    entry_b = _detection(custom_files=[{"acrid": "123456789"}])
     assert suisa_sendemeldung.check_duplicate(entry_a, entry_b)
 
     # both records are custom and not duplicate
-    entry_a = {"metadata": {"custom_files": [{"acrid": "123456789"}]}}
-    entry_b = {"metadata": {"custom_files": [{"acrid": "987654321"}]}}
+    entry_a = _detection(custom_files=[{"acrid": "123456789"}])
+    entry_b = _detection(custom_files=[{"acrid": "987654321"}])
     assert not suisa_sendemeldung.check_duplicate(entry_a, entry_b)
 
     # both records are custom and duplicate
-    entry_a = {"metadata": {"custom_files": [{"acrid": "123456789"}]}}
-    entry_b = {"metadata": {"custom_files": [{"acrid": "123456789"}]}}
+    entry_a = _detection(custom_files=[{"acrid": "123456789"}])
+    entry_b = _detection(custom_files=[{"acrid": "123456789"}])
     assert suisa_sendemeldung.check_duplicate(entry_a, entry_b)
 
 
@@ -203,29 +641,69 @@ def test_merge_duplicates():
     """Test merge_duplicates."""
 
     # check if record_1 reduced to one record and durations are added together
-    record_1 = {"metadata": {"music": [{"acrid": "123456789"}], "played_duration": 10}}
-    record_2 = {"metadata": {"music": [{"acrid": "987654321"}], "played_duration": 10}}
+    record_1 = _detection(music=[{"acrid": "123456789"}], played_duration=10)
+    record_2 = _detection(music=[{"acrid": "987654321"}], played_duration=10)
     raw_records = [record_1, record_1, record_2]
     results = suisa_sendemeldung.merge_duplicates(raw_records)
     assert len(results) == 2  # noqa: PLR2004
-    assert results[0]["metadata"]["played_duration"] == 20  # noqa: PLR2004
+    assert results[0].played_duration == 20  # noqa: PLR2004
 
     # all unique records - nothing should be merged
-    record_a = {"metadata": {"music": [{"acrid": "aaa"}], "played_duration": 5}}
-    record_b = {"metadata": {"music": [{"acrid": "bbb"}], "played_duration": 5}}
-    record_c = {"metadata": {"music": [{"acrid": "ccc"}], "played_duration": 5}}
+    record_a = _detection(music=[{"acrid": "aaa"}], played_duration=5)
+    record_b = _detection(music=[{"acrid": "bbb"}], played_duration=5)
+    record_c = _detection(music=[{"acrid": "ccc"}], played_duration=5)
     results = suisa_sendemeldung.merge_duplicates([record_a, record_b, record_c])
     assert len(results) == 3  # noqa: PLR2004
-    assert all(r["metadata"]["played_duration"] == 5 for r in results)  # noqa: PLR2004
+    assert all(r.played_duration == 5 for r in results)  # noqa: PLR2004
 
     # non-consecutive duplicates should NOT be merged
-    same_1 = {"metadata": {"music": [{"acrid": "same"}], "played_duration": 10}}
-    diff = {"metadata": {"music": [{"acrid": "diff"}], "played_duration": 10}}
-    same_2 = {"metadata": {"music": [{"acrid": "same"}], "played_duration": 10}}
+    same_1 = _detection(music=[{"acrid": "same"}], played_duration=10)
+    diff = _detection(music=[{"acrid": "diff"}], played_duration=10)
+    same_2 = _detection(music=[{"acrid": "same"}], played_duration=10)
     results = suisa_sendemeldung.merge_duplicates([same_1, diff, same_2])
     assert len(results) == 3  # noqa: PLR2004
 
 
+def test_merge_duplicates_is_linear():
+    """Merging compares each entry only with the one it may be merged into."""
+    timestamp = datetime(1993, 3, 1, tzinfo=timezone.utc)
+    # one detection every 4 minutes, each track detected 3 times in a row
+    data = [
+        Detection(
+            timestamp,
+            timestamp,
+            60,
+            {},
+            frozenset((f"{minute // 12}", "other"))
+            if minute % 2
+            else frozenset((f"{minute // 12}",)),
+        )
+        for minute in range(0, 365 * 24 * 60, 4)
+    ]
+    with patch.object(
+        suisa_sendemeldung,
+        "check_duplicate",
+        side_effect=suisa_sendemeldung.check_duplicate,
+    ) as check:
+        result = suisa_sendemeldung.merge_duplicates(data)
+    assert check.call_count == len(data) - 1
+    assert len(result) == len(data) // 3
+
+
+def test_iter_merge_duplicates():
+    """Test iter_merge_duplicates."""
+    assert list(suisa_sendemeldung.iter_merge_duplicates(iter([]))) == []
+
+    same_1 = _detection(music=[{"acrid": "same"}], played_duration=10)
+    same_2 = _detection(music=[{"acrid": "same"}], played_duration=10)
+    diff = _detection(music=[{"acrid": "diff"}], played_duration=10)
+    results = suisa_sendemeldung.iter_merge_duplicates(iter([same_1, same_2, diff]))
+    # the first entry is only yielded once a different one shows up
+    assert next(results) is same_1
+    assert same_1.played_duration == 20  # noqa: PLR2004
+    assert list(results) == [diff]
+
+
 @pytest.mark.parametrize(
     ("test_date", "expected"),
     [
@@ -242,218 +720,386 @@ def test_funge_release_date(test_date, expected):
     assert results == expected
 
 
-@patch("cridlib.get")
-def test_get_csv(mock_cridlib_get, snapshot, settings):
-    """Test get_csv."""
-    mock_cridlib_get.return_value = "crid://rabe.ch/v1/test"
+def _csv(data, settings):
+    csv = StringIO()
+    suisa_sendemeldung.write_csv_data(data, settings, csv)
+    return csv.getvalue()
+
+
+def _xlsx(data, settings):
+    xlsx = BytesIO()
+    suisa_sendemeldung.write_xlsx_data(data, settings, xlsx)
+    return xlsx
+
+
+@patch("suisa_sendemeldung.crid.ArchiveSchedule.get_broadcasts")
+def test_write_csv_data(mock_get_broadcasts, snapshot, settings):
+    """Test write_csv_data."""
+    mock_get_broadcasts.return_value = [
+        Broadcast(
+            start=datetime(1993, 3, 1, 13, tzinfo=timezone.utc),
+            end=datetime(1993, 3, 1, 17, tzinfo=timezone.utc),
+            show="Test",
+        )
+    ]
 
     # empty data
     data = []
-    csv = suisa_sendemeldung.get_csv(data, settings=settings)
+    csv = _csv(data, settings)
     assert csv == snapshot
-    mock_cridlib_get.assert_not_called()
+    mock_get_broadcasts.assert_not_called()
 
     # bunch of data
-    mock_cridlib_get.reset_mock()
-    data = [
-        {
-            "metadata": {
-                "timestamp_local": "1993-03-01 13:12:00",
-                "timestamp_utc": "1993-03-01 13:12:00",
-                "played_duration": 60,
-                "music": [{"title": "Uhrenvergleich", "acrid": "a1"}],
+    data = ingest(
+        [
+            {
+                "metadata": {
+                    "timestamp_utc": "1993-03-01 13:12:00",
+                    "played_duration": 60,
+                    "music": [{"title": "Uhrenvergleich", "acrid": "a1"}],
+                },
             },
-        },
-        {
-            "metadata": {
-                "timestamp_local": "1993-03-01 13:37:00",
-                "timestamp_utc": "1993-03-01 13:37:00",
-                "played_duration": 60,
-                "custom_files": [
-                    {
-                        "acrid": "a2",
-                        "title": "Meme Dub",
-                        "artist": "Da Gang",
-                        "album": "album, but string",
-                        "contributors": {
-                            "composers": [
-                                "Da Composah",
-                            ],
+            {
+                "metadata": {
+                    "timestamp_utc": "1993-03-01 13:37:00",
+                    "played_duration": 60,
+                    "custom_files": [
+                        {
+                            "acrid": "a2",
+                            "title": "Meme Dub",
+                            "artist": "Da Gang",
+                            "album": "album, but string",
+                            "contributors": {
+                                "composers": [
+                                    "Da Composah",
+                                ],
+                            },
+                            "release_date": "2023",
+                            "external_ids": {"isrc": "DEZ650710376"},
                         },
-                        "release_date": "2023",
-                        "external_ids": {"isrc": "DEZ650710376"},
-                    },
-                ],
+                    ],
+                },
             },
-        },
-        {
-            "metadata": {
-                "timestamp_local": "1993-03-01 16:20:00",
-                "timestamp_utc": "1993-03-01 16:20:00",
-                "played_duration": 60,
-                "music": [
-                    {
-                        "acrid": "a3",
-                        "title": "Bubbles",
-                        "album": {
-                            "name": "Da Alboom",
-                        },
-                        "contributors": {"composers": None},
-                        "release_date": "2022-12-13",
-                        "artists": [
-                            {
-                                "name": "Mary's Surprise Act",
+            {
+                "metadata": {
+                    "timestamp_utc": "1993-03-01 16:20:00",
+                    "played_duration": 60,
+                    "music": [
+                        {
+                            "acrid": "a3",
+                            "title": "Bubbles",
+                            "album": {
+                                "name": "Da Alboom",
                             },
-                            {
-                                "name": "Climmy Jiff",
+                            "contributors": {"composers": None},
+                            "release_date": "2022-12-13",
+                            "artists": [
+                                {
+                                    "name": "Mary's Surprise Act",
+                                },
+                                {
+                                    "name": "Climmy Jiff",
+                                },
+                            ],
+                            "isrc": "DEZ650710376",
+                            "label": "Jane Records",
+                            "external_ids": {
+                                "upc": "greedy-capitalist-number",
                             },
-                        ],
-                        "isrc": "DEZ650710376",
-                        "label": "Jane Records",
-                        "external_ids": {
-                            "upc": "greedy-capitalist-number",
                         },
-                    },
-                ],
+                    ],
+                },
             },
-        },
-        {
-            "metadata": {
-                "timestamp_local": "1993-03-01 17:17:17",
-                "timestamp_utc": "1993-03-01 17:17:17",
-                "played_duration": 60,
-                "custom_files": [
-                    {
-                        "acrid": "a4",
-                        "artists": "Artists as string not list",
-                    },
-                ],
+            {
+                "metadata": {
+                    "timestamp_utc": "1993-03-01 17:17:17",
+                    "played_duration": 60,
+                    "custom_files": [
+                        {
+                            "acrid": "a4",
+                            "artists": "Artists as string not list",
+                        },
+                    ],
+                },
             },
-        },
-        {
-            "metadata": {
-                "timestamp_local": "1993-03-01 18:18:18",
-                "timestamp_utc": "1993-03-01 18:18:18",
-                "played_duration": 71337,
-                "music": [{"title": "Long Playing", "acrid": "a5"}],
+            {
+                "metadata": {
+                    "timestamp_utc": "1993-03-01 18:18:18",
+                    "played_duration": 71337,
+                    "music": [{"title": "Long Playing", "acrid": "a5"}],
+                },
             },
-        },
-        {
-            "metadata": {
-                "timestamp_local": "1993-03-01 18:18:18",
-                "timestamp_utc": "1993-03-01 18:18:18",
-                "played_duration": 71337,
-                "music": [
-                    {
-                        "title": "composer in works",
-                        "acrid": "a6",
-                        "works": [{"creators": [{"name": "Worker", "role": "W"}]}],
-                    },
-                ],
+            {
+                "metadata": {
+                    "timestamp_utc": "1993-03-01 18:18:18",
+                    "played_duration": 71337,
+                    "music": [
+                        {
+                            "title": "composer in works",
+                            "acrid": "a6",
+                            "works": [{"creators": [{"name": "Worker", "role": "W"}]}],
+                        },
+                    ],
+                },
             },
-        },
-        {
-            "metadata": {
-                "timestamp_local": "1993-03-01 18:18:18",
-                "timestamp_utc": "1993-03-01 18:18:18",
-                "played_duration": 71337,
-                "music": [
-                    {
-                        "title": "composer better in works",
-                        "artists": [{"name": "same"}],
-                        "contributors": {
-                            "composers": ["same"],
+            {
+                "metadata": {
+                    "timestamp_utc": "1993-03-01 18:18:18",
+                    "played_duration": 71337,
+                    "music": [
+                        {
+                            "title": "composer better in works",
+                            "artists": [{"name": "same"}],
+                            "contributors": {
+                                "composers": ["same"],
+                            },
+                            "acrid": "a6",
+                            "works": [
+                                {"creators": [{"name": "composer", "role": "C"}]}
+                            ],
                         },
-                        "acrid": "a6",
-                        "works": [{"creators": [{"name": "composer", "role": "C"}]}],
-                    },
-                ],
+                    ],
+                },
             },
-        },
-    ]
-    csv = suisa_sendemeldung.get_csv(data, settings=settings)
-    assert csv == snapshot
-    mock_cridlib_get.assert_has_calls(
-        [
-            call(
-                timestamp=datetime(1993, 3, 1, 13, 12, tzinfo=timezone.utc),
-                fragment="acrid=a1",
-            ),
-            call(
-                timestamp=datetime(1993, 3, 1, 13, 37, tzinfo=timezone.utc),
-                fragment="acrid=a2",
-            ),
-            call(
-                timestamp=datetime(1993, 3, 1, 16, 20, tzinfo=timezone.utc),
-                fragment="acrid=a3",
-            ),
-            call(
-                timestamp=datetime(1993, 3, 1, 17, 17, 17, tzinfo=timezone.utc),
-                fragment="acrid=a4",
-            ),
-            call(
-                timestamp=datetime(1993, 3, 1, 18, 18, 18, tzinfo=timezone.utc),
-                fragment="acrid=a5",
-            ),
-        ],
+        ]
     )
+    csv = _csv(data, settings)
+    assert csv == snapshot
+    # the schedule is only fetched once per day
+    assert mock_get_broadcasts.call_args_list == [
+        call(date(1993, 3, 1)),
+        call(date(1993, 2, 28)),
+    ]
 
     # no cridib
-    mock_cridlib_get.reset_mock()
+    mock_get_broadcasts.reset_mock()
     settings.crid_mode = "local"
-    csv = suisa_sendemeldung.get_csv(data, settings=settings)
+    csv = _csv(data, settings)
     assert csv == snapshot
-    mock_cridlib_get.assert_not_called()
+    mock_get_broadcasts.assert_not_called()
 
+    # streaming rows from an iterator
+    assert _csv(iter(data), settings) == csv
 
-def test_get_xlsx(snapshot, settings):
-    """Test get_xlsx."""
+
+def test_iter_rows(settings, capsys):
+    """Test that rendering rows in worker processes gives the same output."""
+    settings.crid_mode = "local"
+    data = ingest(
+        [
+            {
+                "metadata": {
+                    "timestamp_utc": f"1993-03-01 13:{minute:02}:00",
+                    "played_duration": minute,
+                    "music": [
+                        {"title": f"Track {minute % 3}", "acrid": f"a{minute % 3}"}
+                    ],
+                },
+            }
+            for minute in range(12)
+        ]
+    )
+    metrics.reset()
+    serial = _csv(data, settings)
+    assert metrics.counters["track_cache_hits"] == 9  # noqa: PLR2004
+    assert metrics.counters["track_cache_misses"] == 3  # noqa: PLR2004
+
+    # the track cache counters of the workers add up in the metrics
+    settings.workers = 2
+    metrics.reset()
+    with (
+        patch("suisa_sendemeldung.suisa_sendemeldung.ROW_CHUNK_SIZE", 1),
+        patch(
+            "concurrent.futures.ProcessPoolExecutor", wraps=ProcessPoolExecutor
+        ) as executor,
+    ):
+        assert _csv(iter(data), settings) == serial
+    # workers are not forked from a process that may run other threads
+    assert executor.call_args.kwargs["mp_context"].get_start_method() == "forkserver"
+    hits = metrics.counters["track_cache_hits"]
+    assert hits + metrics.counters["track_cache_misses"] == 12  # noqa: PLR2004
+    assert hits >= 6  # noqa: PLR2004
+    assert f"suisa_sendemeldung_track_cache_hits {hits}\n" in metrics.to_prometheus(0)
+    assert _csv(data, settings) == serial
+    assert _csv([], settings) == serial.splitlines(keepends=True)[0]
+
+    # what the workers do
+    rows, hits, misses = suisa_sendemeldung._render_rows(data[:4], settings)  # noqa: SLF001
+    assert [row[1] for row in rows] == ["Track 0", "Track 1", "Track 2", "Track 0"]
+    assert (hits, misses) == (1, 3)
+    # without a progress bar per chunk
+    capsys.readouterr()
+    suisa_sendemeldung._render_rows(data, settings)  # noqa: SLF001
+    assert capsys.readouterr().err == ""
+
+
+def test_write_xlsx_data(snapshot, settings, tmp_path):
+    """Test write_xlsx_data."""
 
     # empty data
     data = []
-    xlsx = suisa_sendemeldung.get_xlsx(data, settings=settings)
+    xlsx = _xlsx(data, settings)
     workbook = load_workbook(xlsx)
     worksheet = workbook.active
     assert list(worksheet.values) == snapshot  # pyright: ignore[reportOptionalMemberAccess]
     assert worksheet.column_dimensions == snapshot  # pyright: ignore[reportOptionalMemberAccess]
 
-
-def test_reformat_start_date_in_xlsx():
-    """Test that reformat_start_date_in_xlsx reformats the start date column."""
-    workbook: Workbook = Workbook()
-    if not workbook.active:  # pragma: no cover
-        raise RuntimeError
-    worksheet: Worksheet = workbook.active  # type: ignore[assignment]
-    worksheet.append([])
-    worksheet.append(
+    # dates end up as real dates
+    settings.crid_mode = "local"
+    data = ingest(
         [
-            "",
-            "",
-            "",
-            "",
-            "2025-01-01",  # Sendedatum
-            "",
-            "01:01:01",  # Sendezeit
-            "",
-            "",
-            "",
-            "",
-            "",
-            "",
-            "20250101",  # Aufnahmedatum
-            "",
-            "20250101",  # Erstveröffentlichungsdatum
+            {
+                "metadata": {
+                    "timestamp_utc": "1993-03-01 13:12:00",
+                    "played_duration": 60,
+                    "music": [
+                        {
+                            "title": "Uhrenvergleich",
+                            "acrid": "a1",
+                            "release_date": "2022-12-13",
+                        }
+                    ],
+                },
+            },
         ]
     )
-    suisa_sendemeldung.reformat_start_date_in_xlsx(worksheet)
-    row = list(worksheet.rows)[1]
-    assert row[4].value == datetime(2025, 1, 1).date()
+    xlsx = _xlsx(data, settings)
+    worksheet = load_workbook(xlsx).active
+    assert list(worksheet.values) == snapshot  # pyright: ignore[reportOptionalMemberAccess]
+    row = list(worksheet.rows)[1]  # pyright: ignore[reportOptionalMemberAccess]
     assert row[4].number_format == "dd.mm.yyyy"
-    assert row[13].value == datetime(2025, 1, 1).date()
-    assert row[13].number_format == "dd.mm.yyyy"
-    assert row[15].value == datetime(2025, 1, 1).date()
     assert row[15].number_format == "dd.mm.yyyy"
 
+    # streaming to a file gives the same sheet
+    path = tmp_path / "report.xlsx"
+    suisa_sendemeldung.write_xlsx_data(iter(data), settings, str(path))
+    assert list(load_workbook(path).active.values) == list(worksheet.values)  # pyright: ignore[reportOptionalMemberAccess]
+
+    # widths are estimated from the first rows only, all rows are written
+    data = ingest(
+        [
+            {
+                "metadata": {
+                    "timestamp_utc": f"1993-03-01 13:1{minute}:00",
+                    "played_duration": 60,
+                    "music": [{"title": title, "acrid": f"a{minute}"}],
+                },
+            }
+            for minute, title in enumerate(["Uhrenvergleich", "X" * 50])
+        ]
+    )
+    with patch("suisa_sendemeldung.suisa_sendemeldung.XLSX_WIDTH_SAMPLE", 1):
+        worksheet = load_workbook(_xlsx(data, settings)).active
+    assert [row[1] for row in worksheet.values] == [  # pyright: ignore[reportOptionalMemberAccess]
+        "Titel des Musikwerks",
+        "Uhrenvergleich",
+        "X" * 50,
+    ]
+    assert worksheet.column_dimensions["B"].width == len("Titel des Musikwerks") + 3  # pyright: ignore[reportOptionalMemberAccess]
+
+
+@pytest.mark.parametrize("file_format", [FileFormat.csv, FileFormat.xlsx])
+def test_report_keeps_previous_file(settings, tmp_path, file_format):
+    """Test that a failing report does not replace the previous one."""
+    path = tmp_path / f"report.{file_format}"
+    settings.crid_mode = "local"
+    settings.file = FileSettings(format=file_format, path=str(path))
+
+    def _data():
+        yield from ingest(
+            [
+                {
+                    "metadata": {
+                        "timestamp_utc": "1993-03-01 13:12:00",
+                        "played_duration": 60,
+                        "music": [{"title": "Uhrenvergleich", "acrid": "a1"}],
+                    },
+                }
+            ]
+        )
+        msg = "connection lost"
+        raise OSError(msg)
+
+    path.write_bytes(b"previous report")
+    with pytest.raises(OSError, match="connection lost"):
+        suisa_sendemeldung.report(settings, _data(), date(1993, 3, 1))
+    assert path.read_bytes() == b"previous report"
+    assert list(tmp_path.iterdir()) == [path]
+
+    # successful reports replace it
+    suisa_sendemeldung.report(settings, [], date(1993, 3, 1))
+    assert path.read_bytes() != b"previous report"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_get_attachment(settings):
+    """Test get_attachment compresses as configured."""
+    settings.crid_mode = "local"
+    settings.file = FileSettings(format=FileFormat.csv)
+    data = [
+        {
+            "metadata": {
+                "timestamp_utc": f"1993-03-01 13:{minute:02}:00",
+                "played_duration": 60,
+                "music": [{"title": "Uhrenvergleich", "acrid": f"a{minute}"}],
+            },
+        }
+        for minute in range(50)
+    ]
+    csv = _csv(ingest(data), settings).encode("utf-8")
+
+    # uncompressed
+    payload, compression = suisa_sendemeldung.get_attachment(
+        ingest(data), settings, "/tmp/report.csv"
+    )
+    assert compression == Compression.none
+    assert payload.getvalue() == csv
+
+    # compressed while rendering
+    settings.email = EmailSettings(compression=Compression.gzip)
+    payload, compression = suisa_sendemeldung.get_attachment(
+        ingest(data), settings, "/tmp/report.csv"
+    )
+    assert compression == Compression.gzip
+    assert gzip.decompress(payload.getvalue()) == csv
+    assert len(payload.getvalue()) < len(csv)
+
+    settings.email = EmailSettings(compression=Compression.zip)
+    payload, compression = suisa_sendemeldung.get_attachment(
+        ingest(data), settings, "/tmp/report.csv"
+    )
+    assert compression == Compression.zip
+    with ZipFile(payload) as archive:
+        assert archive.namelist() == ["report.csv"]
+        assert archive.read("report.csv") == csv
+
+    # below the threshold
+    settings.email = EmailSettings(compress_above=len(csv))
+    payload, compression = suisa_sendemeldung.get_attachment(
+        ingest(data), settings, "/tmp/report.csv"
+    )
+    assert compression == Compression.none
+    assert payload.getvalue() == csv
+
+    # above the threshold
+    settings.email = EmailSettings(compress_above=len(csv) - 1)
+    payload, compression = suisa_sendemeldung.get_attachment(
+        ingest(data), settings, "/tmp/report.csv"
+    )
+    assert compression == Compression.zip
+    with ZipFile(payload) as archive:
+        assert archive.read("report.csv") == csv
+
+    # xlsx in a zip
+    settings.file = FileSettings(format=FileFormat.xlsx)
+    settings.email = EmailSettings(compression=Compression.zip)
+    payload, compression = suisa_sendemeldung.get_attachment(
+        ingest(data), settings, "/tmp/report.xlsx"
+    )
+    with ZipFile(payload) as archive:
+        worksheet = load_workbook(BytesIO(archive.read("report.xlsx"))).active
+    assert len(list(worksheet.values)) == len(data) + 1  # pyright: ignore[reportOptionalMemberAccess]
+
 
 def test_get_email_attachment():
     """Test get_email_attachment."""
@@ -471,6 +1117,18 @@ def test_get_email_attachment():
     assert part.get_filename() == "test.csv"
     assert part.get_content_type() == "text/csv"
 
+    part = suisa_sendemeldung.get_email_attachment(
+        filename, filetype, BytesIO(), Compression.gzip
+    )
+    assert part.get_filename() == "test.csv.gz"
+    assert part.get_content_type() == "application/gzip"
+
+    part = suisa_sendemeldung.get_email_attachment(
+        "/tmp/test.xlsx", "xlsx", BytesIO(), Compression.zip
+    )
+    assert part.get_filename() == "test.zip"
+    assert part.get_content_type() == "application/zip"
+
 
 def test_create_message():
     """Test create_message."""
@@ -507,29 +1165,59 @@ def test_send_message():
     msg = Message()
 
     # no auth
-    with patch("suisa_sendemeldung.suisa_sendemeldung.SMTP", autospec=True) as mock:
+    with patch("smtplib.SMTP", autospec=True) as mock:
         suisa_sendemeldung.send_message(msg)  # pyright: ignore[reportArgumentType]
-        mock.assert_called_once_with("127.0.0.1", 587)
-        ctx = mock.return_value.__enter__.return_value
-        ctx.starttls.assert_called_once()
-        ctx.send_message.assert_called_once_with(msg)
+        mock.assert_called_once_with(host="127.0.0.1", port=587, timeout=60)
+        smtp = mock.return_value
+        smtp.starttls.assert_called_once()
+        smtp.login.assert_not_called()
+        smtp.send_message.assert_called_once_with(msg)
+        smtp.quit.assert_called_once()
 
     # auth, user provided login
-    with patch("suisa_sendemeldung.suisa_sendemeldung.SMTP", autospec=True) as mock:
+    with patch("smtplib.SMTP", autospec=True) as mock:
         suisa_sendemeldung.send_message(msg, "127.0.0.1", 587, "user", "password")  # pyright: ignore[reportArgumentType]
-        mock.assert_called_once_with("127.0.0.1", 587)
-        ctx = mock.return_value.__enter__.return_value
-        ctx.starttls.assert_called_once()
-        ctx.login.assert_called_once_with("user", "password")
+        mock.assert_called_once_with(host="127.0.0.1", port=587, timeout=60)
+        smtp = mock.return_value
+        smtp.starttls.assert_called_once()
+        smtp.login.assert_called_once_with("user", "password")
 
     # auth, user from msg
-    with patch("suisa_sendemeldung.suisa_sendemeldung.SMTP", autospec=True) as mock:
+    with patch("smtplib.SMTP", autospec=True) as mock:
         msg.add_header("From", "test@example.org")
         suisa_sendemeldung.send_message(msg, "127.0.0.1", 587, None, "password")  # pyright: ignore[reportArgumentType]
-        mock.assert_called_once_with("127.0.0.1", 587)
-        ctx = mock.return_value.__enter__.return_value
-        ctx.starttls.assert_called_once()
-        ctx.login.assert_called_once_with("test@example.org", "password")
+        mock.assert_called_once_with(host="127.0.0.1", port=587, timeout=60)
+        smtp = mock.return_value
+        smtp.starttls.assert_called_once()
+        smtp.login.assert_called_once_with("test@example.org", "password")
+
+
+def test_get_mailer(settings, smtp_stub):
+    """Test get_mailer sends over a single connection as configured."""
+    settings.email = EmailSettings(
+        sender="from@example.org",
+        server="127.0.0.1",
+        port=smtp_stub.port,
+        username="user",
+        password="secret",
+        starttls=False,
+    )
+    with suisa_sendemeldung.get_mailer(settings) as mailer:
+        for month in (1, 2):
+            mailer.send(
+                suisa_sendemeldung.create_message(
+                    settings.email.sender,
+                    "to@example.org",
+                    "subject",
+                    "text",
+                    f"report_1993_{month:02}.csv",
+                    "csv",
+                    "data",
+                )
+            )
+    assert smtp_stub.connections == 1
+    assert smtp_stub.logins == ["user"]
+    assert len(smtp_stub.messages) == 2  # noqa: PLR2004
 
 
 @pytest.mark.parametrize(
@@ -583,9 +1271,122 @@ def test_get_composer(test_music, expected):
     assert suisa_sendemeldung.get_composer(test_music) == expected
 
 
+def test_get_track():
+    """Test get_track."""
+    track = suisa_sendemeldung.get_track(
+        {
+            "title": "Uhrenvergleich",
+            "artists": [{"name": "Artist"}],
+            "works": [{"creators": [{"name": "Composer", "role": "W"}]}],
+            "external_ids": {"isrc": "DE0000000000", "upc": "123"},
+            "album": {"name": "Album", "cd_id": "cd"},
+            "release_date": "1993-03-01",
+        }
+    )
+    assert track == suisa_sendemeldung.Track(
+        title="Uhrenvergleich",
+        composer="Composer",
+        artist="Artist",
+        isrc="DE0000000000",
+        label=None,
+        upc="123",
+        album="Album",
+        cd_id="cd",
+        release_date=date(1993, 3, 1),
+    )
+
+
+def test_track_cache():
+    """Test that tracks are cached by acrid and content."""
+    tracks = suisa_sendemeldung.TrackCache(max_size=2)
+    music = {"acrid": "a1", "title": "Uhrenvergleich"}
+    assert tracks.get(music).title == "Uhrenvergleich"
+    assert tracks.get(dict(music)) is tracks.get(music)
+    assert (tracks.hits, tracks.misses) == (2, 1)
+
+    # same acrid but edited content
+    assert tracks.get({"acrid": "a1", "title": "Edited"}).title == "Edited"
+    # without acrid the content is the key
+    assert tracks.get({"title": "Jingle"}) is tracks.get({"title": "Jingle"})
+    assert (tracks.hits, tracks.misses) == (3, 3)
+
+    # least recently used track gets evicted
+    tracks.get({"acrid": "a2"})
+    tracks.get({"acrid": "a1", "title": "Edited"})
+    assert (tracks.hits, tracks.misses) == (3, 5)
+
+
 def test_cli_help(snapshot):
     """Snapshot test cli output."""
     runner = CliRunner()
     # Invoke the command with the --help option
     result = runner.invoke(suisa_sendemeldung.cli, ["--help"])
     assert result.output == snapshot
+
+
+def test_cli_profile_warning(tmp_path, monkeypatch):
+    """Test profiling a backfill warns that rendering is not profiled."""
+    runner = CliRunner()
+    args = [
+        "--acr-bearer-token=" + "_" * 32,
+        "--acr-project-id=123456789",
+        "--profile",
+        "--backfill",
+        "--by-date",
+        "--date-start=1993-01-01",
+    ]
+    # the profiles are written to the working directory
+    monkeypatch.chdir(tmp_path)
+    result = runner.invoke(suisa_sendemeldung.cli, args)
+    assert result.output.startswith(
+        "warning: reports of batch jobs and backfills are rendered on"
+        " worker threads, only fetching is profiled\n"
+    )
+    # the run itself fails without a stream
+    assert isinstance(result.exception, InvalidValueError)
+
+
+# seconds importing the cli may take, most of it is click and typed_settings
+IMPORT_BUDGET = 0.5
+
+_IMPORT_CHECK = """
+import json, sys, time
+from io import StringIO
+start = time.perf_counter()
+import suisa_sendemeldung.suisa_sendemeldung as s
+seconds = time.perf_counter() - start
+heavy = ("openpyxl", "babel", "cridlib", "iso3901", "dateutil", "tqdm", "smtplib",
+         "email.mime", "requests", "acrclient", "asyncio", "sqlite3", "cProfile")
+loaded = [name for name in heavy if name in sys.modules]
+from suisa_sendemeldung.detection import ingest
+from suisa_sendemeldung.settings import IdentifierMode, Settings
+music = [{"acrid": "a1"}]
+entry = {"metadata": {"timestamp_utc": "1993-03-01 13:12:00", "music": music}}
+s.write_csv_data(ingest([entry]), Settings(crid_mode=IdentifierMode.local), StringIO())
+csv = [name for name in heavy if name in sys.modules]
+print(json.dumps({"seconds": seconds, "loaded": loaded, "csv": csv}))
+"""
+
+
+def _measure_import():
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", _IMPORT_CHECK],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return json.loads(result.stdout)
+
+
+def test_import_is_lazy():
+    """Test that importing the cli loads heavy dependencies lazily."""
+    measured = _measure_import()
+    assert measured["loaded"] == []
+    # csv reports with local ids only need the ISRC validation and tqdm
+    assert measured["csv"] == ["iso3901", "tqdm"]
+
+
+@pytest.mark.benchmark
+def test_import_budget():
+    """Test that importing the cli is fast."""
+    assert _measure_import()["seconds"] < IMPORT_BUDGET